@@ -6,8 +6,6 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
-# Configuración de logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Definición de tipos de eventos
@@ -93,6 +91,7 @@ class NotebookSimulator:
         await asyncio.sleep(5)  # Simular tiempo de ejecución
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     simulator = NotebookSimulator()
     asyncio.run(simulator.run())
         
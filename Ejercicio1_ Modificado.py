@@ -5,12 +5,6 @@ import threading  # Importa el módulo threading para manejar bloqueos y concurr
 from concurrent.futures import ThreadPoolExecutor  # Importa ThreadPoolExecutor para ejecutar tareas en hilos.
 from enum import Enum  # Importa Enum para definir tipos de eventos como enumeraciones.
 
-# Importar nest_asyncio si estás en un entorno de notebook
-import nest_asyncio  # Importa nest_asyncio para anular la política asyncio en entornos de notebooks.
-nest_asyncio.apply()  # Aplica la anulación de asyncio para entornos de notebooks.
-
-# Configuración de logging
-logging.basicConfig(level=logging.INFO)  # Configura el nivel de logging a INFO.
 logger = logging.getLogger(__name__)  # Crea un logger con el nombre del módulo actual.
 
 # Definición de tipos de eventos como una enumeración
@@ -100,8 +94,19 @@ class NotebookSimulator:
         except asyncio.CancelledError:
             logger.info("Event processing task cancelled")  # Registra la cancelación de la tarea de eventos.
 
+# Ejecuta una corrutina también dentro de un notebook, donde el bucle ya está en marcha
+def run(coroutine):
+    try:
+        loop = asyncio.get_running_loop()  # Comprueba si hay un bucle en ejecución.
+    except RuntimeError:
+        return asyncio.run(coroutine)  # Fuera de un notebook basta con asyncio.run.
+    import nest_asyncio  # Solo se importa en notebooks: anula la política asyncio para permitir bucles anidados.
+    nest_asyncio.apply()
+    return loop.run_until_complete(coroutine)
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)  # Configura el nivel de logging a INFO.
     simulator = NotebookSimulator()  # Crea una instancia del simulador de notebook.
-    asyncio.run(simulator.run())  # Ejecuta el simulador utilizando asyncio para manejar la ejecución asíncrona.
+    run(simulator.run())  # Ejecuta el simulador utilizando asyncio para manejar la ejecución asíncrona.
 
     
\ No newline at end of file
@@ -2,8 +2,11 @@
 import threading
 import logging
 import queue
-# En este caso se realiza Configuración de logging
-logging.basicConfig(level=logging.INFO)
+import time
+
+from codec import encode, decode, Data, Marker
+from link_model import DelayLine
+
 logger = logging.getLogger(__name__)
 
 class Robot:
@@ -15,13 +18,19 @@ class Robot:
         self.in_snapshot = False
         self.num_robots = num_robots
         self.snapshot = {}
-        self.lock = threading.Lock()
+        # Canales cuyo estado se registra hasta que llegue su marcador
+        self.recording = set()
+        # Reentrante: receive_marker inicia la instantánea con el cerrojo tomado
+        self.lock = threading.RLock()
+        self.network = None
 
     def initiate_snapshot(self):
         with self.lock:
             self.snapshot_initiator = True
             self.in_snapshot = True
             self.record_state()
+            self.channel_states = {i: [] for i in self.channel_states}
+            self.recording = set(self.channel_states)
             for i in range(self.num_robots):
                 if i != self.id:
                     self.send_marker(i)
@@ -30,11 +39,16 @@ class Robot:
         with self.lock:
             if not self.in_snapshot:
                 self.initiate_snapshot()
-            self.channel_states[sender_id] = []
+            self.recording.discard(sender_id)
+            if not self.recording:
+                logger.info(f'Robot {self.id} completes its snapshot')
 
     def send_marker(self, recipient_id):
         logger.info(f'Robot {self.id} sends marker to Robot {recipient_id}')
-        network.simulate_marker(self.id, recipient_id)
+        self.network.simulate_marker(self.id, recipient_id)
+
+    def send_message(self, recipient_id, message):
+        self.network.simulate_message(self.id, recipient_id, message)
 
     def record_state(self):
         logger.info(f'Robot {self.id} records its state')
@@ -42,23 +56,54 @@ class Robot:
 
     def receive_message(self, sender_id, message):
         with self.lock:
-            if self.in_snapshot:
+            if sender_id in self.recording:
                 self.channel_states[sender_id].append(message)
             # Aquí se procesarían los mensajes normales
 
+# Con un transporte (TransportThread de transport.py) el mensaje viaja por un
+# socket y se entrega en el hilo del transporte. Con `link` (LinkModel de
+# link_model.py) y sin transporte se entrega cuando el modelo lo indica
 class Network:
-    def __init__(self, num_robots):
-        self.robots = [Robot(i, num_robots) for i in range(num_robots)]
-
+    def __init__(self, num_robots, transport=None, link=None):
+        self.attach([Robot(i, num_robots) for i in range(num_robots)])
+        self.transport = transport
+        self.link = link
+        self.delay_line = DelayLine() if link is not None and transport is None else None
+        if transport is not None:
+            transport.start(self.deliver)
+
+    # Sustituye los robots de la red por los de otro paso del ejercicio
+    def attach(self, robots):
+        self.robots = robots
+        for robot in robots:
+            robot.network = self
+
+    # El mensaje viaja codificado (codec.py), como lo haría por un socket
     def simulate_message(self, sender_id, recipient_id, message):
-        self.robots[recipient_id].receive_message(sender_id, message)
+        self.post(sender_id, recipient_id, encode(Data(sender_id, message)))
         logger.info(f'Robot {sender_id} sends message to Robot {recipient_id}: {message}')
 
+    # Los marcadores siguen el mismo camino que los datos: con un canal FIFO
+    # ninguno adelanta a un mensaje enviado antes y la instantánea es consistente
     def simulate_marker(self, sender_id, recipient_id):
-        self.robots[recipient_id].receive_marker(sender_id)
+        self.post(sender_id, recipient_id, encode(Marker(sender_id)))
+
+    def post(self, sender_id, recipient_id, data):
+        if self.transport is not None:
+            self.transport.send(sender_id, recipient_id, data)
+        elif self.delay_line is not None:
+            now = time.monotonic()
+            for delay in self.link.delays(sender_id, recipient_id, len(data), now):
+                self.delay_line.call_at(now + delay, self.deliver, sender_id, recipient_id, data)
+        else:
+            self.deliver(sender_id, recipient_id, data)
 
-network = Network(3)
-network.robots[0].initiate_snapshot()
+    def deliver(self, sender_id, recipient_id, data):
+        message = decode(data)
+        if type(message) is Marker:
+            self.robots[recipient_id].receive_marker(message.sender)
+        else:
+            self.robots[recipient_id].receive_message(message.sender, message.payload)
 
 #Paso 2: Algoritmo de Raymond para Exclusión Mutua
 
@@ -83,7 +128,7 @@ class RobotRaymond(Robot):
 
     def send_request_to_parent(self):
         if self.parent is not None:
-            network.simulate_message(self.id, self.parent, 'REQUEST')
+            self.send_message(self.parent, 'REQUEST')
             logger.info(f'Robot {self.id} sends request to parent {self.parent}')
 
     def receive_request(self, sender_id):
@@ -100,7 +145,7 @@ class RobotRaymond(Robot):
     def send_token(self, recipient_id):
         logger.info(f'Robot {self.id} sends token to Robot {recipient_id}')
         self.token = None
-        network.simulate_message(self.id, recipient_id, 'TOKEN')
+        self.send_message(recipient_id, 'TOKEN')
 
     def receive_token(self):
         self.token = Token(self.id)
@@ -118,9 +163,6 @@ class RobotRaymond(Robot):
         else:
             self.token = Token(self.id)
 
-network = Network(3)
-network.robots = [RobotRaymond(i, 3) for i in range(3)]
-
 # Paso 3: Relojes Vectoriales para Ordenamiento Parcial
 class VectorClock:
     def __init__(self, num_robots):
@@ -141,9 +183,10 @@ class RobotVector(RobotRaymond):
         super().__init__(id, num_robots)
         self.vector_clock = VectorClock(num_robots)
 
+    # Todos los mensajes, también REQUEST y TOKEN, llevan el reloj vectorial
     def send_message(self, recipient_id, message):
         self.vector_clock.increment(self.id)
-        network.simulate_message(self.id, recipient_id, (message, self.vector_clock.clock))
+        self.network.simulate_message(self.id, recipient_id, (message, self.vector_clock.clock))
 
     def receive_message(self, sender_id, message):
         message, sender_clock = message
@@ -151,9 +194,6 @@ class RobotVector(RobotRaymond):
         super().receive_message(sender_id, message)
         logger.info(f'Robot {self.id} updated vector clock: {self.vector_clock}')
 
-network = Network(3)
-network.robots = [RobotVector(i, 3) for i in range(3)]
-
 # Paso 4: Recolector de Basura Generacional
 class GenerationalGarbageCollector:
     def __init__(self):
@@ -176,11 +216,6 @@ class GenerationalGarbageCollector:
         for generation in range(len(self.generations)):
             self.collect_garbage(generation)
 
-gc = GenerationalGarbageCollector()
-for i in range(15):
-    gc.allocate(f'Object {i}')
-gc.full_collect()
-
 
 #Finalmente, se integran todos los componentes en una clase de robot que utiliza todos los algoritmos y técnicas mencionadas.
 
@@ -199,13 +234,29 @@ class FullRobot(RobotVector):
         # Simular trabajo en la sección crítica
         self.exit_critical_section()
 
-network = Network(3)
-gc = GenerationalGarbageCollector()
-network.robots = [FullRobot(i, 3, gc) for i in range(3)]
-
-# En este caso se realiza Simulación de tareas
-for robot in network.robots:
-    robot.perform_task()
-    robot.send_message((robot.id + 1) % 3, "Hello")
-    robot.receive_token()
+# Cada paso del ejercicio en orden; `transport` y `link` se pasan a la red
+def main(transport=None, link=None):
+    network = Network(3, transport, link)
+    network.robots[0].initiate_snapshot()
+
+    network.attach([RobotRaymond(i, 3) for i in range(3)])
+    network.attach([RobotVector(i, 3) for i in range(3)])
+
+    gc = GenerationalGarbageCollector()
+    for i in range(15):
+        gc.allocate(f'Object {i}')
+    gc.full_collect()
+
+    # En este caso se realiza Simulación de tareas
+    gc = GenerationalGarbageCollector()
+    network.attach([FullRobot(i, 3, gc) for i in range(3)])
+    for robot in network.robots:
+        robot.perform_task()
+        robot.send_message((robot.id + 1) % 3, "Hello")
+        robot.receive_token()
+    return network
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
 
@@ -2,9 +2,11 @@
 import threading
 import logging
 import queue
+import time
+
+from codec import encode, decode, Data, Marker
+from link_model import DelayLine
 
-# Configuración básica de logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Clase Robot que implementa el algoritmo de snapshot
@@ -17,13 +19,17 @@ class Robot:
         self.in_snapshot = False  # Indicador de estar en snapshot
         self.num_robots = num_robots
         self.snapshot = {}  # Snapshot capturado
-        self.lock = threading.Lock()  # Lock para sincronización
+        self.recording = set()  # Canales cuyo estado se registra hasta que llegue su marcador
+        self.lock = threading.RLock()  # Lock reentrante: receive_marker inicia la instantánea con él tomado
+        self.network = None  # Red a la que pertenece (Network.attach)
 
     def initiate_snapshot(self):
         with self.lock:
             self.snapshot_initiator = True
             self.in_snapshot = True
             self.record_state()  # Registra el estado actual
+            self.channel_states = {i: [] for i in self.channel_states}
+            self.recording = set(self.channel_states)  # Registra todos los canales de entrada
             for i in range(self.num_robots):
                 if i != self.id:
                     self.send_marker(i)  # Envía marcadores a otros robots
@@ -32,11 +38,16 @@ class Robot:
         with self.lock:
             if not self.in_snapshot:
                 self.initiate_snapshot()
-            self.channel_states[sender_id] = []  # Limpia el estado del canal
+            self.recording.discard(sender_id)  # El canal queda registrado hasta el marcador
+            if not self.recording:
+                logger.info(f'Robot {self.id} completes its snapshot')
 
     def send_marker(self, recipient_id):
         logger.info(f'Robot {self.id} sends marker to Robot {recipient_id}')
-        network.simulate_marker(self.id, recipient_id)  # Simula el envío de marcador en la red
+        self.network.simulate_marker(self.id, recipient_id)  # Simula el envío de marcador en la red
+
+    def send_message(self, recipient_id, message):
+        self.network.simulate_message(self.id, recipient_id, message)  # Envía un mensaje por la red
 
     def record_state(self):
         logger.info(f'Robot {self.id} records its state')
@@ -44,21 +55,48 @@ class Robot:
 
     def receive_message(self, sender_id, message):
         with self.lock:
-            if self.in_snapshot:
-                self.channel_states[sender_id].append(message)
+            if sender_id in self.recording:
+                self.channel_states[sender_id].append(message)  # Mensaje en tránsito al tomar la instantánea
             # Aquí se procesarían los mensajes normales en caso de no estar en snapshot
 
 # Clase Network que simula la red entre los robots
 class Network:
-    def __init__(self, num_robots):
-        self.robots = [Robot(i, num_robots) for i in range(num_robots)]
+    def __init__(self, num_robots, transport=None, link=None):
+        self.attach([Robot(i, num_robots) for i in range(num_robots)])
+        self.transport = transport  # TransportThread opcional (transport.py): el mensaje viaja por un socket
+        self.link = link  # LinkModel opcional (link_model.py): sin transporte, entrega retrasada con un DelayLine
+        self.delay_line = DelayLine() if link is not None and transport is None else None
+        if transport is not None:
+            transport.start(self.deliver)
+
+    def attach(self, robots):
+        self.robots = robots  # Sustituye los robots de la red
+        for robot in robots:
+            robot.network = self
 
     def simulate_message(self, sender_id, recipient_id, message):
-        self.robots[recipient_id].receive_message(sender_id, message)
+        self.post(sender_id, recipient_id, encode(Data(sender_id, message)))  # El mensaje viaja codificado (codec.py), como por un socket
         logger.info(f'Robot {sender_id} sends message to Robot {recipient_id}: {message}')  # Log del mensaje enviado
 
     def simulate_marker(self, sender_id, recipient_id):
-        self.robots[recipient_id].receive_marker(sender_id)  # Simula el recibimiento de un marcador
+        self.post(sender_id, recipient_id, encode(Marker(sender_id)))  # Mismo canal FIFO que los datos: no adelanta a ningún mensaje
+
+    def post(self, sender_id, recipient_id, data):
+        if self.transport is not None:
+            self.transport.send(sender_id, recipient_id, data)
+        elif self.delay_line is not None:
+            now = time.monotonic()
+            for delay in self.link.delays(sender_id, recipient_id, len(data), now):
+                self.delay_line.call_at(now + delay, self.deliver, sender_id, recipient_id, data)  # Llega cuando lo diga el modelo
+        else:
+            self.deliver(sender_id, recipient_id, data)
+
+    def deliver(self, sender_id, recipient_id, data):
+        message = decode(data)
+        if type(message) is Marker:
+            self.robots[recipient_id].receive_marker(message.sender)  # Simula el recibimiento de un marcador
+        else:
+            self.robots[recipient_id].receive_message(message.sender, message.payload)  # Entrega al robot destino
 
 # Clase Token para algoritmo de exclusión mutua de Raymond
 class Token:
@@ -82,7 +120,7 @@ class RobotRaymond(Robot):
 
     def send_request_to_parent(self):
         if self.parent is not None:
-            network.simulate_message(self.id, self.parent, 'REQUEST')
+            self.send_message(self.parent, 'REQUEST')
             logger.info(f'Robot {self.id} sends request to parent {self.parent}')
 
     def receive_request(self, sender_id):
@@ -99,7 +137,7 @@ class RobotRaymond(Robot):
     def send_token(self, recipient_id):
         logger.info(f'Robot {self.id} sends token to Robot {recipient_id}')
         self.token = None
-        network.simulate_message(self.id, recipient_id, 'TOKEN')  # Envía token a otro robot
+        self.send_message(recipient_id, 'TOKEN')  # Envía token a otro robot
 
     def receive_token(self):
         self.token = Token(self.id)
@@ -140,7 +178,7 @@ class RobotVector(RobotRaymond):
 
     def send_message(self, recipient_id, message):
         self.vector_clock.increment(self.id)
-        network.simulate_message(self.id, recipient_id, (message, self.vector_clock.clock))
+        self.network.simulate_message(self.id, recipient_id, (message, self.vector_clock.clock))  # Todo mensaje lleva el reloj
 
     def receive_message(self, sender_id, message):
         message, sender_clock = message
@@ -170,12 +208,6 @@ class GenerationalGarbageCollector:
         for generation in range(len(self.generations)):
             self.collect_garbage(generation)
 
-# Ejemplo de uso de GenerationalGarbageCollector
-gc = GenerationalGarbageCollector()
-for i in range(15):
-    gc.allocate(f'Object {i}')
-gc.full_collect()
-
 # Clase FullRobot que integra todas las funcionalidades y algoritmos anteriores
 class FullRobot(RobotVector):
     def __init__(self, id, num_robots, gc):
@@ -196,11 +228,23 @@ class FullRobot(RobotVector):
         super().receive_token()  # Llama al método padre para recibir el token
         logger.info(f'Robot {self.id} received token and finishes execution')
 
-# Configura la red con FullRobot y simula tareas y mensajes entre robots
-network = Network(3)
-gc = GenerationalGarbageCollector()
-network.robots = [FullRobot(i, 3, gc) for i in range(3)]
-for robot in network.robots:
-    robot.perform_task()  # Ejecuta una tarea
-    network.simulate_message(robot.id, (robot.id + 1) % 3, "Hello")  # Simula un mensaje entre robots
-    robot.receive_token()  # Recibe un token
+def main(transport=None, link=None):
+    # Ejemplo de uso de GenerationalGarbageCollector
+    gc = GenerationalGarbageCollector()
+    for i in range(15):
+        gc.allocate(f'Object {i}')
+    gc.full_collect()
+
+    # Configura la red con FullRobot y simula tareas y mensajes entre robots
+    network = Network(3, transport, link)
+    gc = GenerationalGarbageCollector()
+    network.attach([FullRobot(i, 3, gc) for i in range(3)])
+    for robot in network.robots:
+        robot.perform_task()  # Ejecuta una tarea
+        robot.send_message((robot.id + 1) % 3, "Hello")  # Envía un mensaje con su reloj vectorial
+        robot.receive_token()  # Recibe un token
+    return network
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)  # Configuración básica de logging
+    main()
@@ -1,103 +1,202 @@
 import asyncio
+import collections
 import random
 import logging
+import os
+import tempfile
+import time
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from codec import encode, decode, Request, Reply, Task, Ack, ClockSync
+from link_model import LinkModel
+from hlc import HybridLogicalClock
+from termination import TerminationDetector
+from transport import SocketTransport, local_address, shared_transport
 
-class Message:
-    def __init__(self, sender, content, timestamp):
-        self.sender = sender
-        self.content = content
-        self.timestamp = timestamp
+logger = logging.getLogger(__name__)
 
 class Node:
-    def __init__(self, node_id, total_nodes, network):
+    def __init__(self, node_id, total_nodes, network, task_duration=(0.5, 2), mailbox_size=0):
         self.node_id = node_id
         self.total_nodes = total_nodes
         self.network = network
-        self.clock = 0
+        self.clock = HybridLogicalClock()
         self.requesting = False
+        self.request_timestamp = None
+        self.requested_resource = None
         self.replies_needed = 0
         self.resource_queue = asyncio.Queue()
+        self.released = asyncio.Event()
+        # Buzón propio: los mensajes se procesan en la tarea consumidora del
+        # nodo, nunca dentro de la pila de llamadas del emisor
+        self.mailbox = asyncio.Queue(maxsize=mailbox_size)
+        # Mensajes llegados con el buzón lleno, en orden de llegada; pasan al
+        # buzón según se libera sitio
+        self.overflow = collections.deque()
+        self.consumer = None
+        self.background_tasks = set()
+        self.task_duration = task_duration
         self.resources = set()
         self.young_generation = set()
         self.old_generation = set()
         self.threshold = 10
-        self.parent = None
-        self.active_children = set()
+        self.termination = TerminationDetector(node_id)
+        self.terminated = asyncio.Event()
+        self.tasks_processed = 0
 
-    async def send_message(self, recipient, content):
-        message = Message(self, content, self.clock)
+    # Los mensajes son clases del codec (codec.py): remitente por
+    # identificador, marca HLC y los campos propios de cada tipo
+    async def send_message(self, recipient, kind, *fields):
+        message = kind(self.node_id, self.clock.now(), *fields)
         await self.network.send_message(self, recipient, message)
 
+    def start(self):
+        if self.consumer is None:
+            self.consumer = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.consumer is not None:
+            pending = [self.consumer, *self.background_tasks]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.consumer = None
+
+    async def run(self):
+        while True:
+            data = await self.mailbox.get()
+            if self.overflow:
+                self.mailbox.put_nowait(self.overflow.popleft())
+            message = decode(data)
+            try:
+                await self.receive_message(message)
+            except Exception:
+                logger.exception(f'Node {self.node_id} failed to process {message}')
+            # Con el buzón vacío el nodo queda pasivo, sea cual sea el último
+            # mensaje (Request, Reply o ClockSync también)
+            await self.flush_acks()
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
     async def receive_message(self, message):
-        logger.info(f'Node {self.node_id} received message from Node {message.sender.node_id}: {message.content}')
+        # Un log por mensaje a nivel INFO domina el tiempo con miles de nodos; a
+        # nivel DEBUG sólo se formatea si está activo
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Node {self.node_id} received message from Node {message.sender}: {message}')
         self.synchronize_clock(message.timestamp)
         await self.process_message(message)
 
     def synchronize_clock(self, received_clock):
-        self.clock = max(self.clock, received_clock) + 1
+        self.clock.update(received_clock)
 
     async def process_message(self, message):
-        content = message.content
-        if content['type'] == 'request':
+        kind = type(message)
+        if kind is Request:
             await self.handle_request(message)
-        elif content['type'] == 'reply':
+        elif kind is Reply:
             await self.handle_reply(message)
-        elif content['type'] == 'task':
+        elif kind is Task:
             await self.handle_task(message)
-        elif content['type'] == 'ack':
+        elif kind is Ack:
             await self.handle_ack(message)
-        elif content['type'] == 'clock_sync':
-            self.synchronize_clock(content['timestamp'])
+        elif kind is ClockSync:
+            self.synchronize_clock(message.clock)
 
+    # Ricart-Agrawala: se responde de inmediato salvo que nuestra propia
+    # solicitud pendiente tenga prioridad (marca de tiempo menor, y en empate
+    # el identificador menor); en ese caso la respuesta se difiere.
     async def handle_request(self, message):
-        sender = message.sender
-        timestamp = message.timestamp
-        if not self.requesting or (self.requesting and (self.clock, self.node_id) < (timestamp, sender.node_id)):
-            await self.send_message(sender, {'type': 'reply'})
+        sender = self.network.nodes[message.sender]
+        timestamp = message.request_timestamp
+        if not self.requesting or (timestamp, sender.node_id) < (self.request_timestamp, self.node_id):
+            await self.send_message(sender, Reply)
         else:
-            await self.resource_queue.put((timestamp, sender))
+            self.resource_queue.put_nowait((timestamp, sender))
 
     async def handle_reply(self, message):
         self.replies_needed -= 1
         if self.replies_needed == 0:
-            await self.execute_task(message.content['resource'])
+            # La sección crítica corre aparte para que el buzón siga drenándose
+            self.spawn(self.execute_task(self.requested_resource))
 
+    # Computación difusa: cada tarea consume una unidad de su presupuesto y
+    # reparte el resto entre hasta `fanout` hijos elegidos al azar
     async def handle_task(self, message):
-        sender = message.sender
-        if not self.parent:
-            self.parent = sender
-        self.active_children.add(sender)
-        await self.execute_task(message.content['task'])
+        self.termination.on_receive(message.sender)
+        await self.process_task(message.task, message.budget, message.fanout)
 
     async def handle_ack(self, message):
-        sender = message.sender
-        self.active_children.discard(sender)
-        if not self.active_children and self.parent:
-            await self.send_message(self.parent, {'type': 'ack'})
-            logger.info(f'Node {self.node_id} terminated.')
+        self.termination.on_ack(message.count)
+
+    async def process_task(self, task, budget, fanout):
+        self.tasks_processed += 1
+        await asyncio.sleep(random.uniform(*self.task_duration))
+        await self.send_tasks(task, budget - 1, fanout)
+
+    async def send_tasks(self, task, budget, fanout):
+        children = min(fanout, budget)
+        if children == 0:
+            return
+        share, extra = divmod(budget, children)
+        self.termination.on_send(children)
+        await asyncio.gather(*(self.send_message(self.network.random_node(), Task, share + (i < extra), fanout, task)
+                               for i in range(children)))
+
+    # El nodo sólo queda pasivo con el buzón vacío: así los acks de todos los
+    # mensajes ya encolados salen agrupados en uno por emisor. run() lo llama
+    # tras cada mensaje; fuera de una computación difusa no hay nada que hacer
+    async def flush_acks(self):
+        termination = self.termination
+        if not self.mailbox.empty() or not (termination.engaged or termination.pending_acks):
+            return
+        acks = self.termination.on_passive()
+        if acks:
+            await asyncio.gather(*(self.send_message(self.network.nodes[node_id], Ack, count)
+                                   for node_id, count in acks))
+        if self.termination.terminated and not self.terminated.is_set():
+            logger.info(f'Node {self.node_id} detected termination.')
+            self.terminated.set()
+
+    # Inicia una computación difusa con raíz en este nodo y espera a que
+    # Dijkstra-Scholten detecte su terminación
+    async def start_diffusion(self, task, budget, fanout=4):
+        self.termination.start()
+        self.terminated.clear()
+        await self.send_tasks(task, budget, fanout)
+        await self.flush_acks()
+        await self.terminated.wait()
 
     async def request_resource(self, resource):
         self.requesting = True
-        self.clock += 1
+        self.released.clear()
+        self.request_timestamp = self.clock.now()
+        self.requested_resource = resource
         self.replies_needed = self.total_nodes - 1
-        for node in self.network.nodes:
-            if node.node_id != self.node_id:
-                await self.send_message(node, {'type': 'request', 'resource': resource})
+        if self.replies_needed == 0:
+            await self.execute_task(resource)
+            return
+        # Las solicitudes se envían en paralelo en lugar de una tras otra
+        await asyncio.gather(*(self.send_message(node, Request, self.request_timestamp, resource)
+                               for node in self.network.nodes.values() if node is not self))
 
     async def execute_task(self, task):
         logger.info(f'Node {self.node_id} executing task {task}')
-        await asyncio.sleep(random.uniform(0.5, 2))
-        self.release_resource(task)
+        self.resources.add(task)
+        await asyncio.sleep(random.uniform(*self.task_duration))
+        await self.release_resource(task)
 
-    def release_resource(self, resource):
+    async def release_resource(self, resource):
         self.requesting = False
+        self.request_timestamp = None
         self.resources.discard(resource)
+        deferred = []
         while not self.resource_queue.empty():
-            timestamp, node = await self.resource_queue.get()
-            await self.send_message(node, {'type': 'reply'})
+            timestamp, node = self.resource_queue.get_nowait()
+            deferred.append(node)
+        self.released.set()
+        await asyncio.gather(*(self.send_message(node, Reply) for node in deferred))
 
     def allocate(self, obj):
         self.young_generation.add(obj)
@@ -113,22 +212,183 @@ class Node:
         self.young_generation = new_young
         logger.info(f'Node {self.node_id} collected garbage: {self.old_generation}')
 
+# Nodo alojado en otro proceso: sólo se le envían mensajes
+class RemoteNode:
+    def __init__(self, node_id):
+        self.node_id = node_id
+
 # Clase Network
 
+# Con `link` (LinkModel de link_model.py) cada mensaje queda en vuelo lo que
+# diga el modelo antes de llegar al buzón; `latency` (un valor fijo o un rango
+# (min, max)) es un atajo para un modelo sólo con latencia. Sin ninguno de los
+# dos los mensajes van directos al buzón.
+# Con mailbox_size > 0 los buzones son acotados y el emisor espera cuando el
+# destino está lleno; el tamaño debe cubrir el fan-in de una ronda (el número
+# de solicitantes concurrentes) para no bloquear dos consumidores entre sí.
+# Los mensajes en vuelo que llegan con el buzón lleno esperan en la cola de
+# desbordamiento del destino, sin tareas por mensaje y sin alterar el orden.
+# Con un transporte (transport.py) los mensajes viajan por sockets y el modelo
+# de enlace es el del transporte; local_ids indica qué nodos viven en este
+# proceso y el resto son RemoteNode.
 class Network:
-    def __init__(self, node_count):
-        self.nodes = [Node(i, node_count, self) for i in range(node_count)]
+    def __init__(self, node_count, task_duration=(0.5, 2), latency=None, mailbox_size=0, transport=None,
+                 local_ids=None, link=None):
+        local_ids = range(node_count) if local_ids is None else set(local_ids)
+        # Registro de nodos indexado por identificador: búsqueda O(1) por mensaje
+        self.nodes = {i: Node(i, node_count, self, task_duration, mailbox_size) if i in local_ids else RemoteNode(i)
+                      for i in range(node_count)}
+        self.link = link if link is not None or latency is None else LinkModel(latency)
+        self.transport = transport
+        self.messages_sent = 0
 
     async def send_message(self, sender, recipient, message):
-        if recipient.node_id in [node.node_id for node in self.nodes]:
-            await recipient.receive_message(message)
+        if recipient.node_id in self.nodes:
+            self.messages_sent += 1
+            if self.transport is not None:
+                # Los algoritmos suponen canales fiables: con el transporte
+                # saturado el emisor espera en lugar de perder mensajes
+                self.transport.send(sender.node_id, recipient.node_id, encode(message))
+                await self.transport.drain()
+            elif self.link is None:
+                await recipient.mailbox.put(encode(message))
+            else:
+                data = encode(message)
+                loop = asyncio.get_running_loop()
+                now = loop.time()
+                for delay in self.link.delays(sender.node_id, recipient.node_id, len(data), now):
+                    loop.call_at(now + delay, self.arrive, recipient, data)
+
+    def arrive(self, recipient, data):
+        if recipient.overflow or recipient.mailbox.full():
+            recipient.overflow.append(data)
+        else:
+            recipient.mailbox.put_nowait(data)
+
+    # Entrega desde el transporte
+    async def deliver(self, sender_id, recipient_id, data):
+        await self.nodes[recipient_id].mailbox.put(data)
+
+    def local_nodes(self):
+        return [node for node in self.nodes.values() if isinstance(node, Node)]
+
+    def random_node(self):
+        return self.nodes[random.randrange(len(self.nodes))]
 
-    async def simulate(self):
-        tasks = [node.send_message(node, {'type': 'clock_sync', 'timestamp': node.clock}) for node in self.nodes]
+    async def start(self):
+        if self.transport is not None:
+            await self.transport.start(self.deliver)
+        for node in self.local_nodes():
+            node.start()
+
+    async def stop(self):
+        await asyncio.gather(*(node.stop() for node in self.local_nodes()))
+        if self.transport is not None:
+            await self.transport.close()
+
+    async def simulate(self, requesters=None):
+        await self.start()
+        tasks = [node.send_message(node, ClockSync, node.clock.now()) for node in self.local_nodes()]
         await asyncio.gather(*tasks)
-        for node in self.nodes:
-            await node.request_resource('resource')
-            await node.allocate('obj1')
-            await node.allocate('obj2')
+        requesting = self.local_nodes()[:requesters]
+        await asyncio.gather(*(node.request_resource('resource') for node in requesting))
+        await asyncio.gather(*(node.released.wait() for node in requesting))
+        for node in self.local_nodes():
+            node.allocate('obj1')
+            node.allocate('obj2')
+        await self.stop()
+
+# Mide el rendimiento del motor con muchos nodos en un único bucle de eventos;
+# transport_kind='uds' o 'tcp' hace pasar cada mensaje por la pila de red local
+async def benchmark(node_count=2000, requesters=20, latency=None, mailbox_size=0, transport_kind=None):
+    transport = None
+    if transport_kind is not None:
+        link = LinkModel(latency) if latency is not None else None
+        transport = shared_transport(transport_kind, range(node_count), 'ejercicio3', link)
+    network = Network(node_count, task_duration=(0, 0), latency=latency, mailbox_size=mailbox_size,
+                      transport=transport)
+    start = time.perf_counter()
+    await network.simulate(requesters)
+    elapsed = time.perf_counter() - start
+    rate = network.messages_sent / elapsed
+    via = f' por {type(transport).__name__} ({transport.writes} escrituras)' if transport is not None else ''
+    print(f'{node_count} nodos, {requesters} solicitantes: {network.messages_sent} mensajes '
+          f'en {elapsed:.2f} s ({rate:,.0f} mensajes/s){via}')
+    return rate
+
+# Computación difusa sobre miles de nodos: mide el tráfico extra de la
+# detección de terminación frente a los mensajes básicos
+async def benchmark_termination(node_count=10000, budget=100000, fanout=4, latency=None):
+    network = Network(node_count, task_duration=(0, 0), latency=latency)
+    await network.start()
+    start = time.perf_counter()
+    await network.nodes[0].start_diffusion('work', budget, fanout)
+    elapsed = time.perf_counter() - start
+    await network.stop()
+    processed = sum(node.tasks_processed for node in network.nodes.values())
+    acks = sum(node.termination.ack_messages for node in network.nodes.values())
+    print(f'{node_count} nodos: {processed} tareas, {acks} acks ({acks / max(processed, 1):.2f} por tarea), '
+          f'terminación detectada en {elapsed:.2f} s')
+    return processed, acks
+
+# Proceso que aloja los nodos `local_ids` hasta que se activa `done`
+def run_node_process(node_count, local_ids, endpoints, ready, done):
+    async def serve():
+        network = Network(node_count, task_duration=(0, 0), transport=SocketTransport(endpoints[local_ids[0]], endpoints),
+                          local_ids=local_ids)
+        await network.start()
+        ready.set()
+        await asyncio.get_running_loop().run_in_executor(None, done.wait)
+        await network.stop()
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(serve())
+
+# Computación difusa con los nodos repartidos entre `processes` procesos
+# comunicados por sockets Unix o TCP; este proceso aloja la raíz. Las
+# direcciones se fijan aquí, antes de lanzar los procesos, para que todos
+# compartan el mismo `endpoints`
+async def benchmark_processes(node_count=1000, processes=4, budget=20000, fanout=4, transport_kind='uds'):
+    import multiprocessing
+    directory = tempfile.mkdtemp()
+    shards = [list(range(shard, node_count, processes)) for shard in range(processes)]
+    addresses = [local_address(transport_kind, f'shard{shard}', directory) for shard in range(processes)]
+    endpoints = {node_id: addresses[shard] for shard, ids in enumerate(shards) for node_id in ids}
+    done = multiprocessing.Event()
+    children = []
+    for ids in shards[1:]:
+        ready = multiprocessing.Event()
+        child = multiprocessing.Process(target=run_node_process, args=(node_count, ids, endpoints, ready, done))
+        child.start()
+        children.append((child, ready))
+    loop = asyncio.get_running_loop()
+    for _, ready in children:
+        await loop.run_in_executor(None, ready.wait)
+    transport = SocketTransport(endpoints[0], endpoints)
+    network = Network(node_count, task_duration=(0, 0), transport=transport, local_ids=shards[0])
+    await network.start()
+    start = time.perf_counter()
+    await network.nodes[0].start_diffusion('work', budget, fanout)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await network.stop()
+    for child, _ in children:
+        await loop.run_in_executor(None, child.join)
+    os.rmdir(directory)
+    print(f'{node_count} nodos en {processes} procesos ({transport_kind}): {budget} tareas, terminación detectada en {elapsed:.2f} s '
+          f'({budget / elapsed:,.0f} tareas/s, {transport.frames_sent} tramas en {transport.writes} escrituras desde la raíz)')
+    return elapsed
 
+async def main():
+    await Network(5, latency=(0.01, 0.05)).simulate()
+    logging.getLogger().setLevel(logging.WARNING)
+    await benchmark()
+    await benchmark(latency=(0.001, 0.005), mailbox_size=64)
+    for transport_kind in ('uds', 'tcp'):
+        await benchmark(transport_kind=transport_kind)
+    await benchmark_termination()
+    for transport_kind in ('uds', 'tcp'):
+        await benchmark_processes(transport_kind=transport_kind)
 
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
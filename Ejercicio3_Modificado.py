@@ -1,14 +1,15 @@
 # Se realiza las importaciones
 import time
+import random
 import threading
 import queue
+import sys
 
-# Se define la Clase para representar un mensaje enviado entre nodos
-class Message:
-    def __init__(self, sender, content, timestamp):
-        self.sender = sender          # Identificador del nodo emisor
-        self.content = content        # Contenido del mensaje
-        self.timestamp = timestamp    # Marca de tiempo del mensaje
+from codec import encode, decode, Request, Reply, Task, Ack, Terminate
+from hlc import HybridLogicalClock
+from termination import TerminationDetector
+from transport import TransportThread, shared_transport
+from link_model import DelayLine
 
 # Se define la clase que representa un nodo en la red distribuida
 class Node:
@@ -16,36 +17,36 @@ class Node:
         self.node_id = node_id                    # Identificador único del nodo
         self.total_nodes = total_nodes            # Número total de nodos en la red
         self.network = network                    # Referencia a la red
-        self.clock = 0                            # Reloj lógico inicializado en 0
+        self.clock = HybridLogicalClock()         # Reloj lógico híbrido (marca empaquetada en 64 bits)
         self.request_queue = []                   # Cola de solicitudes para el algoritmo de Ricart-Agrawala
         self.pending_replies = 0                  # Contador para el algoritmo de Ricart-Agrawala
         self.terminate_flag = False               # Bandera para indicar la terminación de procesos
-        self.parent = None                        # Nodo padre en el algoritmo de Dijkstra-Scholten
-        self.active_children = set()              # Hijos activos en el algoritmo de Dijkstra-Scholten
+        self.termination = TerminationDetector(node_id)  # Contadores de déficit de Dijkstra-Scholten
+        self.terminated = threading.Event()       # Señal de terminación detectada (sólo en la raíz)
+        self.lock = threading.Lock()              # Protege el detector entre el hilo del nodo y el principal
         self.memory = {}                          # Memoria del nodo
         self.garbage_collected = set()            # Conjunto para objetos recolectados por basura
 
     
     # Se define send_message 
-    # Método para enviar un mensaje al nodo especificado
-    def send_message(self, receiver_id, content):
-        message = Message(self.node_id, content, self.clock)  # Crear el mensaje con el contenido y el reloj local
-        self.clock += 1                                       # Incrementar el reloj lógico local
+    # Método para enviar un mensaje al nodo especificado; `kind` es una clase del codec (codec.py)
+    def send_message(self, receiver_id, kind, *fields):
+        message = kind(self.node_id, self.clock.now(), *fields)  # Crear el mensaje con una marca HLC nueva
         self.network.send_message(receiver_id, message)       # Enviar el mensaje a través de la red
 
     # Método para manejar un mensaje recibido
     def handle_message(self, message):
-        print(f"Nodo {self.node_id} recibió mensaje de Nodo {message.sender}: {message.content}")
+        print(f"Nodo {self.node_id} recibió mensaje de Nodo {message.sender}: {message}")
 
     # Método para solicitar la sección crítica
     def request_cs(self):
-        self.clock += 1  # Incrementar el reloj lógico local
-        request_message = Message(self.node_id, "request", self.clock)  # Crear mensaje de solicitud
+        request_timestamp = self.clock.now()
+        request_message = Request(self.node_id, request_timestamp, request_timestamp, None)  # Crear mensaje de solicitud
         self.request_queue.append(request_message)  # Agregar el mensaje de solicitud a la cola
         # Enviar mensajes de solicitud a todos los otros nodos
         for node_id in range(self.total_nodes):
             if node_id != self.node_id:
-                self.send_message(node_id, request_message.content)
+                self.send_message(node_id, Request, request_timestamp, None)
                 self.pending_replies += 1  # Incrementar el contador de respuestas pendientes
 
         # Esperar a que lleguen todas las respuestas
@@ -62,10 +63,9 @@ class Node:
         print(f"Nodo {self.node_id} salió de la sección crítica.")
 
         # Enviar respuestas a los nodos que lo solicitaron
-        reply_message = Message(self.node_id, "reply", self.clock)
         for request in self.request_queue:
             if request.sender != self.node_id:
-                self.send_message(request.sender, reply_message.content)
+                self.send_message(request.sender, Reply)
         self.request_queue = []  # Limpiar la cola de solicitudes al salir de la sección crítica
 
     # Método para manejar una solicitud de sección crítica recibida
@@ -73,18 +73,15 @@ class Node:
         if self.terminate_flag:
             return
 
-        self.clock = max(self.clock, message.timestamp) + 1  # Actualizar el reloj lógico local
         self.request_queue.append(message)  # Agregar a la cola de solicitudes
         if self.request_cs_allowed(message):
-            reply_message = Message(self.node_id, "reply", self.clock)
-            self.send_message(message.sender, reply_message.content)  # Enviar respuesta de aceptación
+            self.send_message(message.sender, Reply)  # Enviar respuesta de aceptación
 
     # Método para manejar una respuesta de sección crítica recibida
     def handle_reply(self, message):
         if self.terminate_flag:
             return
 
-        self.clock = max(self.clock, message.timestamp) + 1  # Actualizar el reloj lógico local
         self.pending_replies -= 1  # Decrementar contador de respuestas pendientes
 
     # Método para verificar si se permite la solicitud de sección crítica
@@ -99,24 +96,60 @@ class Node:
         self.terminate_flag = True
 
     # Método para iniciar el algoritmo de Dijkstra-Scholten para detección de terminación
-    def start_dijkstra_scholten(self):
-        terminate_message = Message(self.node_id, "terminate", self.clock)
-        for node_id in range(self.total_nodes):
-            if node_id != self.node_id:
-                self.send_message(node_id, terminate_message.content)
-        self.terminate_process()
-        print(f"Nodo {self.node_id} ha marcado su proceso como terminado.")
+    # El nodo se convierte en raíz de una computación difusa de `budget` tareas;
+    # la terminación se detecta con contadores de déficit, sin difundir mensajes
+    def start_dijkstra_scholten(self, budget, fanout=2):
+        with self.lock:
+            self.termination.start()
+            self.terminated.clear()
+        self.send_tasks(budget, fanout)
+        self.flush_acks()
+
+    # Método para repartir un presupuesto de tareas entre hasta `fanout` nodos al azar
+    def send_tasks(self, budget, fanout):
+        children = min(fanout, budget)
+        if children == 0:
+            return
+        share, extra = divmod(budget, children)
+        with self.lock:
+            self.termination.on_send(children)  # Reservar el déficit antes de enviar
+        for i in range(children):
+            self.send_message(random.randrange(self.total_nodes), Task, share + (i < extra), fanout, None)
+
+    # Método para manejar una tarea recibida de la computación difusa
+    def handle_task(self, message):
+        budget, fanout = message.budget, message.fanout
+        with self.lock:
+            self.termination.on_receive(message.sender)
+        self.send_tasks(budget - 1, fanout)
+        self.flush_acks()
+
+    # Método para manejar un ack (con contador) de Dijkstra-Scholten
+    def handle_ack(self, message):
+        with self.lock:
+            self.termination.on_ack(message.count)
+        self.flush_acks()
+
+    # Método para enviar los acks acumulados cuando el nodo queda pasivo
+    def flush_acks(self):
+        with self.lock:
+            acks = self.termination.on_passive()
+            terminated = self.termination.terminated
+        for receiver_id, count in acks:
+            self.send_message(receiver_id, Ack, count)
+        if terminated and not self.terminated.is_set():
+            print(f"Nodo {self.node_id} detectó la terminación de la computación difusa.")
+            self.terminated.set()
 
     # Método para manejar un mensaje de terminación recibido
     def handle_terminate(self, message):
         if not self.terminate_flag:
-            self.terminate_flag = True
-            print(f"Nodo {self.node_id} ha detectado la terminación del proceso de Nodo {message.sender}.")
-            self.start_dijkstra_scholten()
+            self.terminate_process()
+            print(f"Nodo {self.node_id} ha marcado su proceso como terminado.")
 
     # Método para sincronizar el reloj del nodo con el reloj global
     def synchronize_clocks(self):
-        self.clock = self.network.get_global_time()
+        self.clock.update(self.network.get_global_time())  # Nunca hace retroceder el reloj
         print(f"Nodo {self.node_id} sincronizó su reloj a {self.clock}.")
 
     # Método para realizar la recolección de basura
@@ -138,7 +171,7 @@ class Node:
             if obj in marked:
                 return
             marked.add(obj)
-            for reference in obj.references():
+            for reference in getattr(obj, "references", tuple)():  # Objetos sin referencias salientes
                 dfs(reference)
 
         for root in roots:
@@ -157,26 +190,44 @@ class Node:
         self.memory[id(obj)] = obj
 
 # Clase que representa la red de nodos distribuidos
+# Con un transporte (TransportThread de transport.py) los mensajes pasan por
+# sockets en lugar de ir directamente al buzón. Con `link` (LinkModel de
+# link_model.py) y sin transporte, cada mensaje llega al buzón cuando el
+# modelo lo indica, entregado por un DelayLine
 class Network:
-    def __init__(self, total_nodes):
+    def __init__(self, total_nodes, transport=None, link=None):
         self.total_nodes = total_nodes                      # Número total de nodos en la red
         self.nodes = [Node(node_id, total_nodes, self) for node_id in range(total_nodes)]  # Crear nodos en la red
-        self.messages = queue.Queue()                      # Cola de mensajes entre nodos
-        self.global_time = 0                               # Reloj global para sincronización de relojes
-        self.lock = threading.Lock()                       # Bloqueo para sincronizar el acceso a la cola de mensajes
+        self.messages = [queue.Queue() for _ in range(total_nodes)]  # Un buzón por nodo de mensajes codificados (queue.Queue ya es seguro entre hilos)
+        self.clock = HybridLogicalClock()                  # Reloj de la red para sincronizar los nodos
+        self.global_time = 0                               # Última marca HLC difundida a los nodos
+        self.transport = transport                         # Transporte opcional por sockets
+        self.link = link                                   # Modelo de enlace opcional
+        self.delay_line = DelayLine() if link is not None and transport is None else None
 
     # Método para enviar un mensaje a un nodo específico
     def send_message(self, receiver_id, message):
-        with self.lock:
-            self.messages.put((receiver_id, message))
-
-    # Método para obtener el próximo mensaje de la cola de mensajes
-    def get_message(self):
-        with self.lock:
-            return self.messages.get()
+        if self.transport is not None:
+            self.transport.send(message.sender, receiver_id, encode(message))
+        elif self.delay_line is not None:
+            data, now = encode(message), time.monotonic()
+            for delay in self.link.delays(message.sender, receiver_id, len(data), now):
+                self.delay_line.call_at(now + delay, self.messages[receiver_id].put, data)
+        else:
+            self.messages[receiver_id].put(encode(message))
+
+    # Método que entrega en el buzón un mensaje llegado por el transporte
+    def deliver(self, sender_id, receiver_id, data):
+        self.messages[receiver_id].put(data)
+
+    # Método para obtener y decodificar el próximo mensaje del buzón de un nodo
+    def get_message(self, node_id):
+        return decode(self.messages[node_id].get())
 
     # Método para iniciar la red de nodos
-    def start(self):
+    def start(self, budget=20):
+        if self.transport is not None:
+            self.transport.start(self.deliver)
         threads = []
         for node in self.nodes:
             thread = threading.Thread(target=self.run_node, args=(node,))
@@ -184,28 +235,52 @@ class Network:
             thread.start()
 
         # Solicitar la sección crítica para cada nodo después de iniciarlo
-        for node in self.nodes:
-            threading.Thread(target=node.request_cs).start()
+        requesters = [threading.Thread(target=node.request_cs) for node in self.nodes]
+        for thread in requesters:
+            thread.start()
+
+        # Computación difusa con raíz en el nodo 0 y detección de terminación
+        root = self.nodes[0]
+        root.start_dijkstra_scholten(budget)
+        root.terminated.wait()
 
+        for thread in requesters:
+            thread.join()
+        self.shutdown()
         for thread in threads:
             thread.join()
+        if self.transport is not None:
+            self.transport.close()
+        if self.delay_line is not None:
+            self.delay_line.close()
+
+    # Método para detener todos los nodos: un único mensaje por nodo (O(n))
+    def shutdown(self):
+        for node_id in range(self.total_nodes):
+            self.send_message(node_id, Terminate(-1, 0))
 
     # Método para ejecutar un nodo específico
     def run_node(self, node):
         while True:
-            receiver_id, message = self.get_message()   # Obtener el siguiente mensaje de la cola
-            if message.content == "terminate":
+            message = self.get_message(node.node_id)    # Obtener el siguiente mensaje del buzón del nodo
+            node.clock.update(message.timestamp)        # Todo mensaje recibido se fusiona en el HLC local, sea del tipo que sea
+            kind = type(message)
+            if kind is Terminate:
                 node.handle_terminate(message)          # Manejar mensaje de terminación
                 break
             node.handle_message(message)                # Manejar el mensaje recibido
-            if message.content == "request":
+            if kind is Request:
                 node.handle_request(message)            # Manejar solicitud de sección crítica
-            elif message.content == "reply":
+            elif kind is Reply:
                 node.handle_reply(message)              # Manejar respuesta de sección crítica
+            elif kind is Task:
+                node.handle_task(message)               # Manejar tarea de la computación difusa
+            elif kind is Ack:
+                node.handle_ack(message)                # Manejar ack de Dijkstra-Scholten
 
     # Método para sincronizar los relojes de todos los nodos en la red
     def synchronize_clocks(self):
-        self.global_time = time.time()  # Usar el tiempo actual como simulación de tiempo global
+        self.global_time = self.clock.now()  # Marca HLC empaquetada, comparable con la de los nodos
         for node in self.nodes:
             node.synchronize_clocks()
 
@@ -219,9 +294,11 @@ class Network:
             node.garbage_collect()  # Llamar al método de recolección de basura del nodo
 
 # Ejecutar la simulación
-def main():
+# kind puede ser None (buzones en memoria), 'uds' o 'tcp'
+def main(kind=None):
     total_nodes = 5  # Número total de nodos en la red
-    network = Network(total_nodes)
+    transport = TransportThread(shared_transport(kind, range(total_nodes), 'ejercicio3m')) if kind else None
+    network = Network(total_nodes, transport)
 
     # Simular añadiendo objetos a la memoria de los nodos
     for node in network.nodes:
@@ -238,7 +315,7 @@ def main():
     network.garbage_collect()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
 
 
 
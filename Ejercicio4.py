@@ -1,144 +1,1200 @@
 # Se realiza importaciones y configuracion
 import asyncio
+import heapq
 import random
 import logging
-from collections import defaultdict
+import os
+import sys
+import tempfile
+import time
 from enum import Enum
 
-logging.basicConfig(level=logging.INFO)
+from codec import encode, decode, RequestVote, Vote, AppendEntries, AppendReply, InstallSnapshot, PreVote, PreVoteReply
+from raft_log import SegmentedLog
+from raft_storage import MemoryStorage, MmapStorage
+from state_machine import KVStore
+from link_model import LinkModel, LogNormal
+from transport import SocketTransport, local_address
+
 logger = logging.getLogger(__name__)
 # Se define la clase NetworkPartition
+# Cada partición activa ocupa un bit y cada nodo guarda la máscara de las
+# particiones a las que pertenece. Dos nodos se comunican sólo si están del
+# mismo lado de todas las particiones activas, es decir, si sus máscaras
+# coinciden: la comprobación por mensaje es O(1) aunque las particiones se
+# solapen, y añadir o curar una partición sólo toca a sus miembros.
 class NetworkPartition:
     def __init__(self):
-        self.partitions = defaultdict(set)
+        self.partitions = {}
+        self.masks = {}
+        self.bits = {}
+        self.free_bits = []
+        self.next_partition_id = 0
 
     def is_partitioned(self, node1, node2):
-        for partition in self.partitions.values():
-            if node1 in partition and node2 in partition:
-                return True
-        return False
+        return self.masks.get(node1, 0) != self.masks.get(node2, 0)
 
     def add_partition(self, nodes):
-        partition_id = len(self.partitions)
-        self.partitions[partition_id] = set(nodes)
-        logger.info(f'Added partition {partition_id} with nodes {nodes}')
+        # Se aceptan tanto identificadores como objetos RaftNode
+        members = {getattr(node, 'id', node) for node in nodes}
+        partition_id = self.next_partition_id
+        self.next_partition_id += 1
+        bit = 1 << (self.free_bits.pop() if self.free_bits else len(self.bits))
+        self.partitions[partition_id] = members
+        self.bits[partition_id] = bit
+        for node_id in members:
+            self.masks[node_id] = self.masks.get(node_id, 0) | bit
+        logger.info(f'Added partition {partition_id} with nodes {sorted(members)}')
+        return partition_id
 
     def heal_partition(self, partition_id):
         if partition_id in self.partitions:
-            del self.partitions[partition_id]
+            members = self.partitions.pop(partition_id)
+            bit = self.bits.pop(partition_id)
+            for node_id in members:
+                mask = self.masks[node_id] & ~bit
+                if mask:
+                    self.masks[node_id] = mask
+                else:
+                    del self.masks[node_id]
+            self.free_bits.append(bit.bit_length() - 1)
             logger.info(f'Healed partition {partition_id}')
 
 class NodeStatus(Enum):
     UP = 1
     DOWN = 2
 
+class Role(Enum):
+    FOLLOWER = 1
+    CANDIDATE = 2
+    LEADER = 3
+    PRE_CANDIDATE = 4
+
+class NotLeaderError(Exception):
+    pass
+
 # Se realiza el Paso 2: Nodo Raft con latencia simulada
+#
+# El log usa índices desde 1 y cada entrada es una tupla (term, command). Los
+# mensajes son clases del codec binario (codec.py), de ida y sin respuesta
+# implícita; send_message los codifica y el receptor los decodifica:
+#   RequestVote(term, last_log_index, last_log_term)
+#   Vote(term, granted)
+#   AppendEntries(term, prev_index, prev_term, leader_commit, seq, entries)
+#   AppendReply(term, success, index, prev_index, seq)
+#   InstallSnapshot(term, snapshot_index, snapshot_term, seq, state)
+#   PreVote(term, last_log_index, last_log_term)
+#   PreVoteReply(term, granted)
+# En AppendReply, index es el match del seguidor si success es True o una
+# pista para retroceder si es False; prev_index identifica la petición y seq
+# devuelve la ronda de latidos del líder (ver lecturas más abajo).
+# InstallSnapshot se responde con un AppendReply cuyo index es el de la
+# instantánea.
+#
+# El líder replica a cada seguidor en dos estados, como los Progress de etcd:
+# en 'probe' envía un único AppendEntries y espera la respuesta para
+# encontrar el punto de coincidencia; en 'replicate' avanza next_index de
+# forma optimista y mantiene hasta max_inflight lotes de max_batch entradas en
+# vuelo. Si un lote se pierde o llega desordenado, el seguidor lo rechaza y
+# vuelve a 'probe'.
+#
+# Los enlaces simulados siguen `link` (LinkModel de link_model.py, compartido
+# por todo el clúster si se pasa a create_cluster); por omisión, latencia
+# uniforme en `latency` y orden FIFO por enlace.
+#
+# Las entradas confirmadas se aplican a la máquina de estados (state_machine,
+# por defecto el KVStore de state_machine.py) en una tarea aparte, por lotes
+# de apply_batch entradas: confirmar no espera a aplicar, y mientras se aplica
+# un lote siguen llegando y confirmándose los siguientes. apply_lag() es la
+# distancia entre commit_index y last_applied. append_entries devuelve al
+# confirmar; execute (y put/get) devuelve el resultado de aplicar.
+#
+# Cada snapshot_threshold entradas aplicadas el nodo toma una instantánea de
+# su máquina de estados y compacta el log hasta ella. Un seguidor que necesita
+# entradas ya compactadas recibe la instantánea con InstallSnapshot y después
+# sólo la cola del log, de modo que ponerse al día cuesta el tamaño de la
+# instantánea y no el de toda la historia.
+#
+# El término, el voto, el log y la instantánea se escriben en `storage`
+# (raft_storage). Las respuestas a votos y AppendEntries sólo salen después de
+# sincronizar, y el líder sólo cuenta en la mayoría las entradas propias ya
+# sincronizadas. crash() descarta todo el estado en memoria y recover() lo
+# reconstruye desde el almacenamiento.
+#
+# Elecciones: cada tick un seguidor suma election_elapsed, que se reinicia al
+# recibir AppendEntries o InstallSnapshot del líder o al conceder un voto. Al
+# alcanzar su plazo, elegido al azar en [election_ticks, 2 * election_ticks),
+# el nodo hace campaña. Con pre_vote primero pregunta con PreVote, sin cambiar
+# su término, si ganaría: sólo si una mayoría responde que sí empieza la
+# elección real. Así un nodo aislado que vuelve no obliga al líder a dimitir
+# con un término inflado. Los votos se piden a todos a la vez y el recuento
+# termina en cuanto hay mayoría a favor o en contra.
+# Mientras un nodo sabe de un líder vigente (seguidor que ha oído al líder
+# dentro de election_ticks, o líder con arrendamiento) ignora RequestVote de
+# términos mayores y niega PreVote.
+#
+# Con un transporte (transport.py, ver connect_cluster) los mensajes viajan
+# por sockets reales en lugar de la latencia simulada; el resto del nodo no
+# cambia.
+#
+# Lecturas linealizables sin pasar por el log (read):
+# - ReadIndex: la lectura toma commit_index como índice de lectura y espera
+#   a que una mayoría responda a una ronda de latidos iniciada después de su
+#   llegada; todas las lecturas que llegan mientras una ronda está en curso
+#   comparten la siguiente. Después se sirve en cuanto last_applied la alcanza.
+# - Lease: cada ronda confirmada por una mayoría extiende el arrendamiento
+#   hasta el instante de envío más lease_duration (tiempo monótono del bucle);
+#   mientras dure, el líder lee sin ronda. lease_duration debe ser menor que el
+#   tiempo mínimo en que otro nodo puede ser elegido.
 
 class RaftNode:
-    def __init__(self, id, network, nodes):
+    def __init__(self, id, network, nodes, latency=(0.1, 0.5), max_batch=64, max_inflight=4,
+                 tick_interval=0.1, heartbeat_ticks=5, election_ticks=20, pre_vote=True, snapshot_threshold=4096,
+                 segment_size=1024, storage=None, lease_duration=1.0, state_machine=KVStore, apply_batch=256,
+                 link=None, rng=None):
         self.id = id
         self.status = NodeStatus.UP
         self.network = network
         self.nodes = nodes
         self.term = 0
         self.voted_for = None
-        self.log = []
+        self.log = SegmentedLog(segment_size)
         self.commit_index = 0
+        self.last_applied = 0
         self.data_version = 0
+        # `state_machine` crea la máquina de estados; se recrea al recuperarse
+        self.state_machine_factory = state_machine
+        self.state_machine = None
+        self.apply_batch = apply_batch
+        self.applier = None
+        self.max_apply_lag = 0
+        self.snapshot_threshold = snapshot_threshold
+        self.snapshot = None
+        self.storage = storage or MemoryStorage()
+        self.durable_index = 0
+        self.role = Role.FOLLOWER
+        self.leader_id = None
+        self.votes = set()
+        self.rejections = set()
+        self.max_batch = max_batch
+        self.max_inflight = max_inflight
+        self.tick_interval = tick_interval
+        self.heartbeat_ticks = heartbeat_ticks
+        self.heartbeat_elapsed = 0
+        self.election_ticks = election_ticks
+        self.pre_vote = pre_vote
+        self.rng = rng or random
+        self.link = link or LinkModel(latency, rng=self.rng)
+        self.election_elapsed = 0
+        self.election_timeout = election_ticks
+        # Estado del líder por seguidor
+        self.next_index = {}
+        self.match_index = {}
+        self.progress = {}
+        self.inflight = {}
+        # Futuros de clientes indexados por posición en el log: al confirmar
+        # y al aplicar
+        self.commit_waiters = {}
+        self.apply_futures = {}
+        # Lecturas: rondas de latidos numeradas y confirmadas por mayoría
+        self.lease_duration = lease_duration
+        self.lease_expiry = 0.0
+        self.read_seq = 0
+        self.read_round_sent = {}
+        self.ack_seq = {}
+        self.read_queue = []
+        self.read_rounds = {}
+        self.read_round_scheduled = False
+        self.apply_waiters = []
+        self.flush_scheduled = False
+        self.messages_sent = 0
+        self.transport = None
+        self.background_tasks = set()
+        self.ticker = None
+        self.load_from_storage()
+
+    # Estado persistente desde el almacenamiento; el volátil vuelve a cero y la
+    # máquina de estados se reconstruye desde la instantánea
+    def load_from_storage(self):
+        self.log = SegmentedLog(self.log.segment_size)
+        self.term, self.voted_for, self.snapshot = self.storage.load(self.log)
+        self.role = Role.FOLLOWER
+        self.leader_id = None
+        self.votes = set()
+        self.reset_election_timer()
+        self.state_machine = self.state_machine_factory()
+        self.applier = None
+        self.commit_index = self.last_applied = 0
+        if self.snapshot is not None:
+            self.state_machine.restore(self.snapshot[2])
+            self.commit_index = self.last_applied = self.snapshot[0]
+        self.durable_index = self.last_log_index()
+
+    def quorum(self):
+        return len(self.nodes) // 2 + 1
+
+    def peers(self):
+        return [node for node in self.nodes if node is not self]
+
+    def last_log_index(self):
+        return self.log.last_index()
+
+    def last_log_term(self):
+        return self.log.last_term()
+
+    def term_at(self, index):
+        return self.log.term_at(index)
+
+    def entries_from(self, index, limit):
+        return self.log.entries_from(index, limit)
+
+    def truncate_from(self, index):
+        self.log.truncate_from(index)
+        self.storage.truncate_from(index)
+
+    def append_to_log(self, entries):
+        start = self.last_log_index() + 1
+        self.log.append(entries)
+        self.storage.append(start, entries)
+
+    def persist_state(self):
+        self.storage.save_state(self.term, self.voted_for)
+
+    # Las respuestas que dependen de lo escrito salen tras sincronizar
+    def post_durable(self, recipient, message):
+        if self.storage.needs_sync:
+            self.spawn(self.send_after_sync(recipient, message))
+        else:
+            self.post(recipient, message)
+
+    async def send_after_sync(self, recipient, message):
+        await self.storage.sync()
+        await self.send_message(recipient, message)
+
+    # El líder cuenta su propia copia en la mayoría sólo cuando es duradera
+    def sync_own_log(self):
+        if not self.storage.needs_sync:
+            self.durable_index = self.last_log_index()
+            return
+        self.spawn(self.sync_own_log_async(self.last_log_index()))
+
+    async def sync_own_log_async(self, index):
+        await self.storage.sync()
+        if index > self.durable_index:
+            self.durable_index = index
+            if self.role == Role.LEADER:
+                self.advance_commit()
+
+    def start(self):
+        if self.ticker is None:
+            self.ticker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        pending = [task for task in (self.ticker, *self.background_tasks) if task is not None]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.ticker = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            if self.status == NodeStatus.UP:
+                self.tick()
+
+    def tick(self):
+        if self.role == Role.LEADER:
+            self.heartbeat_elapsed += 1
+            if self.heartbeat_elapsed >= self.heartbeat_ticks:
+                self.heartbeat_elapsed = 0
+                self.broadcast_heartbeat()
+        else:
+            self.election_elapsed += 1
+            if self.election_elapsed >= self.election_timeout:
+                self.campaign()
+
+    def reset_election_timer(self):
+        self.election_elapsed = 0
+        self.election_timeout = self.rng.randrange(self.election_ticks, 2 * self.election_ticks)
+
+    # Hay un líder vigente: votar por otro sólo serviría para derribarlo
+    def in_lease(self):
+        if self.role == Role.LEADER:
+            return asyncio.get_running_loop().time() < self.lease_expiry
+        return self.leader_id is not None and self.election_elapsed < self.election_ticks
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def can_reach(self, recipient):
+        return self.status == NodeStatus.UP and recipient.status == NodeStatus.UP and not self.network.is_partitioned(self.id, recipient.id)
 
     async def send_message(self, recipient, message):
-        if self.status == NodeStatus.UP and recipient.status == NodeStatus.UP and not self.network.is_partitioned(self.id, recipient.id):
-            await asyncio.sleep(random.uniform(0.1, 0.5))  # Simulación de latencia de red
-            await recipient.receive_message(self, message)
+        if self.transport is not None:
+            self.send_over_transport(recipient, message)
+        elif self.can_reach(recipient):
+            self.messages_sent += 1
+            data = encode(message)
+            # El modelo de enlace decide si el mensaje llega, cuántas veces y cuándo
+            now = asyncio.get_running_loop().time()
+            arrivals = [now + delay for delay in self.link.delays(self.id, recipient.id, len(data), now)]
+            for deliver_at in arrivals[1:]:
+                self.spawn(self.deliver_at(recipient, data, deliver_at))
+            if arrivals:
+                await self.deliver_at(recipient, data, arrivals[0])
 
-    async def receive_message(self, sender, message):
-        logger.info(f'Node {self.id} received message from Node {sender.id}: {message}')
+    async def deliver_at(self, recipient, data, deliver_at):
+        await asyncio.sleep(deliver_at - asyncio.get_running_loop().time())
+        if self.can_reach(recipient):
+            await recipient.receive_message(self, data)
+
+    # Envío sin esperar: los manejadores nunca se anidan dentro del emisor
+    def post(self, recipient, message):
+        if self.transport is not None:
+            self.send_over_transport(recipient, message)
+        else:
+            self.spawn(self.send_message(recipient, message))
+
+    # El transporte no bloquea y ya entrega en otra iteración del bucle
+    def send_over_transport(self, recipient, message):
+        if self.can_reach(recipient):
+            self.messages_sent += 1
+            self.transport.send(self.id, recipient.id, encode(message))
+
+    async def receive_message(self, sender, data):
+        message = decode(data)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'Node {self.id} received message from Node {sender.id}: {message}')
         self.process_message(sender, message)
 
     def process_message(self, sender, message):
-        msg_type, term, *data = message
-        if msg_type == 'request_vote':
-            self.handle_vote_request(sender, term)
-        elif msg_type == 'append_entries':
-            self.handle_append_entries(sender, term, data)
+        kind = type(message)
+        if message.term > self.term:
+            if kind is RequestVote and self.in_lease():
+                return
+            # La pre-votación nunca cambia términos, salvo un rechazo de un
+            # nodo que va por delante
+            if kind is not PreVote and not (kind is PreVoteReply and message.granted):
+                self.become_follower(message.term)
+        if kind is RequestVote:
+            self.handle_vote_request(sender, message.term, message.last_log_index, message.last_log_term)
+        elif kind is Vote:
+            self.handle_vote(sender, message.term, message.granted)
+        elif kind is AppendEntries:
+            self.handle_append_entries(sender, message)
+        elif kind is AppendReply:
+            self.handle_append_reply(sender, message.term, message.success, message.index, message.prev_index,
+                                     message.seq)
+        elif kind is InstallSnapshot:
+            self.handle_install_snapshot(sender, message.term, message.snapshot_index, message.snapshot_term,
+                                         message.state, message.seq)
+        elif kind is PreVote:
+            self.handle_pre_vote(sender, message.term, message.last_log_index, message.last_log_term)
+        elif kind is PreVoteReply:
+            self.handle_pre_vote_reply(sender, message.term, message.granted)
+
+    def become_follower(self, term, leader_id=None):
+        was_leader = self.role == Role.LEADER
+        if term > self.term:
+            self.term = term
+            self.voted_for = None
+            self.persist_state()
+        self.role = Role.FOLLOWER
+        self.leader_id = leader_id
+        if was_leader:
+            logger.info(f'Node {self.id} stepped down in term {self.term}')
+            self.fail_waiters()
+
+    def fail_waiters(self):
+        waiters = [*self.commit_waiters.values(), *self.apply_futures.values()]
+        self.commit_waiters, self.apply_futures = {}, {}
+        reads = [future for _, _, future in self.read_queue]
+        reads += [future for batch in self.read_rounds.values() for _, _, future in batch]
+        reads += [future for _, _, _, future in self.apply_waiters]
+        self.read_queue, self.read_rounds, self.apply_waiters = [], {}, []
+        self.lease_expiry = 0.0
+        for future in [*waiters, *reads]:
+            if not future.done():
+                future.set_exception(NotLeaderError(f'Node {self.id} is no longer leader'))
+
+    def campaign(self):
+        if self.pre_vote:
+            self.start_pre_vote()
+        else:
+            self.become_candidate()
+
+    def start_pre_vote(self):
+        self.role = Role.PRE_CANDIDATE
+        self.leader_id = None
+        self.votes = {self.id}
+        self.rejections = set()
+        self.reset_election_timer()
+        if len(self.votes) >= self.quorum():
+            self.become_candidate()
+            return
+        request = PreVote(self.term + 1, self.last_log_index(), self.last_log_term())
+        for node in self.peers():
+            self.post(node, request)
+
+    # Nada se persiste: se responde lo que se votaría en el término propuesto
+    def handle_pre_vote(self, sender, term, last_log_index, last_log_term):
+        up_to_date = (last_log_term, last_log_index) >= (self.last_log_term(), self.last_log_index())
+        granted = term > self.term and up_to_date and not self.in_lease()
+        self.post(sender, PreVoteReply(term if granted else self.term, granted))
+
+    def handle_pre_vote_reply(self, sender, term, granted):
+        if self.role != Role.PRE_CANDIDATE or term != (self.term + 1 if granted else self.term):
+            return
+        self.count_vote(sender, granted, self.become_candidate)
+
+    # Recuento común a PreVote y RequestVote: termina con mayoría a favor o en contra
+    def count_vote(self, sender, granted, on_win):
+        (self.votes if granted else self.rejections).add(sender.id)
+        if len(self.votes) >= self.quorum():
+            on_win()
+        elif len(self.rejections) >= self.quorum():
+            self.become_follower(self.term)
 
+    # Campaña forzada, sin pre-votación (arranque de los ejemplos y pruebas)
     async def start_election(self):
+        self.become_candidate()
+
+    def become_candidate(self):
         self.term += 1
+        self.role = Role.CANDIDATE
         self.voted_for = self.id
-        votes = 1  # Voto por sí mismo
-        for node in self.nodes:
-            if node.id != self.id:
-                await self.send_message(node, ('request_vote', self.term))
-        # Esperar respuestas de votación y contar votos
-        # Si recibe la mayoría, se convierte en líder
-        # Aquí se omite la lógica completa por simplicidad
+        self.leader_id = None
+        self.votes = {self.id}  # Voto por sí mismo
+        self.rejections = set()
+        self.reset_election_timer()
+        self.persist_state()
+        logger.info(f'Node {self.id} started election for term {self.term}')
+        if len(self.votes) >= self.quorum():
+            self.become_leader()
+            return
+        request = RequestVote(self.term, self.last_log_index(), self.last_log_term())
+        for node in self.peers():
+            self.post_durable(node, request)
+
+    def handle_vote_request(self, sender, term, last_log_index, last_log_term):
+        # Sólo se concede el voto a candidatos con un log al menos tan actualizado
+        up_to_date = (last_log_term, last_log_index) >= (self.last_log_term(), self.last_log_index())
+        granted = term == self.term and self.voted_for in (None, sender.id) and up_to_date
+        if granted:
+            self.voted_for = sender.id
+            self.persist_state()
+            self.election_elapsed = 0
+            logger.info(f'Node {self.id} voted for Node {sender.id} in term {term}')
+        self.post_durable(sender, Vote(self.term, granted))
+
+    def handle_vote(self, sender, term, granted):
+        if self.role != Role.CANDIDATE or term != self.term:
+            return
+        self.count_vote(sender, granted, self.become_leader)
+
+    def become_leader(self):
+        self.role = Role.LEADER
+        self.leader_id = self.id
+        self.heartbeat_elapsed = 0
+        logger.info(f'Node {self.id} became leader in term {self.term}')
+        for node in self.peers():
+            self.next_index[node.id] = self.last_log_index() + 1
+            self.match_index[node.id] = 0
+            self.progress[node.id] = 'probe'
+            self.inflight[node.id] = 0
+            self.ack_seq[node.id] = 0
+        self.read_round_sent = {}
+        # Entrada vacía del nuevo término: permite confirmar las de términos anteriores
+        self.append_to_log([(self.term, None)])
+        self.sync_own_log()
+        self.advance_commit()
+        self.broadcast_heartbeat()
+
+    # Añade las entradas y devuelve un futuro registrado en `waiters` para la
+    # última de ellas. Un lote vacío no añade ningún índice y pisaría el futuro
+    # de quien ya espera por el último, así que se rechaza
+    def propose(self, entries, waiters):
+        if not entries:
+            raise ValueError('Cannot propose an empty batch of entries')
+        if self.role != Role.LEADER or self.status != NodeStatus.UP:
+            raise NotLeaderError(f'Node {self.id} is not the leader')
+        self.append_to_log([(self.term, entry) for entry in entries])
+        self.sync_own_log()
+        future = waiters[self.last_log_index()] = asyncio.get_running_loop().create_future()
+        # Las entradas de varios clientes en la misma iteración del bucle se
+        # agrupan en un único lote por seguidor
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.advance_commit()
+        return future
 
     async def append_entries(self, entries):
-        self.log.extend(entries)
-        self.commit_index = len(self.log)
+        return await self.propose(entries, self.commit_waiters)
+
+    async def execute(self, command):
+        return await self.propose([command], self.apply_futures)
+
+    async def put(self, key, value):
+        return await self.execute(('put', key, value))
+
+    async def delete(self, key):
+        return await self.execute(('delete', key))
+
+    # Lectura linealizable sin pasar por el log
+    async def get(self, key, lease=False):
+        return await self.read(('get', key), lease)
+
+    async def read(self, query=None, lease=False):
+        if self.role != Role.LEADER or self.status != NodeStatus.UP:
+            raise NotLeaderError(f'Node {self.id} is not the leader')
+        loop = asyncio.get_running_loop()
+        # Hasta confirmar una entrada de su término el líder no conoce el
+        # commit_index real; la entrada vacía de become_leader lo resuelve
+        while self.term_at(self.commit_index) != self.term:
+            await self.wait_commit(self.last_log_index())
+        future = loop.create_future()
+        if lease and loop.time() < self.lease_expiry:
+            self.wait_applied(self.commit_index, query, future)
+        else:
+            self.read_queue.append((self.commit_index, query, future))
+            if not self.read_round_scheduled and not self.read_rounds:
+                self.read_round_scheduled = True
+                loop.call_soon(self.start_read_round)
+        return await future
+
+    async def wait_commit(self, index):
+        if index <= self.commit_index:
+            return
+        future = self.commit_waiters.get(index)
+        if future is None:
+            future = self.commit_waiters[index] = asyncio.get_running_loop().create_future()
+        await asyncio.shield(future)
+
+    # Una ronda por lote: las lecturas que llegan mientras hay otra en curso
+    # esperan a la siguiente
+    def start_read_round(self):
+        self.read_round_scheduled = False
+        if self.role != Role.LEADER or not self.read_queue:
+            return
+        batch, self.read_queue = self.read_queue, []
+        self.broadcast_heartbeat()
+        self.read_rounds[self.read_seq] = batch
+        self.confirm_reads()
+
+    def confirm_reads(self):
+        acks = sorted([self.read_seq, *(self.ack_seq[node.id] for node in self.peers())], reverse=True)
+        confirmed = acks[self.quorum() - 1]
+        sent = self.read_round_sent.get(confirmed)
+        if sent is not None:
+            self.lease_expiry = max(self.lease_expiry, sent + self.lease_duration)
+        for seq in [seq for seq in self.read_round_sent if seq <= confirmed]:
+            del self.read_round_sent[seq]
+        for seq in sorted(seq for seq in self.read_rounds if seq <= confirmed):
+            for read_index, query, future in self.read_rounds.pop(seq):
+                self.wait_applied(read_index, query, future)
+        if self.read_queue and not self.read_rounds and not self.read_round_scheduled:
+            self.read_round_scheduled = True
+            asyncio.get_running_loop().call_soon(self.start_read_round)
+
+    def wait_applied(self, read_index, query, future):
+        if self.last_applied >= read_index:
+            if not future.done():
+                future.set_result(self.state_machine.query(query))
+        else:
+            heapq.heappush(self.apply_waiters, (read_index, id(future), query, future))
+
+    def flush(self):
+        self.flush_scheduled = False
+        if self.role == Role.LEADER:
+            for node in self.peers():
+                self.replicate(node)
+
+    # En 'probe' el latido reintenta la sonda pendiente; en 'replicate' es un
+    # AppendEntries vacío que, si los lotes en vuelo se perdieron, será
+    # rechazado y devolverá al seguidor a 'probe'
+    def broadcast_heartbeat(self):
+        now = asyncio.get_running_loop().time()
+        self.read_seq += 1
+        self.read_round_sent[self.read_seq] = now
+        # Una ronda sin confirmar más antigua que el arrendamiento ya no puede extenderlo
+        while self.read_round_sent and next(iter(self.read_round_sent.values())) < now - self.lease_duration:
+            del self.read_round_sent[next(iter(self.read_round_sent))]
+        for node in self.peers():
+            if self.progress[node.id] == 'probe':
+                self.inflight[node.id] = 0
+                self.send_append(node)
+            else:
+                self.send_append(node, heartbeat=True)
+                self.replicate(node)
+
+    def replicate(self, node):
+        while self.can_send(node) and self.next_index[node.id] <= self.last_log_index():
+            self.send_append(node)
+
+    def can_send(self, node):
+        if self.progress[node.id] == 'probe':
+            return self.inflight[node.id] == 0
+        return self.inflight[node.id] < self.max_inflight
+
+    def send_append(self, node, heartbeat=False):
+        next_index = self.next_index[node.id]
+        prev_index = next_index - 1
+        if prev_index < self.log.snapshot_index:
+            self.send_snapshot(node)
+            return
+        entries = [] if heartbeat else self.entries_from(next_index, self.max_batch)
+        self.post(node, AppendEntries(self.term, prev_index, self.term_at(prev_index), self.commit_index,
+                                      self.read_seq, entries))
+        if entries:
+            self.inflight[node.id] += 1
+            if self.progress[node.id] == 'replicate':
+                self.next_index[node.id] += len(entries)
+
+    # Las entradas necesarias ya están compactadas: se envía la instantánea y
+    # el seguidor queda en 'probe' hasta que la confirme
+    def send_snapshot(self, node):
+        self.progress[node.id] = 'probe'
+        self.inflight[node.id] = 1
+        index, term, state = self.snapshot
+        self.post(node, InstallSnapshot(self.term, index, term, self.read_seq, state))
+
+    def handle_append_entries(self, sender, message):
+        term, prev_index, prev_term, entries = message.term, message.prev_index, message.prev_term, message.entries
+        leader_commit, seq = message.leader_commit, message.seq
+        if term < self.term:
+            self.post_durable(sender, AppendReply(self.term, False, self.last_log_index(), prev_index, seq))
+            return
+        if self.role != Role.FOLLOWER or self.leader_id != sender.id:
+            self.become_follower(term, sender.id)
+        self.election_elapsed = 0
+        request_prev_index = prev_index
+        if prev_index < self.log.snapshot_index:
+            # Lo que cubre la instantánea local ya está confirmado y coincide
+            skip = min(self.log.snapshot_index - prev_index, len(entries))
+            entries = entries[skip:]
+            prev_index += skip
+            prev_term = self.term_at(prev_index)
+        if prev_index > self.last_log_index() or self.term_at(prev_index) != prev_term:
+            hint = min(prev_index - 1, self.last_log_index())
+            self.post_durable(sender, AppendReply(self.term, False, hint, request_prev_index, seq))
+            return
+        # Se omiten las entradas ya presentes y se trunca sólo ante un conflicto
+        index = prev_index
+        for offset, entry in enumerate(entries):
+            index = prev_index + 1 + offset
+            if index <= self.last_log_index():
+                if self.term_at(index) == entry[0]:
+                    continue
+                self.truncate_from(index)
+            self.append_to_log(entries[offset:])
+            break
+        match = prev_index + len(entries)
+        if entries:
+            logger.debug(f'Node {self.id} appended {len(entries)} entries from Node {sender.id} up to {match}')
+        if leader_commit > self.commit_index:
+            self.set_commit_index(min(leader_commit, match))
+        self.post_durable(sender, AppendReply(self.term, True, match, request_prev_index, seq))
+
+    def handle_install_snapshot(self, sender, term, index, snapshot_term, state, seq):
+        if term < self.term:
+            self.post_durable(sender, AppendReply(self.term, False, self.last_log_index(), index, seq))
+            return
+        if self.role != Role.FOLLOWER or self.leader_id != sender.id:
+            self.become_follower(term, sender.id)
+        self.election_elapsed = 0
+        if index > self.commit_index:
+            # Si el log ya contiene la entrada de la instantánea se conserva la
+            # cola posterior; si no, se descarta entero
+            if self.term_at(index) == snapshot_term:
+                self.log.compact(index, snapshot_term)
+                self.storage.save_snapshot(index, snapshot_term, state)
+            else:
+                self.log.reset(index, snapshot_term)
+                self.storage.install_snapshot(index, snapshot_term, state)
+            self.state_machine.restore(state)
+            self.snapshot = (index, snapshot_term, state)
+            self.commit_index = index
+            self.last_applied = index
+            self.data_version += 1
+            logger.info(f'Node {self.id} installed snapshot up to {index} from Node {sender.id}')
+        self.post_durable(sender, AppendReply(self.term, True, max(index, self.commit_index), index, seq))
+
+    def handle_append_reply(self, sender, term, success, index, prev_index, seq):
+        if self.role != Role.LEADER or term != self.term:
+            return
+        node_id = sender.id
+        if seq > self.ack_seq[node_id]:
+            # Cualquier respuesta del término actual confirma el liderazgo en esa ronda
+            self.ack_seq[node_id] = seq
+            self.confirm_reads()
+        if success:
+            if index > self.match_index[node_id]:
+                self.match_index[node_id] = index
+                self.advance_commit()
+            if self.progress[node_id] == 'probe':
+                self.progress[node_id] = 'replicate'
+                self.next_index[node_id] = self.match_index[node_id] + 1
+                self.inflight[node_id] = 0
+            elif index > prev_index and self.inflight[node_id] > 0:
+                self.inflight[node_id] -= 1
+            self.next_index[node_id] = max(self.next_index[node_id], self.match_index[node_id] + 1)
+        else:
+            # Rechazo obsoleto de un lote anterior: se ignora
+            if prev_index <= self.match_index[node_id]:
+                return
+            if self.progress[node_id] == 'probe' and prev_index != self.next_index[node_id] - 1:
+                return
+            self.progress[node_id] = 'probe'
+            self.inflight[node_id] = 0
+            self.next_index[node_id] = max(self.match_index[node_id] + 1, min(prev_index, index + 1))
+        self.replicate(sender)
+
+    # El líder confirma el mayor índice replicado en una mayoría, siempre que
+    # pertenezca a su término actual
+    def advance_commit(self):
+        matches = sorted([min(self.durable_index, self.last_log_index()), *(self.match_index[node.id] for node in self.peers())], reverse=True)
+        index = matches[self.quorum() - 1]
+        if index > self.commit_index and self.term_at(index) == self.term:
+            self.set_commit_index(index)
+
+    def set_commit_index(self, index):
+        if index <= self.commit_index:
+            return
+        previous = self.commit_index
+        self.commit_index = index
         self.data_version += 1
-        for node in self.nodes:
-            if node.id != self.id:
-                await self.send_message(node, ('append_entries', self.term, entries, self.data_version))
+        for position in range(previous + 1, index + 1):
+            future = self.commit_waiters.pop(position, None)
+            if future is not None and not future.done():
+                future.set_result(position)
+        self.max_apply_lag = max(self.max_apply_lag, self.apply_lag())
+        if self.applier is None:
+            self.applier = asyncio.create_task(self.apply_committed())
+            self.background_tasks.add(self.applier)
+            self.applier.add_done_callback(self.background_tasks.discard)
 
-    def handle_vote_request(self, sender, term):
-        if term > self.term:
-            self.term = term
-            self.voted_for = sender.id
-            logger.info(f'Node {self.id} voted for Node {sender.id} in term {term}')
+    def apply_lag(self):
+        return self.commit_index - self.last_applied
 
-    def handle_append_entries(self, sender, term, data):
-        entries, version = data
-        if term >= self.term:
-            self.term = term
-            self.log.extend(entries)
-            self.commit_index = len(self.log)
-            self.data_version = version
-            logger.info(f'Node {self.id} appended entries from Node {sender.id}: {entries}, version: {version}')
+    # Un lote por iteración del bucle; entre lotes se procesan mensajes y se
+    # confirman entradas nuevas, que este mismo bucle recoge
+    async def apply_committed(self):
+        try:
+            while self.last_applied < self.commit_index:
+                self.apply_entries()
+                await asyncio.sleep(0)
+        finally:
+            if self.applier is asyncio.current_task():
+                self.applier = None
+
+    def apply_entries(self):
+        start = self.last_applied + 1
+        entries = self.entries_from(start, min(self.apply_batch, self.commit_index - self.last_applied))
+        for index, (_, command) in enumerate(entries, start):
+            if command is None:
+                continue
+            result = self.state_machine.apply(index, command)
+            future = self.apply_futures.pop(index, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+        self.last_applied = start + len(entries) - 1
+        while self.apply_waiters and self.apply_waiters[0][0] <= self.last_applied:
+            _, _, query, future = heapq.heappop(self.apply_waiters)
+            if not future.done():
+                future.set_result(self.state_machine.query(query))
+        if self.last_applied - self.log.snapshot_index >= self.snapshot_threshold:
+            self.take_snapshot()
+
+    def take_snapshot(self):
+        index, term = self.last_applied, self.term_at(self.last_applied)
+        self.snapshot = (index, term, self.state_machine.snapshot())
+        self.log.compact(index, term)
+        self.storage.save_snapshot(index, term, self.snapshot[2])
+        logger.debug(f'Node {self.id} compacted its log up to {index}')
 
+    # Los mensajes en vuelo del nodo caído se pierden y el almacenamiento
+    # descarta lo que no llegó a sincronizarse
     def crash(self):
         self.status = NodeStatus.DOWN
+        self.become_follower(self.term)
+        for task in self.background_tasks:
+            task.cancel()
+        self.link.forget(self.id)
+        self.storage.crash()
         logger.info(f'Node {self.id} has crashed')
 
     def recover(self):
+        self.load_from_storage()
         self.status = NodeStatus.UP
-        logger.info(f'Node {self.id} has recovered')
+        logger.info(f'Node {self.id} has recovered (term {self.term}, log up to {self.last_log_index()})')
 
-# Se realiza Paso 3: Simulación de Raft y fallos de nodo
-network = NetworkPartition()
-nodes = [RaftNode(i, network, []) for i in range(5)]
-for node in nodes:
-    node.nodes = nodes
+# Con storage_dir cada nodo persiste en su propio WAL mapeado en memoria
+def create_cluster(size, network, storage_dir=None, group_commit=True, **options):
+    def storage(node_id):
+        if storage_dir is None:
+            return None
+        return MmapStorage(os.path.join(storage_dir, f'node{node_id}'), group_commit=group_commit)
+    cluster = [RaftNode(i, network, [], storage=storage(i), **options) for i in range(size)]
+    for node in cluster:
+        node.nodes = cluster
+    return cluster
+
+# Cada nodo escucha en su propio socket ('uds' o 'tcp') y mantiene una
+# conexión por nodo destino, así que cada enlace sigue siendo FIFO salvo que
+# `link` desordene. Caídas y particiones se aplican al entregar
+async def connect_cluster(cluster, kind='uds', directory=None, link=None):
+    nodes_by_id = {node.id: node for node in cluster}
+    endpoints = {}
+
+    async def deliver(sender_id, recipient_id, data):
+        sender, recipient = nodes_by_id[sender_id], nodes_by_id[recipient_id]
+        if sender.can_reach(recipient):
+            await recipient.receive_message(sender, data)
 
-async def simulate_raft():
+    for node in cluster:
+        node.transport = SocketTransport(local_address(kind, f'raft-{os.getpid()}-{node.id}', directory), endpoints,
+                                         link)
+        await node.transport.start(deliver)
+        endpoints[node.id] = node.transport.address
+
+async def disconnect_cluster(cluster):
+    for node in cluster:
+        if node.transport is not None:
+            await node.transport.close()
+            node.transport = None
+
+# Se realiza Paso 3: Simulación de Raft y fallos de nodo
+async def simulate_raft(cluster):
     # Iniciar elecciones en un nodo para simular el proceso de elección de líder
-    await nodes[0].start_election()
+    await cluster[0].start_election()
     await asyncio.sleep(1)
     # Simular la adición de entradas de registro
-    await nodes[0].append_entries(['data1', 'data2'])
+    try:
+        await cluster[0].append_entries(['data1', 'data2'])
+    except NotLeaderError as e:
+        logger.warning(f'Append rejected: {e}')
     await asyncio.sleep(1)
 
-async def simulate_failures():
+async def simulate_failures(cluster):
     while True:
         await asyncio.sleep(random.uniform(2, 5))
-        node = random.choice(nodes)
+        node = random.choice(cluster)
         node.crash()
         await asyncio.sleep(random.uniform(2, 5))
         node.recover()
 
 # Paso 4: Configuración de particiones y curaciones
 
-async def simulate_network_partitions():
+async def simulate_network_partitions(cluster, partitions):
     while True:
         await asyncio.sleep(random.uniform(10, 20))
-        partition_nodes = random.sample(nodes, k=random.randint(2, len(nodes) - 1))
-        network.add_partition(partition_nodes)
+        partition_nodes = random.sample(cluster, k=random.randint(2, len(cluster) - 1))
+        partitions.add_partition(partition_nodes)
         await asyncio.sleep(random.uniform(10, 20))
-        network.heal_partition(random.choice(list(network.partitions.keys())))
+        partitions.heal_partition(random.choice(list(partitions.partitions.keys())))
+
+# Carga de clientes: una entrada por intervalo enviada al líder vigente; sin
+# líder se espera a que los temporizadores de elección elijan otro
+async def simulate_clients(cluster, interval=1.0, timeout=5.0):
+    sequence = 0
+    while True:
+        await asyncio.sleep(interval)
+        leaders = [node for node in cluster if node.role == Role.LEADER and node.status == NodeStatus.UP]
+        if not leaders:
+            continue
+        try:
+            await asyncio.wait_for(max(leaders, key=lambda node: node.term).append_entries([f'data{sequence}']), timeout)
+        except (NotLeaderError, asyncio.TimeoutError):
+            pass
+        sequence += 1
+
+# Por ultimo el Paso 5: Ejecución de la simulación completa
+
+async def main(cluster_size=5, **options):
+    partitions = NetworkPartition()
+    cluster = create_cluster(cluster_size, partitions, **options)
+    for node in cluster:
+        node.start()
+    await asyncio.gather(simulate_raft(cluster), simulate_failures(cluster), simulate_network_partitions(cluster, partitions))
+
+# Comprueba que las entradas confirmadas coinciden en todos los nodos (en el
+# tramo que ambos conservan) y devuelve las discrepancias encontradas
+def check_safety(cluster):
+    violations = []
+    for a in cluster:
+        for b in cluster:
+            if a.id >= b.id:
+                continue
+            start = max(a.log.base_index, b.log.base_index, 1)
+            for index in range(start, min(a.commit_index, b.commit_index) + 1):
+                term_a, term_b = a.term_at(index), b.term_at(index)
+                if term_a is not None and term_b is not None and term_a != term_b:
+                    violations.append((a.id, b.id, index, term_a, term_b))
+                    break
+    return violations
+
+# Un escenario completo de fallos y particiones durante `duration` segundos
+# de reloj del clúster; pensado para ejecutarse con virtual_time.run
+async def simulate_schedule(duration=3600.0, cluster_size=5, **options):
+    partitions = NetworkPartition()
+    cluster = create_cluster(cluster_size, partitions, **options)
+    for node in cluster:
+        node.start()
+    scenario = asyncio.gather(simulate_raft(cluster), simulate_failures(cluster),
+                              simulate_network_partitions(cluster, partitions), simulate_clients(cluster))
+    try:
+        await asyncio.wait_for(scenario, duration)
+    except asyncio.TimeoutError:
+        pass
+    for node in cluster:
+        await node.stop()
+    return {'terms': max(node.term for node in cluster), 'committed': max(node.commit_index for node in cluster),
+            'violations': check_safety(cluster)}
+
+# Recorre muchas programaciones de fallos, una por semilla, en tiempo virtual
+def sweep_failure_schedules(seeds=range(100), duration=3600.0, **options):
+    import virtual_time
+    failures = {}
+    started = time.perf_counter()
+    for seed in seeds:
+        result = virtual_time.run(simulate_schedule(duration, **options), seed=seed)
+        if result['violations']:
+            failures[seed] = result['violations']
+    elapsed = time.perf_counter() - started
+    print(f'{len(seeds)} programaciones de {duration:.0f} s simuladas en {elapsed:.1f} s, '
+          f'{len(failures)} con discrepancias')
+    return failures
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+async def wait_for_leader(cluster, timeout=30.0, interval=0.05):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        leaders = [node for node in cluster if node.role == Role.LEADER and node.status == NodeStatus.UP]
+        if leaders:
+            return max(leaders, key=lambda node: node.term)
+        await asyncio.sleep(interval)
+    raise TimeoutError('No leader elected')
+
+# Ventanas de indisponibilidad: se tira el líder `crashes` veces, cada una
+# tras `stable` segundos con líder, y se mide desde la caída hasta que otro
+# nodo es líder. El nodo caído vuelve justo después
+async def measure_failover(cluster_size=5, crashes=20, stable=5.0, **options):
+    cluster = create_cluster(cluster_size, NetworkPartition(), **options)
+    for node in cluster:
+        node.start()
+    loop = asyncio.get_running_loop()
+    windows = []
+    for _ in range(crashes):
+        await asyncio.sleep(stable)
+        leader = await wait_for_leader(cluster, 60.0)
+        crashed_at = loop.time()
+        leader.crash()
+        await wait_for_leader(cluster, 60.0, interval=0.01)
+        windows.append(loop.time() - crashed_at)
+        leader.recover()
+    for node in cluster:
+        await node.stop()
+    return {'windows': windows, 'terms': max(node.term for node in cluster), 'violations': check_safety(cluster)}
+
+# Distribución de las ventanas sobre muchas ejecuciones con semilla, en
+# tiempo virtual, con y sin PreVote
+def benchmark_failover(seeds=range(50), cluster_size=5, crashes=20, **options):
+    import virtual_time
+    results = {}
+    for pre_vote in (False, True):
+        windows, terms, violations = [], 0, 0
+        for seed in seeds:
+            result = virtual_time.run(measure_failover(cluster_size, crashes, pre_vote=pre_vote, **options), seed=seed)
+            windows += result['windows']
+            terms += result['terms']
+            violations += len(result['violations'])
+        results[pre_vote] = {'unavailable_p50': percentile(windows, 0.5), 'unavailable_p99': percentile(windows, 0.99),
+                             'unavailable_max': max(windows), 'terms_per_failover': terms / len(windows),
+                             'violations': violations}
+        result = results[pre_vote]
+        print(f"PreVote {'sí' if pre_vote else 'no'}: {len(windows)} caídas del líder, indisponibilidad "
+              f"p50 {result['unavailable_p50'] * 1000:.0f} ms, p99 {result['unavailable_p99'] * 1000:.0f} ms, "
+              f"máx {result['unavailable_max'] * 1000:.0f} ms, {result['terms_per_failover']:.2f} términos por caída, "
+              f"{violations} discrepancias")
+    return results
+
+# Mide entradas confirmadas por segundo y latencia de confirmación con
+# `clients` clientes concurrentes enviando una entrada cada vez. Con
+# transport ('uds' o 'tcp') los mensajes pasan por la pila de red
+async def benchmark_replication(cluster_size, clients=100, duration=5.0, transport=None, **options):
+    cluster = create_cluster(cluster_size, NetworkPartition(), **options)
+    if transport is not None:
+        await connect_cluster(cluster, transport, link=options.get('link'))
+    for node in cluster:
+        node.start()
+    await cluster[0].start_election()
+    leader = await wait_for_leader(cluster)
+    loop = asyncio.get_running_loop()
+    latencies = []
+    start = loop.time()
+    stop = start + duration
+
+    async def client(client_id):
+        sequence = 0
+        while loop.time() < stop:
+            sent = loop.time()
+            await leader.append_entries([f'client{client_id}-{sequence}'])
+            latencies.append(loop.time() - sent)
+            sequence += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = loop.time() - start
+    for node in cluster:
+        await node.stop()
+        node.storage.close()
+    await disconnect_cluster(cluster)
+    result = {'nodes': cluster_size, 'committed_per_sec': len(latencies) / elapsed,
+              'latency_p50': percentile(latencies, 0.5), 'latency_p99': percentile(latencies, 0.99),
+              'log_retained': max(len(node.log) for node in cluster)}
+    print(f"{cluster_size} nodos{f' ({transport})' if transport else ''}: {result['committed_per_sec']:.1f} entradas/s, "
+          f"latencia p50 {result['latency_p50'] * 1000:.0f} ms, p99 {result['latency_p99'] * 1000:.0f} ms, "
+          f"{result['log_retained']} entradas retenidas")
+    return result
+
+async def benchmark(sizes=(3, 5, 7), **options):
+    return [await benchmark_replication(size, **options) for size in sizes]
+
+# Carga mixta con read_ratio de lecturas: 'log' lee añadiendo una entrada
+# (lo único posible antes de read), 'read_index' y 'lease' usan read
+async def benchmark_reads(cluster_size=3, mode='read_index', read_ratio=0.9, clients=100, duration=5.0, **options):
+    cluster = create_cluster(cluster_size, NetworkPartition(), **options)
+    for node in cluster:
+        node.start()
+    await cluster[0].start_election()
+    leader = await wait_for_leader(cluster)
+    loop = asyncio.get_running_loop()
+    read_latencies = []
+    operations = 0
+    start = loop.time()
+    stop = start + duration
+
+    async def client(client_id):
+        nonlocal operations
+        sequence = 0
+        while loop.time() < stop:
+            sent = loop.time()
+            if random.random() < read_ratio:
+                if mode == 'log':
+                    await leader.append_entries([('read', client_id, sequence)])
+                else:
+                    await leader.read(lease=mode == 'lease')
+                read_latencies.append(loop.time() - sent)
+            else:
+                await leader.append_entries([f'client{client_id}-{sequence}'])
+            operations += 1
+            sequence += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = loop.time() - start
+    for node in cluster:
+        await node.stop()
+    result = {'mode': mode, 'ops_per_sec': operations / elapsed, 'read_p50': percentile(read_latencies, 0.5),
+              'read_p99': percentile(read_latencies, 0.99), 'log_entries': leader.last_log_index()}
+    print(f"lecturas {mode}: {result['ops_per_sec']:.0f} ops/s, lectura p50 {result['read_p50'] * 1000:.2f} ms, "
+          f"p99 {result['read_p99'] * 1000:.2f} ms, {result['log_entries']} entradas en el log")
+    return result
+
+# Clientes de extremo a extremo sobre el KVStore: put hasta que se aplica y
+# get linealizable (ReadIndex o lease) sobre `keys` claves. Además de
+# operaciones por segundo y latencias mide el retraso de aplicación del líder
+# y comprueba al final que todas las réplicas tienen el mismo estado
+async def benchmark_kv(cluster_size=3, read_ratio=0.5, keys=1000, clients=100, duration=5.0, lease=False,
+                       transport=None, **options):
+    cluster = create_cluster(cluster_size, NetworkPartition(), **options)
+    if transport is not None:
+        await connect_cluster(cluster, transport, link=options.get('link'))
+    for node in cluster:
+        node.start()
+    await cluster[0].start_election()
+    leader = await wait_for_leader(cluster)
+    loop = asyncio.get_running_loop()
+    put_latencies, get_latencies, lag_samples = [], [], []
+    start = loop.time()
+    stop = start + duration
+
+    async def client(client_id):
+        sequence = 0
+        while loop.time() < stop:
+            key = f'key{random.randrange(keys)}'
+            sent = loop.time()
+            if random.random() < read_ratio:
+                await leader.get(key, lease)
+                get_latencies.append(loop.time() - sent)
+            else:
+                await leader.put(key, f'client{client_id}-{sequence}')
+                put_latencies.append(loop.time() - sent)
+            sequence += 1
+
+    async def sample_lag():
+        while loop.time() < stop:
+            lag_samples.append(leader.apply_lag())
+            await asyncio.sleep(0.01)
 
-Por ultimo el Paso 5: Ejecución de la simulación completa
+    await asyncio.gather(sample_lag(), *(client(i) for i in range(clients)))
+    elapsed = loop.time() - start
+    deadline = loop.time() + 5.0
+    while loop.time() < deadline and any(node.last_applied < leader.last_applied for node in cluster):
+        await asyncio.sleep(0.05)
+    digests = {node.state_machine.digest() for node in cluster}
+    for node in cluster:
+        await node.stop()
+    await disconnect_cluster(cluster)
+    result = {'nodes': cluster_size, 'ops_per_sec': (len(put_latencies) + len(get_latencies)) / elapsed,
+              'puts_per_sec': len(put_latencies) / elapsed, 'gets_per_sec': len(get_latencies) / elapsed,
+              'put_p50': percentile(put_latencies, 0.5), 'put_p99': percentile(put_latencies, 0.99),
+              'get_p50': percentile(get_latencies, 0.5), 'get_p99': percentile(get_latencies, 0.99),
+              'apply_lag_mean': sum(lag_samples) / max(1, len(lag_samples)), 'apply_lag_max': leader.max_apply_lag,
+              'replicas_agree': len(digests) == 1}
+    print(f"KV {cluster_size} nodos{f' ({transport})' if transport else ''}: {result['ops_per_sec']:.0f} ops/s "
+          f"({result['puts_per_sec']:.0f} put/s, {result['gets_per_sec']:.0f} get/s), "
+          f"put p50 {result['put_p50'] * 1000:.1f} ms, p99 {result['put_p99'] * 1000:.1f} ms, "
+          f"get p50 {result['get_p50'] * 1000:.1f} ms, p99 {result['get_p99'] * 1000:.1f} ms, "
+          f"retraso de aplicación medio {result['apply_lag_mean']:.1f} entradas (máx {result['apply_lag_max']}), "
+          f"réplicas {'iguales' if result['replicas_agree'] else 'DISTINTAS'}")
+    return result
 
-async def main():
-    await asyncio.gather(simulate_raft(), simulate_failures(), simulate_network_partitions())
+# Compara el WAL con group commit frente a un fsync por escritura
+async def benchmark_storage(cluster_size=3, **options):
+    results = []
+    for group_commit in (True, False):
+        with tempfile.TemporaryDirectory() as directory:
+            print(f"WAL en disco, group commit {'activado' if group_commit else 'desactivado'}:")
+            results.append(await benchmark_replication(cluster_size, storage_dir=directory,
+                                                       group_commit=group_commit, **options))
+    return results
 
-asyncio.run(main())
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:2] == ['sweep']:
+        logging.getLogger().setLevel(logging.WARNING)
+        sweep_failure_schedules()
+    elif sys.argv[1:2] == ['failover']:
+        logging.getLogger().setLevel(logging.WARNING)
+        benchmark_failover()
+    elif sys.argv[1:2] == ['benchmark']:
+        logging.getLogger().setLevel(logging.WARNING)
+        asyncio.run(benchmark())
+        asyncio.run(benchmark_storage(latency=(0.001, 0.005)))
+        for transport in ('uds', 'tcp'):
+            asyncio.run(benchmark_replication(3, transport=transport))
+        for mode in ('log', 'read_index', 'lease'):
+            asyncio.run(benchmark_reads(mode=mode, latency=(0.01, 0.03)))
+        for lease in (False, True):
+            asyncio.run(benchmark_kv(lease=lease, latency=(0.001, 0.005)))
+        asyncio.run(benchmark_kv(transport='uds'))
+        # Enlaces con cola larga, capacidad limitada y pérdidas
+        asyncio.run(benchmark_kv(link=LinkModel(LogNormal(0.002, 0.6), bandwidth=10e6, loss=0.01)))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,367 @@
+# Banco de pruebas común a todos los simuladores.
+#
+#   python bench.py run [--suite quick|full] [--workload NAME ...] [--nodes N ...] [--rate R ...]
+#                       [--payload BYTES ...] [--duration S] [--no-allocations] [--profile DIR] [--output FILE]
+#   python bench.py compare BASE.json NEW.json [--threshold 0.1]
+#
+# Cargas (una por simulador), todas en lazo abierto: la operación i se lanza
+# en start + i / rate aunque las anteriores no hayan terminado, y su latencia
+# se mide desde ese instante, de modo que la espera en cola cuenta
+# (sin omisión coordinada):
+# - event_system: un evento USER_INPUT en el EventSystem de Ejercicio1, desde
+#   add_event hasta que se procesa. Hay un único sistema; nodes no se usa.
+# - robots: un mensaje entre RobotVector de la Network de Ejercicio2, desde el
+#   envío hasta receive_message.
+# - ejercicio3: una entrada en la sección crítica de Ricart-Agrawala en la
+#   Network de Ejercicio3 (asyncio), desde la solicitud hasta la liberación.
+# - ejercicio3m: una Task entre los nodos con hilos de Ejercicio3_Modificado,
+#   desde el envío hasta handle_task.
+# - raft: un put en el KVStore de un clúster Raft (Ejercicio4), hasta que se
+#   aplica en el líder.
+# El payload son `payload` bytes dentro de cada operación.
+#
+# Cada caso (carga y parámetros) se ejecuta en un proceso nuevo (spawn), así
+# que el pico de RSS es el suyo. Una primera pasada mide rendimiento,
+# percentiles de latencia y pico de RSS. Una segunda, con tracemalloc, mide el
+# pico de memoria asignada y los bloques vivos con el simulador cargado (y
+# los sitios que más asignan); va aparte porque tracemalloc frena la
+# ejecución. Con --profile una tercera pasada con cProfile deja un .prof por
+# caso en el directorio, legible con pstats, snakeviz o flameprof.
+#
+# compare empareja los casos por carga y parámetros y marca como regresión
+# cualquier métrica que empeore más que `threshold` (fracción): menos
+# rendimiento, o más latencia, RSS o memoria asignada. Sale con código 1 si
+# hay alguna.
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from Ejercicio4 import percentile
+
+# Barridos por defecto: nodos, operaciones por segundo y bytes por operación
+SUITES = {
+    'quick': {
+        'event_system': {'nodes': (1,), 'rate': (20,), 'payload': (64,)},
+        'robots': {'nodes': (3,), 'rate': (2000,), 'payload': (64,)},
+        'ejercicio3': {'nodes': (10,), 'rate': (200,), 'payload': (64,)},
+        'ejercicio3m': {'nodes': (5,), 'rate': (2000,), 'payload': (64,)},
+        'raft': {'nodes': (3,), 'rate': (1000,), 'payload': (64,)},
+    },
+    'full': {
+        'event_system': {'nodes': (1,), 'rate': (5, 20), 'payload': (64, 4096)},
+        'robots': {'nodes': (3, 10), 'rate': (1000, 5000), 'payload': (64, 4096)},
+        'ejercicio3': {'nodes': (10, 50), 'rate': (100, 500), 'payload': (64, 4096)},
+        'ejercicio3m': {'nodes': (5, 20), 'rate': (1000, 5000), 'payload': (64, 4096)},
+        'raft': {'nodes': (3, 5), 'rate': (500, 2000), 'payload': (64, 4096)},
+    },
+}
+DURATION = {'quick': 2.0, 'full': 5.0}
+# Tiempo máximo para que terminen las operaciones tras la última lanzada
+DRAIN_TIMEOUT = 30.0
+# Métricas comparadas: True si más es mejor
+METRICS = {'throughput': True, 'latency_p50': False, 'latency_p99': False, 'peak_rss_kb': False,
+           'alloc_peak_bytes': False}
+
+# Lanza operation(i) en lazo abierto y devuelve (latencias, operaciones sin terminar)
+async def open_loop(rate, duration, operation):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def timed(i, scheduled):
+        await operation(i)
+        return loop.time() - scheduled
+
+    tasks = []
+    for i in range(max(1, int(rate * duration))):
+        wait = start + i / rate - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        tasks.append(loop.create_task(timed(i, start + i / rate)))
+    done, pending = await asyncio.wait(tasks, timeout=DRAIN_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    latencies = [task.result() for task in done if task.exception() is None]
+    return latencies, len(tasks) - len(latencies), loop.time() - start
+
+# Lo mismo con hilos: send(i) envía sin esperar y `received` se llena con la
+# hora de llegada de cada operación desde los hilos del simulador
+def open_loop_threads(rate, duration, send, received):
+    start = time.monotonic()
+    count = max(1, int(rate * duration))
+    for i in range(count):
+        wait = start + i / rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        send(i)
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while len(received) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    latencies = [arrived - (start + i / rate) for i, arrived in list(received.items())]
+    return latencies, count - len(latencies), time.monotonic() - start
+
+async def event_system_workload(nodes, rate, payload, duration, probe, **options):
+    from Ejercicio1 import EventSystem, Event, EventType
+    system = EventSystem()
+    process_user_input = system.process_user_input
+
+    def handled(data):
+        process_user_input(data)
+        data[0].set_result(None)
+
+    system.process_user_input = handled
+    consumer = asyncio.create_task(system.process_events())
+    data = b'x' * payload
+
+    async def operation(i):
+        done = asyncio.get_running_loop().create_future()
+        system.add_event(Event(EventType.USER_INPUT, data=(done, data)))
+        await done
+
+    result = await open_loop(rate, duration, operation)
+    probe()
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+    system.executor.shutdown()
+    return result
+
+def robots_workload(nodes, rate, payload, duration, probe, latency=None, **options):
+    from Ejercicio2 import Network, RobotVector
+    from link_model import LinkModel
+    network = Network(nodes, link=LinkModel(latency) if latency is not None else None)
+    network.attach([RobotVector(i, nodes) for i in range(nodes)])
+    received = {}
+    for robot in network.robots:
+        def receive_message(sender_id, message, original=robot.receive_message):
+            original(sender_id, message)
+            received[message[0][0]] = time.monotonic()
+        robot.receive_message = receive_message
+    data = b'x' * payload
+
+    def send(i):
+        network.robots[i % nodes].send_message((i + 1) % nodes, (i, data))
+
+    result = open_loop_threads(rate, duration, send, received)
+    probe()
+    if network.delay_line is not None:
+        network.delay_line.close()
+    return result
+
+async def ejercicio3_workload(nodes, rate, payload, duration, probe, latency=None, **options):
+    from Ejercicio3 import Network
+    network = Network(nodes, task_duration=(0, 0), latency=latency)
+    await network.start()
+    # Cada nodo atiende sus operaciones de una en una
+    locks = [asyncio.Lock() for _ in range(nodes)]
+    requested = 'x' * payload
+
+    async def operation(i):
+        node = network.nodes[i % nodes]
+        async with locks[i % nodes]:
+            await node.request_resource(requested)
+            await node.released.wait()
+
+    result = await open_loop(rate, duration, operation)
+    probe()
+    await network.stop()
+    return result
+
+def ejercicio3m_workload(nodes, rate, payload, duration, probe, latency=None, **options):
+    import threading
+    from Ejercicio3_Modificado import Network
+    from codec import Task
+    from link_model import LinkModel
+    network = Network(nodes, link=LinkModel(latency) if latency is not None else None)
+    received = {}
+    for node in network.nodes:
+        def handle_task(message, original=node.handle_task):
+            received[message.task[0]] = time.monotonic()
+            original(message)
+        node.handle_task = handle_task
+    threads = [threading.Thread(target=network.run_node, args=(node,)) for node in network.nodes]
+    for thread in threads:
+        thread.start()
+    data = b'x' * payload
+
+    # Una tarea de presupuesto 1: el destino la procesa y devuelve el ack
+    def send(i):
+        source = network.nodes[i % nodes]
+        with source.lock:
+            source.termination.on_send(1)
+        source.send_message((i + 1) % nodes, Task, 1, 1, (i, data))
+
+    result = open_loop_threads(rate, duration, send, received)
+    probe()
+    network.shutdown()
+    for thread in threads:
+        thread.join()
+    if network.delay_line is not None:
+        network.delay_line.close()
+    return result
+
+async def raft_workload(nodes, rate, payload, duration, probe, latency=(0.001, 0.005), **options):
+    from Ejercicio4 import NetworkPartition, create_cluster, wait_for_leader
+    cluster = create_cluster(nodes, NetworkPartition(), latency=latency, **options)
+    for node in cluster:
+        node.start()
+    await cluster[0].start_election()
+    leader = await wait_for_leader(cluster)
+    data = b'x' * payload
+
+    async def operation(i):
+        await leader.put(f'key{i % 1000}', data)
+
+    result = await open_loop(rate, duration, operation)
+    probe()
+    for node in cluster:
+        await node.stop()
+    return result
+
+WORKLOADS = {'event_system': event_system_workload, 'robots': robots_workload, 'ejercicio3': ejercicio3_workload,
+             'ejercicio3m': ejercicio3m_workload, 'raft': raft_workload}
+
+def measure(workload, params, probe=lambda: None):
+    run = WORKLOADS[workload](probe=probe, **params)
+    if asyncio.iscoroutine(run):
+        run = asyncio.run(run)
+    return run
+
+# En KB; macOS da ru_maxrss en bytes
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+# Se ejecuta en el proceso hijo; la salida de los simuladores se descarta
+def run_case(workload, params, allocations, profile_path):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        latencies, incomplete, elapsed = measure(workload, params)
+        result = {'workload': workload, 'params': params, 'ops': len(latencies), 'incomplete': incomplete,
+                  'elapsed': elapsed, 'throughput': len(latencies) / elapsed,
+                  'latency_p50': percentile(latencies, 0.5), 'latency_p90': percentile(latencies, 0.9),
+                  'latency_p99': percentile(latencies, 0.99), 'latency_max': max(latencies, default=0.0),
+                  'peak_rss_kb': peak_rss_kb()}
+        if allocations:
+            snapshots = []
+            tracemalloc.start()
+            measure(workload, params, lambda: snapshots.append(tracemalloc.take_snapshot()))
+            result['alloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            statistics = snapshots[0].statistics('lineno')
+            result['alloc_blocks'] = sum(stat.count for stat in statistics)
+            result['alloc_top'] = [f'{stat.traceback[0].filename}:{stat.traceback[0].lineno} '
+                                   f'{stat.size} B en {stat.count} bloques' for stat in statistics[:5]]
+        if profile_path:
+            profiler = cProfile.Profile()
+            profiler.runcall(measure, workload, params)
+            profiler.dump_stats(profile_path)
+            result['profile'] = profile_path
+    return result
+
+def cases(suite, workloads=None, nodes=None, rates=None, payloads=None, duration=None):
+    for workload, sweep in SUITES[suite].items():
+        if workloads and workload not in workloads:
+            continue
+        for case_nodes, rate, payload in itertools.product(nodes or sweep['nodes'], rates or sweep['rate'],
+                                                           payloads or sweep['payload']):
+            yield workload, {'nodes': case_nodes, 'rate': rate, 'payload': payload,
+                             'duration': duration or DURATION[suite]}
+
+def case_name(workload, params):
+    return f"{workload}-n{params['nodes']}-r{params['rate']:g}-p{params['payload']}"
+
+def run(suite='quick', workloads=None, nodes=None, rates=None, payloads=None, duration=None, allocations=True,
+        profile_dir=None, output='bench.json'):
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for workload, params in cases(suite, workloads, nodes, rates, payloads, duration):
+        profile_path = os.path.join(profile_dir, case_name(workload, params) + '.prof') if profile_dir else None
+        # Un proceso por caso: el pico de RSS y la memoria no se heredan entre casos
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            result = pool.apply(run_case, (workload, params, allocations, profile_path))
+        results.append(result)
+        allocated = (f", asignado {result['alloc_peak_bytes'] / 1e6:.1f} MB"
+                     if 'alloc_peak_bytes' in result else '')
+        print(f"{case_name(workload, params)}: {result['throughput']:.0f} ops/s, latencia p50 "
+              f"{result['latency_p50'] * 1000:.2f} ms, p99 {result['latency_p99'] * 1000:.2f} ms, "
+              f"{result['incomplete']} sin terminar, RSS {result['peak_rss_kb'] / 1024:.0f} MB{allocated}", flush=True)
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'suite': suite, 'python': platform.python_version(),
+              'platform': platform.platform(), 'results': results}
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'{len(results)} casos guardados en {output}')
+    return report
+
+# Devuelve las regresiones como (caso, métrica, antes, después, cambio)
+def compare(base, new, threshold=0.1):
+    def key(result):
+        params = dict(result['params'])
+        params.pop('duration', None)
+        return result['workload'], tuple(sorted(params.items()))
+
+    previous = {key(result): result for result in base['results']}
+    regressions = []
+    for result in new['results']:
+        before = previous.get(key(result))
+        if before is None:
+            print(f"{case_name(result['workload'], result['params'])}: sin caso en la referencia")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, current = before.get(metric), result.get(metric)
+            if not old or current is None:
+                continue
+            change = (current - old) / old
+            worse = -change if higher_is_better else change
+            mark = 'REGRESIÓN' if worse > threshold else 'mejora' if worse < -threshold else ''
+            print(f"{case_name(result['workload'], result['params'])} {metric}: {old:.4g} -> {current:.4g} "
+                  f"({change:+.1%}) {mark}".rstrip())
+            if worse > threshold:
+                regressions.append((case_name(result['workload'], result['params']), metric, old, current, change))
+    print(f'{len(regressions)} regresiones por encima del {threshold:.0%}')
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Banco de pruebas de los simuladores')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('run', help='ejecuta un barrido y guarda los resultados en JSON')
+    command.add_argument('--suite', choices=tuple(SUITES), default='quick')
+    command.add_argument('--workload', nargs='+', choices=tuple(WORKLOADS))
+    command.add_argument('--nodes', nargs='+', type=int)
+    command.add_argument('--rate', nargs='+', type=float)
+    command.add_argument('--payload', nargs='+', type=int)
+    command.add_argument('--duration', type=float)
+    command.add_argument('--no-allocations', action='store_true', help='sin la pasada con tracemalloc')
+    command.add_argument('--profile', metavar='DIR', help='guarda un perfil de cProfile por caso en DIR')
+    command.add_argument('--output', default='bench.json')
+    command = commands.add_parser('compare', help='compara dos ejecuciones y marca las regresiones')
+    command.add_argument('base')
+    command.add_argument('new')
+    command.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args.suite, args.workload, args.nodes, args.rate, args.payload, args.duration, not args.no_allocations,
+            args.profile, args.output)
+    else:
+        with open(args.base) as base, open(args.new) as new:
+            regressions = compare(json.load(base), json.load(new), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
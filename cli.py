@@ -0,0 +1,189 @@
+# Punto de entrada único para los simuladores.
+#
+#   python cli.py ejercicio1 [--modificado]
+#   python cli.py ejercicio2 [--modificado] [--transport uds|tcp] [--latency MIN MAX]
+#   python cli.py ejercicio3 [demo|benchmark|termination|processes] [--nodes N] ...
+#   python cli.py ejercicio3m [--transport uds|tcp]
+#   python cli.py raft [demo|sweep|failover|replication|kv] [--nodes N] ...
+#   python cli.py multi-raft [--groups N] [--hosts N] ...
+#   python cli.py shards [--workers N] [--groups N] ...
+#   python cli.py bench run|compare ...   (los argumentos pasan a bench.py)
+#
+# Los módulos no tienen efectos al importarse: cada subcomando importa solo el
+# suyo al ejecutarse, y el logging se configura aquí. --latency MIN MAX da una
+# latencia uniforme por mensaje en segundos.
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+
+# "Ejercicio1_ Modificado.py" tiene un espacio en el nombre y no se puede importar por nombre
+def load_module(filename, name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def latency_option(args):
+    return tuple(args.latency) if args.latency else None
+
+def run_ejercicio1(args):
+    if args.modificado:
+        module = load_module('Ejercicio1_ Modificado.py', 'ejercicio1_modificado')
+        module.run(module.NotebookSimulator().run())
+    else:
+        import Ejercicio1
+        asyncio.run(Ejercicio1.NotebookSimulator().run())
+
+def run_ejercicio2(args):
+    if args.modificado:
+        import Ejercicio2_Modificado as module
+    else:
+        import Ejercicio2 as module
+    from link_model import LinkModel
+    from transport import TransportThread, shared_transport
+    link = LinkModel(latency_option(args)) if args.latency else None
+    transport = None
+    if args.transport:
+        transport = TransportThread(shared_transport(args.transport, range(3), 'ejercicio2', link))
+        link = None
+    network = module.main(transport, link)
+    # Los mensajes en vuelo se entregan antes de cerrar
+    if network.delay_line is not None:
+        network.delay_line.close()
+    if transport is not None:
+        time.sleep(0.5)
+        transport.close()
+
+def run_ejercicio3(args):
+    import Ejercicio3
+    latency = latency_option(args)
+    if args.command == 'demo':
+        asyncio.run(Ejercicio3.Network(args.nodes or 5, latency=latency or (0.01, 0.05)).simulate(args.requesters))
+    elif args.command == 'benchmark':
+        asyncio.run(Ejercicio3.benchmark(args.nodes or 2000, args.requesters or 20, latency, args.mailbox_size,
+                                         args.transport))
+    elif args.command == 'termination':
+        asyncio.run(Ejercicio3.benchmark_termination(args.nodes or 10000, args.budget, args.fanout, latency))
+    elif args.command == 'processes':
+        asyncio.run(Ejercicio3.benchmark_processes(args.nodes or 1000, args.processes, args.budget, args.fanout,
+                                                   args.transport or 'uds'))
+
+def run_ejercicio3m(args):
+    import Ejercicio3_Modificado
+    Ejercicio3_Modificado.main(args.transport)
+
+def run_raft(args):
+    import Ejercicio4
+    options = {}
+    if args.latency:
+        options['latency'] = latency_option(args)
+    if args.command == 'demo':
+        asyncio.run(Ejercicio4.main(args.nodes or 5, **options))
+    elif args.command == 'sweep':
+        Ejercicio4.sweep_failure_schedules(range(args.seeds), args.duration or 3600.0, cluster_size=args.nodes or 5,
+                                           **options)
+    elif args.command == 'failover':
+        Ejercicio4.benchmark_failover(range(args.seeds), args.nodes or 5, **options)
+    elif args.command == 'replication':
+        asyncio.run(Ejercicio4.benchmark_replication(args.nodes or 3, args.clients, args.duration or 5.0,
+                                                     args.transport, **options))
+    elif args.command == 'kv':
+        asyncio.run(Ejercicio4.benchmark_kv(args.nodes or 3, args.read_ratio, clients=args.clients,
+                                            duration=args.duration or 5.0, lease=args.lease,
+                                            transport=args.transport, **options))
+
+def run_multi_raft(args):
+    import multi_raft
+    asyncio.run(multi_raft.benchmark_multi_raft(args.hosts, args.groups, duration=args.duration,
+                                                latency=latency_option(args) or (0.001, 0.005)))
+
+def run_shards(args):
+    import raft_shards
+    raft_shards.run_sharded(args.groups, workers=args.workers, seed=args.seed, duration=args.duration,
+                            latency=latency_option(args) or (0.001, 0.005))
+
+def run_bench(args):
+    import bench
+    bench.main(args.args)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Simuladores del examen final')
+    parser.add_argument('--log-level', default=None, help='INFO por defecto en las demos y WARNING en el resto')
+    commands = parser.add_subparsers(dest='simulator', required=True)
+
+    def latency(command):
+        command.add_argument('--latency', nargs=2, type=float, metavar=('MIN', 'MAX'))
+
+    def transport(command):
+        command.add_argument('--transport', choices=('uds', 'tcp'))
+
+    command = commands.add_parser('ejercicio1', help='sistema de eventos del notebook')
+    command.add_argument('--modificado', action='store_true')
+    command.set_defaults(run=run_ejercicio1, demo=True)
+
+    command = commands.add_parser('ejercicio2', help='robots: instantáneas, Raymond y relojes vectoriales')
+    command.add_argument('--modificado', action='store_true')
+    transport(command)
+    latency(command)
+    command.set_defaults(run=run_ejercicio2, demo=True)
+
+    command = commands.add_parser('ejercicio3', help='exclusión mutua y terminación con asyncio')
+    command.add_argument('command', nargs='?', default='demo', choices=('demo', 'benchmark', 'termination', 'processes'))
+    command.add_argument('--nodes', type=int)
+    command.add_argument('--requesters', type=int)
+    command.add_argument('--mailbox-size', type=int, default=0)
+    command.add_argument('--budget', type=int, default=100000)
+    command.add_argument('--fanout', type=int, default=4)
+    command.add_argument('--processes', type=int, default=4)
+    transport(command)
+    latency(command)
+    command.set_defaults(run=run_ejercicio3)
+
+    command = commands.add_parser('ejercicio3m', help='exclusión mutua con hilos')
+    transport(command)
+    command.set_defaults(run=run_ejercicio3m, demo=True)
+
+    command = commands.add_parser('raft', help='clúster Raft (Ejercicio4)')
+    command.add_argument('command', nargs='?', default='demo', choices=('demo', 'sweep', 'failover', 'replication', 'kv'))
+    command.add_argument('--nodes', type=int)
+    command.add_argument('--seeds', type=int, default=50)
+    command.add_argument('--duration', type=float)
+    command.add_argument('--clients', type=int, default=100)
+    command.add_argument('--read-ratio', type=float, default=0.5)
+    command.add_argument('--lease', action='store_true')
+    transport(command)
+    latency(command)
+    command.set_defaults(run=run_raft)
+
+    command = commands.add_parser('multi-raft', help='miles de grupos Raft sobre pocos hosts')
+    command.add_argument('--hosts', type=int, default=5)
+    command.add_argument('--groups', type=int, default=1000)
+    command.add_argument('--duration', type=float, default=5.0)
+    latency(command)
+    command.set_defaults(run=run_multi_raft)
+
+    command = commands.add_parser('shards', help='grupos Raft repartidos entre procesos')
+    command.add_argument('--workers', type=int)
+    command.add_argument('--groups', type=int, default=200)
+    command.add_argument('--seed', type=int)
+    command.add_argument('--duration', type=float, default=10.0)
+    latency(command)
+    command.set_defaults(run=run_shards)
+
+    command = commands.add_parser('bench', help='banco de pruebas común con resultados en JSON', add_help=False)
+    command.add_argument('args', nargs=argparse.REMAINDER)
+    command.set_defaults(run=run_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    demo = getattr(args, 'demo', False) or getattr(args, 'command', None) == 'demo'
+    logging.basicConfig(level=args.log_level or ('INFO' if demo else 'WARNING'))
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# Codec binario compartido por todas las redes simuladas.
+#
+# Cada tipo de mensaje es una clase con __slots__ y un esquema: una lista de
+# campos (nombre, tipo). Los campos de tamaño fijo ('q', 'Q', 'I', '?', 'd')
+# se empaquetan con un único struct.Struct precompilado detrás de la etiqueta
+# de tipo (un byte); los campos 'value' van a continuación con una
+# codificación etiquetada al estilo msgpack (None, bool, int, float, str,
+# bytes, list, tuple y dict).
+#
+# decode lee con unpack_from directamente sobre un memoryview del buffer
+# recibido, sin copiarlo: una trama con muchos mensajes se recorre por
+# desplazamientos y cada mensaje se decodifica en su sitio (decode_from).
+# Los remitentes viajan como identificadores, nunca como referencias a nodos,
+# así que los mensajes pueden ir por sockets o IPC tal cual.
+import struct
+
+NONE, FALSE, TRUE, INT, BIGINT, FLOAT, STR, BYTES, LIST, TUPLE, DICT = range(11)
+
+INT_FORMAT = struct.Struct('<q')
+FLOAT_FORMAT = struct.Struct('<d')
+LENGTH_FORMAT = struct.Struct('<I')
+FIXED_CODES = 'qQI?d'
+
+def pack_value(value, out):
+    kind = type(value)
+    if value is None:
+        out.append(NONE)
+    elif kind is bool:
+        out.append(TRUE if value else FALSE)
+    elif kind is int:
+        if -(1 << 63) <= value < (1 << 63):
+            out.append(INT)
+            out += INT_FORMAT.pack(value)
+        else:
+            data = str(value).encode()
+            out.append(BIGINT)
+            out += LENGTH_FORMAT.pack(len(data))
+            out += data
+    elif kind is float:
+        out.append(FLOAT)
+        out += FLOAT_FORMAT.pack(value)
+    elif kind is str:
+        data = value.encode()
+        out.append(STR)
+        out += LENGTH_FORMAT.pack(len(data))
+        out += data
+    elif kind in (bytes, bytearray, memoryview):
+        out.append(BYTES)
+        out += LENGTH_FORMAT.pack(len(value))
+        out += value
+    elif kind in (list, tuple):
+        out.append(LIST if kind is list else TUPLE)
+        out += LENGTH_FORMAT.pack(len(value))
+        for item in value:
+            pack_value(item, out)
+    elif kind is dict:
+        out.append(DICT)
+        out += LENGTH_FORMAT.pack(len(value))
+        for key, item in value.items():
+            pack_value(key, out)
+            pack_value(item, out)
+    else:
+        raise TypeError(f'Cannot encode value of type {kind.__name__}')
+
+# Devuelve (valor, desplazamiento siguiente). Los bytes se copian: un valor
+# decodificado puede quedarse en el log y no debe retener la trama entera
+def unpack_value(view, offset):
+    tag = view[offset]
+    offset += 1
+    if tag == NONE:
+        return None, offset
+    if tag == FALSE or tag == TRUE:
+        return tag == TRUE, offset
+    if tag == INT:
+        return INT_FORMAT.unpack_from(view, offset)[0], offset + INT_FORMAT.size
+    if tag == FLOAT:
+        return FLOAT_FORMAT.unpack_from(view, offset)[0], offset + FLOAT_FORMAT.size
+    (length,) = LENGTH_FORMAT.unpack_from(view, offset)
+    offset += LENGTH_FORMAT.size
+    if tag == STR:
+        return str(view[offset:offset + length], 'utf-8'), offset + length
+    if tag == BYTES:
+        return bytes(view[offset:offset + length]), offset + length
+    if tag == BIGINT:
+        return int(str(view[offset:offset + length], 'ascii')), offset + length
+    if tag == LIST or tag == TUPLE:
+        items = []
+        for _ in range(length):
+            item, offset = unpack_value(view, offset)
+            items.append(item)
+        return (items if tag == LIST else tuple(items)), offset
+    if tag == DICT:
+        result = {}
+        for _ in range(length):
+            key, offset = unpack_value(view, offset)
+            result[key], offset = unpack_value(view, offset)
+        return result, offset
+    raise ValueError(f'Unknown value tag {tag}')
+
+def encode_value(value):
+    out = bytearray()
+    pack_value(value, out)
+    return bytes(out)
+
+def decode_value(buffer):
+    return unpack_value(memoryview(buffer), 0)[0]
+
+TYPES = {}
+
+class WireMessage:
+    __slots__ = ()
+    tag = 0
+    schema = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.astuple() == other.astuple()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+# Genera __init__ y astuple con los campos del esquema, como hace dataclasses:
+# sin bucles ni setattr en el camino caliente
+def compile_methods(names):
+    arguments = ''.join(f', {name}' for name in names)
+    assignments = ''.join(f'\n    self.{name} = {name}' for name in names) or '\n    pass'
+    namespace = {}
+    exec(f'def __init__(self{arguments}):{assignments}\n'
+         f'def astuple(self):\n    return ({"".join(f"self.{name}, " for name in names)})', namespace)
+    return namespace['__init__'], namespace['astuple']
+
+# Registra una clase de mensaje y precompila su struct de campos fijos. Los
+# campos 'value' van siempre al final del esquema
+def message_type(tag, *schema):
+    def register(cls):
+        if tag in TYPES:
+            raise ValueError(f'Duplicate message tag {tag}')
+        names = tuple(name for name, _ in schema)
+        if cls.__slots__ != names:
+            raise ValueError(f'__slots__ of {cls.__name__} must match its schema {names}')
+        codes = [code for _, code in schema]
+        if 'value' in codes and any(code in FIXED_CODES for code in codes[codes.index('value'):]):
+            raise ValueError(f'Fixed fields must precede value fields in {cls.__name__}')
+        cls.tag = tag
+        cls.schema = schema
+        cls.values = tuple(name for name, code in schema if code == 'value')
+        cls.header = struct.Struct('<B' + ''.join(code for code in codes if code in FIXED_CODES))
+        cls.__init__, cls.astuple = compile_methods(names)
+        TYPES[tag] = cls
+        return cls
+    return register
+
+def encode(message):
+    cls = type(message)
+    fields = message.astuple()
+    if not cls.values:
+        return cls.header.pack(cls.tag, *fields)
+    count = len(fields) - len(cls.values)
+    out = bytearray(cls.header.pack(cls.tag, *fields[:count]))
+    for value in fields[count:]:
+        pack_value(value, out)
+    return bytes(out)
+
+# Decodifica el mensaje que empieza en `offset` y devuelve (mensaje, fin)
+def decode_from(view, offset=0):
+    cls = TYPES[view[offset]]
+    fields = cls.header.unpack_from(view, offset)
+    offset += cls.header.size
+    if not cls.values:
+        return cls(*fields[1:]), offset
+    values = []
+    for _ in cls.values:
+        value, offset = unpack_value(view, offset)
+        values.append(value)
+    return cls(*fields[1:], *values), offset
+
+def decode(buffer):
+    return decode_from(memoryview(buffer))[0]
+
+# Mensajes de los nodos de Ejercicio3 y Ejercicio3_Modificado: remitente y
+# marca HLC seguidos del contenido de cada tipo
+@message_type(1, ('sender', 'q'), ('timestamp', 'Q'), ('request_timestamp', 'Q'), ('resource', 'value'))
+class Request(WireMessage):
+    __slots__ = ('sender', 'timestamp', 'request_timestamp', 'resource')
+
+@message_type(2, ('sender', 'q'), ('timestamp', 'Q'))
+class Reply(WireMessage):
+    __slots__ = ('sender', 'timestamp')
+
+@message_type(3, ('sender', 'q'), ('timestamp', 'Q'), ('budget', 'q'), ('fanout', 'I'), ('task', 'value'))
+class Task(WireMessage):
+    __slots__ = ('sender', 'timestamp', 'budget', 'fanout', 'task')
+
+@message_type(4, ('sender', 'q'), ('timestamp', 'Q'), ('count', 'q'))
+class Ack(WireMessage):
+    __slots__ = ('sender', 'timestamp', 'count')
+
+@message_type(5, ('sender', 'q'), ('timestamp', 'Q'), ('clock', 'Q'))
+class ClockSync(WireMessage):
+    __slots__ = ('sender', 'timestamp', 'clock')
+
+@message_type(6, ('sender', 'q'), ('timestamp', 'Q'))
+class Terminate(WireMessage):
+    __slots__ = ('sender', 'timestamp')
+
+# Mensajes de Raft (Ejercicio4); las entradas son tuplas (term, command)
+@message_type(16, ('term', 'q'), ('last_log_index', 'q'), ('last_log_term', 'q'))
+class RequestVote(WireMessage):
+    __slots__ = ('term', 'last_log_index', 'last_log_term')
+
+@message_type(17, ('term', 'q'), ('granted', '?'))
+class Vote(WireMessage):
+    __slots__ = ('term', 'granted')
+
+@message_type(18, ('term', 'q'), ('prev_index', 'q'), ('prev_term', 'q'), ('leader_commit', 'q'), ('seq', 'q'),
+              ('entries', 'value'))
+class AppendEntries(WireMessage):
+    __slots__ = ('term', 'prev_index', 'prev_term', 'leader_commit', 'seq', 'entries')
+
+@message_type(19, ('term', 'q'), ('success', '?'), ('index', 'q'), ('prev_index', 'q'), ('seq', 'q'))
+class AppendReply(WireMessage):
+    __slots__ = ('term', 'success', 'index', 'prev_index', 'seq')
+
+@message_type(20, ('term', 'q'), ('snapshot_index', 'q'), ('snapshot_term', 'q'), ('seq', 'q'), ('state', 'value'))
+class InstallSnapshot(WireMessage):
+    __slots__ = ('term', 'snapshot_index', 'snapshot_term', 'seq', 'state')
+
+# PreVote lleva el término que tendría la elección; PreVoteReply devuelve ese
+# término si concede y el propio del votante si no
+@message_type(21, ('term', 'q'), ('last_log_index', 'q'), ('last_log_term', 'q'))
+class PreVote(WireMessage):
+    __slots__ = ('term', 'last_log_index', 'last_log_term')
+
+@message_type(22, ('term', 'q'), ('granted', '?'))
+class PreVoteReply(WireMessage):
+    __slots__ = ('term', 'granted')
+
+# Contenido arbitrario de los robots de Ejercicio2
+@message_type(32, ('sender', 'q'), ('payload', 'value'))
+class Data(WireMessage):
+    __slots__ = ('sender', 'payload')
+
+# Marcador de Chandy-Lamport de Ejercicio2: va por el mismo canal que Data
+# para no adelantar a los mensajes enviados antes que él
+@message_type(33, ('sender', 'q'))
+class Marker(WireMessage):
+    __slots__ = ('sender',)
@@ -0,0 +1,54 @@
+# Reloj lógico híbrido (HLC) compartido por todas las implementaciones de Node.
+#
+# Una marca de tiempo es un único entero de 64 bits: los 48 bits altos son
+# milisegundos físicos y los 16 bajos un contador lógico. Así cada Message
+# lleva la marca empaquetada, las comparaciones son comparaciones de enteros y
+# el orden respeta la causalidad como un reloj de Lamport, pero sin alejarse
+# del tiempo físico.
+#
+# El tiempo físico se toma de time.monotonic_ns() anclado una sola vez al reloj
+# de pared, de modo que nunca retrocede aunque se ajuste la hora del sistema.
+# Cada reloj tiene su propio cerrojo (no hay cerrojo global): en la práctica
+# sólo lo usa su nodo y no hay contención. Ningún método es corrutina, así que
+# dentro de asyncio cada operación es atómica respecto al bucle de eventos.
+import threading
+import time
+
+LOGICAL_BITS = 16
+LOGICAL_MASK = (1 << LOGICAL_BITS) - 1
+
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+def physical_time():
+    return ((time.monotonic_ns() + _WALL_OFFSET_NS) // 1_000_000) << LOGICAL_BITS
+
+def pack(millis, logical=0):
+    return (millis << LOGICAL_BITS) | logical
+
+def unpack(timestamp):
+    return timestamp >> LOGICAL_BITS, timestamp & LOGICAL_MASK
+
+class HybridLogicalClock:
+    def __init__(self):
+        self.last = 0
+        self.lock = threading.Lock()
+
+    # Evento local o envío de un mensaje
+    def now(self):
+        pt = physical_time()
+        with self.lock:
+            timestamp = pt if pt > self.last else self.last + 1
+            self.last = timestamp
+        return timestamp
+
+    # Recepción de un mensaje con marca `received`
+    def update(self, received):
+        pt = physical_time()
+        with self.lock:
+            timestamp = max(pt, self.last + 1, received + 1)
+            self.last = timestamp
+        return timestamp
+
+    def __str__(self):
+        millis, logical = unpack(self.last)
+        return f'{millis}.{logical}'
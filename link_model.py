@@ -0,0 +1,181 @@
+# Modelo de enlace compartido por las redes simuladas y los transportes.
+#
+# LinkModel decide para cada mensaje si llega, cuántas veces y con qué
+# retraso, según el enlace dirigido (origen, destino) por el que viaja:
+# - latency: distribución de la latencia de propagación. Un número es una
+#   latencia fija, una tupla (min, max) una uniforme, y Fixed, Uniform,
+#   LogNormal o Trace (latencias medidas, reproducidas en orden) se pueden
+#   pasar directamente.
+# - bandwidth (bytes/s): cada enlace transmite un mensaje detrás de otro y
+#   cada mensaje tarda size / bandwidth en serializarse; los que llegan con
+#   el enlace ocupado esperan en su cola, así que la congestión alarga la
+#   cola de latencias.
+# - loss, duplicate, reorder: probabilidades por mensaje de perderse, llegar
+#   dos veces o saltarse el orden FIFO del enlace. Sin reorder los mensajes
+#   de un enlace nunca se adelantan entre sí. Los algoritmos de Ejercicio3
+#   suponen canales fiables; la pérdida y la duplicación son para Raft.
+# - links: modelos propios para enlaces concretos {(origen, destino): LinkModel}.
+#
+# delays(source, destination, size, now) devuelve los retrasos (relativos a
+# now) de cada copia entregada, vacío si se pierde. Cada red lo consulta con
+# su reloj: loop.time() en asyncio (incluido el reloj virtual) o
+# time.monotonic() en las redes con hilos, que entregan con DelayLine, y
+# programa la entrega en now + retraso: volver a leer el reloj desplazaría
+# cada mensaje unos microsegundos y podría invertir el orden del enlace. Las
+# redes con hilos llaman a delays desde varios hilos a la vez: el estado de
+# los enlaces (y el generador aleatorio) se modifica con `lock` tomado, o
+# dos envíos simultáneos podrían leer el mismo busy_until y adelantarse.
+import heapq
+import math
+import random
+import threading
+import time
+
+class Fixed:
+    def __init__(self, value):
+        self.value = value
+
+    def sample(self, rng):
+        return self.value
+
+class Uniform:
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng):
+        return rng.uniform(self.low, self.high)
+
+# La mediana es `median` y sigma da la dispersión: el p99 es median * e^(2.33 sigma)
+class LogNormal:
+    def __init__(self, median, sigma=0.5, cap=None):
+        self.mu = math.log(median)
+        self.sigma = sigma
+        self.cap = cap
+
+    def sample(self, rng):
+        value = rng.lognormvariate(self.mu, self.sigma)
+        return value if self.cap is None else min(value, self.cap)
+
+# Latencias medidas en segundos, reproducidas en orden y de forma cíclica
+class Trace:
+    def __init__(self, samples):
+        self.samples = list(samples)
+        self.position = 0
+
+    def sample(self, rng):
+        value = self.samples[self.position]
+        self.position = (self.position + 1) % len(self.samples)
+        return value
+
+# Una latencia por línea
+def load_trace(path):
+    with open(path) as file:
+        return Trace(float(line) for line in file if line.strip())
+
+def latency_distribution(latency):
+    if latency is None:
+        return Fixed(0.0)
+    if isinstance(latency, (int, float)):
+        return Fixed(latency)
+    if isinstance(latency, (tuple, list)):
+        return Uniform(*latency)
+    return latency
+
+class LinkModel:
+    def __init__(self, latency=None, bandwidth=None, loss=0.0, duplicate=0.0, reorder=0.0, links=None, rng=None):
+        self.latency = latency_distribution(latency)
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self.links = links or {}
+        self.rng = rng or random
+        # Estado por enlace: fin de la transmisión en curso y última llegada en orden
+        self.busy_until = {}
+        self.ready = {}
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.duplicated = 0
+        self.reordered = 0
+
+    def delays(self, source, destination, size, now):
+        link = self.links.get((source, destination))
+        if link is not None:
+            return link.delays(source, destination, size, now)
+        key = (source, destination)
+        with self.lock:
+            if self.loss and self.rng.random() < self.loss:
+                self.dropped += 1
+                return []
+            sent = now
+            if self.bandwidth:
+                sent = max(now, self.busy_until.get(key, now)) + size / self.bandwidth
+                self.busy_until[key] = sent
+            delays = [self.arrival(key, sent) - now]
+            if self.duplicate and self.rng.random() < self.duplicate:
+                self.duplicated += 1
+                delays.append(self.arrival(key, sent) - now)
+            return delays
+
+    # Se llama con `lock` tomado
+    def arrival(self, key, sent):
+        arrival = sent + self.latency.sample(self.rng)
+        if self.reorder and self.rng.random() < self.reorder:
+            self.reordered += 1
+            return arrival
+        arrival = max(arrival, self.ready.get(key, 0.0) + 1e-6)
+        self.ready[key] = arrival
+        return arrival
+
+    # Lo que estaba en cola o en vuelo en los enlaces de un nodo caído se pierde
+    def forget(self, node):
+        with self.lock:
+            for state in (self.busy_until, self.ready):
+                for key in [key for key in state if node in key]:
+                    del state[key]
+        for link in self.links.values():
+            link.forget(node)
+
+# Ejecuta funciones a su hora en un hilo propio, para las redes con hilos
+class DelayLine:
+    def __init__(self):
+        self.queue = []
+        self.sequence = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # `when` en tiempo de time.monotonic()
+    def call_at(self, when, function, *args):
+        with self.condition:
+            heapq.heappush(self.queue, (when, self.sequence, function, args))
+            self.sequence += 1
+            self.condition.notify()
+
+    def run(self):
+        with self.condition:
+            while True:
+                if not self.queue:
+                    if self.closed:
+                        return
+                    self.condition.wait()
+                    continue
+                wait = self.queue[0][0] - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                _, _, function, args = heapq.heappop(self.queue)
+                self.condition.release()
+                try:
+                    function(*args)
+                finally:
+                    self.condition.acquire()
+
+    # Entrega lo pendiente y termina
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
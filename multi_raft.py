@@ -0,0 +1,220 @@
+# Multi-Raft: cada nodo físico (Host) aloja réplicas de miles de grupos Raft.
+#
+# Un grupo es un conjunto de GroupReplica, una por host, cuyo id es el del
+# host; toda la lógica de Raft es la de RaftNode (Ejercicio4). Lo que cambia
+# es el camino de los mensajes y los temporizadores:
+# - post codifica el mensaje (codec.py) y lo añade a la trama del host hacia
+#   el host destino. Al final de la iteración del bucle el host envía una sola
+#   trama por par con los mensajes de todos los grupos (latidos,
+#   AppendEntries, votos, respuestas), programada con call_later: ni una
+#   corrutina ni un mensaje por grupo. El receptor recorre la trama sobre un
+#   memoryview y decodifica cada mensaje en su sitio.
+# - Un único ticker por host llama a tick() de todas sus réplicas, así que los
+#   latidos de los grupos que vencen en el mismo tick salen en la misma trama.
+# Las particiones (NetworkPartition) y las caídas se aplican a hosts enteros;
+# las tramas entre hosts siguen el modelo de enlace del host (link_model.py).
+import asyncio
+import logging
+import random
+import struct
+import sys
+import time
+from collections import defaultdict
+
+from codec import encode, decode_from
+from link_model import LinkModel
+from Ejercicio4 import RaftNode, NetworkPartition, NodeStatus, NotLeaderError, create_cluster, wait_for_leader
+
+logger = logging.getLogger(__name__)
+
+# Cada mensaje de la trama va precedido de su grupo (u32)
+GROUP_HEADER = struct.Struct('<I')
+
+class GroupReplica(RaftNode):
+    def __init__(self, host, group, **options):
+        super().__init__(host.id, host.network, [], **options)
+        self.host = host
+        self.group = group
+
+    # El ticker es el del host
+    def start(self):
+        pass
+
+    def post(self, recipient, message):
+        self.host.send(recipient.host, self.group, encode(message))
+
+    async def send_message(self, recipient, message):
+        self.post(recipient, message)
+
+class Host:
+    def __init__(self, id, network, latency=(0.1, 0.5), tick_interval=0.1, rng=None, link=None):
+        self.id = id
+        self.network = network
+        self.tick_interval = tick_interval
+        self.rng = rng or random
+        self.link = link or LinkModel(latency, rng=self.rng)
+        self.status = NodeStatus.UP
+        self.replicas = {}
+        self.outbox = defaultdict(bytearray)
+        self.flush_scheduled = False
+        self.ticker = None
+        self.batches_sent = 0
+        self.messages_sent = 0
+
+    def add_replica(self, group, **options):
+        replica = self.replicas[group] = GroupReplica(self, group, **options)
+        return replica
+
+    def start(self):
+        if self.ticker is None:
+            self.ticker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.ticker is not None:
+            self.ticker.cancel()
+            await asyncio.gather(self.ticker, return_exceptions=True)
+            self.ticker = None
+        for replica in self.replicas.values():
+            await replica.stop()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            if self.status == NodeStatus.UP:
+                for replica in self.replicas.values():
+                    replica.tick()
+
+    def can_reach(self, peer):
+        return self.status == NodeStatus.UP and peer.status == NodeStatus.UP and not self.network.is_partitioned(self.id, peer.id)
+
+    def send(self, peer, group, data):
+        frame = self.outbox[peer]
+        frame += GROUP_HEADER.pack(group)
+        frame += data
+        self.messages_sent += 1
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    # Una trama por host destino con los mensajes de todos los grupos; el
+    # tamaño de la trama cuenta para el ancho de banda del enlace
+    def flush(self):
+        self.flush_scheduled = False
+        outbox, self.outbox = self.outbox, defaultdict(bytearray)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        for peer, frame in outbox.items():
+            if not self.can_reach(peer):
+                continue
+            frame = bytes(frame)
+            for delay in self.link.delays(self.id, peer.id, len(frame), now):
+                loop.call_at(now + delay, peer.deliver, self, frame)
+            self.batches_sent += 1
+
+    def deliver(self, sender, frame):
+        if not sender.can_reach(self):
+            return
+        view = memoryview(frame)
+        offset = 0
+        while offset < len(view):
+            (group,) = GROUP_HEADER.unpack_from(view, offset)
+            message, offset = decode_from(view, offset + GROUP_HEADER.size)
+            replica = self.replicas.get(group)
+            if replica is not None:
+                replica.process_message(sender.replicas[group], message)
+
+    # Los mensajes en vuelo hacia o desde el host caído se pierden
+    def crash(self):
+        for replica in self.replicas.values():
+            replica.crash()
+        self.status = NodeStatus.DOWN
+        self.outbox.clear()
+        self.link.forget(self.id)
+        logger.info(f'Host {self.id} has crashed')
+
+    def recover(self):
+        for replica in self.replicas.values():
+            replica.recover()
+        self.status = NodeStatus.UP
+        logger.info(f'Host {self.id} has recovered')
+
+# `groups` grupos de `replication` réplicas repartidos en anillo sobre los hosts
+def create_multi_cluster(hosts, groups, network, replication=3, latency=(0.1, 0.5), tick_interval=0.1, link=None,
+                         **options):
+    cluster = [Host(i, network, latency, tick_interval, link=link) for i in range(hosts)]
+    members = []
+    for group in range(groups):
+        replicas = [cluster[(group + k) % hosts].add_replica(group, tick_interval=tick_interval, **options)
+                    for k in range(replication)]
+        for replica in replicas:
+            replica.nodes = replicas
+        members.append(replicas)
+    return cluster, members
+
+async def elect_all(members, timeout=30.0):
+    for replicas in members:
+        await replicas[0].start_election()
+    return [await wait_for_leader(replicas, timeout) for replicas in members]
+
+# Compara `groups` grupos como clústeres RaftNode independientes frente a los
+# mismos grupos sobre `hosts` hosts multi-Raft: mensajes de red, tareas vivas
+# y CPU por segundo con carga ligera (`writes` entradas por segundo en total)
+async def benchmark_multi_raft(hosts=5, groups=1000, replication=3, duration=5.0, writes=200, **options):
+    loop = asyncio.get_running_loop()
+    results = {}
+    for mode in ('raft', 'multi_raft'):
+        if mode == 'raft':
+            clusters = [create_cluster(replication, NetworkPartition(), **options) for _ in range(groups)]
+            for cluster in clusters:
+                for node in cluster:
+                    node.start()
+            members = clusters
+            sent = lambda: sum(node.messages_sent for cluster in clusters for node in cluster)
+        else:
+            physical, members = create_multi_cluster(hosts, groups, NetworkPartition(), replication, **options)
+            for host in physical:
+                host.start()
+            sent = lambda: sum(host.batches_sent for host in physical)
+        leaders = await elect_all(members)
+        sent_before = sent()
+        cpu = time.process_time()
+        start = loop.time()
+        committed = 0
+
+        async def write(leader, sequence):
+            nonlocal committed
+            try:
+                await leader.append_entries([f'write-{sequence}'])
+                committed += 1
+            except NotLeaderError:
+                pass
+
+        sequence = 0
+        pending = set()
+        while loop.time() - start < duration:
+            for _ in range(max(1, int(writes * 0.1))):
+                task = asyncio.create_task(write(random.choice(leaders), sequence))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                sequence += 1
+            await asyncio.sleep(0.1)
+        await asyncio.gather(*pending)
+        elapsed = loop.time() - start
+        results[mode] = {'messages_per_sec': (sent() - sent_before) / elapsed, 'tasks': len(asyncio.all_tasks()),
+                         'cpu_per_sec': (time.process_time() - cpu) / elapsed, 'committed': committed}
+        if mode == 'raft':
+            for cluster in clusters:
+                for node in cluster:
+                    await node.stop()
+        else:
+            for host in physical:
+                await host.stop()
+        result = results[mode]
+        print(f"{mode}: {groups} grupos, {result['messages_per_sec']:.0f} mensajes/s en la red, "
+              f"{result['tasks']} tareas, CPU {result['cpu_per_sec'] * 100:.0f}%, {result['committed']} entradas confirmadas")
+    return results
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    groups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    asyncio.run(benchmark_multi_raft(groups=groups, latency=(0.001, 0.005)))
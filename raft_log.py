@@ -0,0 +1,91 @@
+# Almacén del log de Raft en segmentos de tamaño fijo con compactación.
+#
+# Las entradas usan índices desde 1 y son tuplas (term, command). El segmento k
+# cubre los índices [base_index + k * segment_size, base_index + (k + 1) *
+# segment_size), por lo que localizar una entrada es aritmética y compactar
+# hasta una instantánea descarta segmentos enteros sin copiar el resto del log.
+# Las entradas de un segmento parcialmente cubierto por la instantánea siguen
+# en memoria hasta que el segmento completo queda por debajo de ella, así que
+# la memoria retenida es como mucho el tramo no compactado más un segmento.
+class SegmentedLog:
+    def __init__(self, segment_size=1024):
+        self.segment_size = segment_size
+        self.segments = []
+        self.base_index = 1
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.last = 0
+
+    def __len__(self):
+        return self.last - self.base_index + 1
+
+    def last_index(self):
+        return self.last
+
+    def last_term(self):
+        return self.term_at(self.last)
+
+    def locate(self, index):
+        segment, offset = divmod(index - self.base_index, self.segment_size)
+        return self.segments[segment][offset]
+
+    # Devuelve None para índices compactados o posteriores al final del log
+    def term_at(self, index):
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self.last:
+            return None
+        return self.locate(index)[0]
+
+    def entry(self, index):
+        return self.locate(index)
+
+    def entries_from(self, index, limit):
+        end = min(self.last, index + limit - 1)
+        if index > end:
+            return []
+        entries = []
+        segment, offset = divmod(index - self.base_index, self.segment_size)
+        while len(entries) < end - index + 1:
+            chunk = self.segments[segment][offset:offset + end - index + 1 - len(entries)]
+            entries.extend(chunk)
+            segment, offset = segment + 1, 0
+        return entries
+
+    def append(self, entries):
+        for entry in entries:
+            if not self.segments or len(self.segments[-1]) == self.segment_size:
+                self.segments.append([])
+            self.segments[-1].append(entry)
+        self.last += len(entries)
+
+    # Elimina la entrada `index` y todas las posteriores
+    def truncate_from(self, index):
+        if index > self.last:
+            return
+        if index <= self.snapshot_index:
+            raise ValueError(f'Cannot truncate compacted index {index}')
+        segment, offset = divmod(index - self.base_index, self.segment_size)
+        del self.segments[segment + 1:]
+        del self.segments[segment][offset:]
+        self.last = index - 1
+
+    # La instantánea cubre hasta `index`: se descartan los segmentos que
+    # quedan enteramente por debajo
+    def compact(self, index, term):
+        if index <= self.snapshot_index:
+            return
+        self.snapshot_index = index
+        self.snapshot_term = term
+        whole = (min(index, self.last) - self.base_index + 1) // self.segment_size
+        if whole > 0:
+            del self.segments[:whole]
+            self.base_index += whole * self.segment_size
+
+    # Descarta todo el log y lo reinicia justo después de una instantánea
+    def reset(self, index, term):
+        self.segments = []
+        self.base_index = index + 1
+        self.snapshot_index = index
+        self.snapshot_term = term
+        self.last = index
@@ -0,0 +1,356 @@
+# Simulación de muchos grupos Raft repartidos entre varios procesos.
+#
+# Cada grupo es un clúster independiente de RaftNode (Ejercicio4) con su propio
+# NetworkPartition. El nodo i del grupo g vive en el shard (g * group_size + i)
+# % workers, de modo que los nodos de un grupo quedan en procesos distintos y
+# el tráfico cruza la IPC. En cada shard los nodos de otros procesos son
+# RemoteNode: RaftNode los trata como a cualquier par (id, status,
+# receive_message) y el mensaje, ya codificado por send_message (codec.py) y
+# tras la latencia simulada en el emisor, se agrupa con los demás de la misma
+# iteración del bucle y viaja en una sola trama por un socketpair hacia el
+# shard destino, que la recorre sobre un memoryview sin copiarla.
+#
+# El proceso coordinador es el plano de control: decide caídas y particiones
+# y las difunde a todos los shards en el mismo orden; las elecciones las
+# convocan los temporizadores de cada nodo. Cada shard
+# mantiene una réplica de las particiones de sus grupos y del estado de los
+# nodos remotos, así que can_reach se evalúa igual que en un solo proceso; el
+# shard receptor vuelve a comprobar estado y partición al entregar, como hace
+# send_message tras la latencia.
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import random
+import socket
+import struct
+import sys
+from collections import defaultdict
+
+from codec import decode_from
+from Ejercicio4 import RaftNode, NetworkPartition, NodeStatus, Role, NotLeaderError, percentile
+from raft_storage import MmapStorage
+
+logger = logging.getLogger(__name__)
+
+# Tramas: longitud (u32) y contenido. Entre shards el contenido es una
+# secuencia de mensajes, cada uno precedido de grupo, destino y remitente; el
+# canal de control con el coordinador usa pickle
+FRAME_HEADER = struct.Struct('<I')
+ITEM_HEADER = struct.Struct('<III')
+
+def write_frame(writer, payload):
+    writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+async def read_frame(reader):
+    (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return await reader.readexactly(length)
+
+def write_control(writer, message):
+    write_frame(writer, pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+
+async def read_control(reader):
+    return pickle.loads(await read_frame(reader))
+
+def shard_of(group, node_id, group_size, workers):
+    return (group * group_size + node_id) % workers
+
+# Representante local de un nodo que vive en otro shard
+class RemoteNode:
+    def __init__(self, id, group, shard, transport):
+        self.id = id
+        self.group = group
+        self.shard = shard
+        self.transport = transport
+        self.status = NodeStatus.UP
+
+    async def receive_message(self, sender, data):
+        self.transport.send(self.shard, ITEM_HEADER.pack(self.group, self.id, sender.id) + data)
+
+class Shard:
+    def __init__(self, shard_id, workers, groups, group_size, storage_dir=None, clients=4, **options):
+        self.shard_id = shard_id
+        self.clients = clients
+        self.groups = {}
+        self.partitions = {}
+        self.local = []
+        self.outbox = defaultdict(bytearray)
+        self.flush_scheduled = False
+        self.writers = {}
+        self.active_clients = defaultdict(int)
+        self.latencies = []
+        self.messages_sent = 0
+        self.messages_received = 0
+        for group in range(groups):
+            placement = [shard_of(group, i, group_size, workers) for i in range(group_size)]
+            if shard_id not in placement:
+                continue
+            partitions = self.partitions[group] = NetworkPartition()
+            members = []
+            for node_id, shard in enumerate(placement):
+                if shard == shard_id:
+                    storage = None
+                    if storage_dir is not None:
+                        storage = MmapStorage(os.path.join(storage_dir, f'group{group}', f'node{node_id}'))
+                    node = RaftNode(node_id, partitions, members, storage=storage, **options)
+                    node.group = group
+                    self.local.append(node)
+                else:
+                    node = RemoteNode(node_id, group, shard, self)
+                members.append(node)
+            self.groups[group] = members
+
+    # Los mensajes hacia cada shard de una misma iteración salen en una trama
+    def send(self, shard, item):
+        self.outbox[shard] += item
+        self.messages_sent += 1
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        outbox, self.outbox = self.outbox, defaultdict(bytearray)
+        for shard, frame in outbox.items():
+            write_frame(self.writers[shard], frame)
+
+    def deliver(self, group, recipient_id, sender_id, message):
+        members = self.groups[group]
+        recipient = members[recipient_id]
+        if recipient.status == NodeStatus.UP and not self.partitions[group].is_partitioned(sender_id, recipient_id):
+            recipient.process_message(members[sender_id], message)
+
+    async def read_peer(self, reader):
+        while True:
+            try:
+                view = memoryview(await read_frame(reader))
+            except asyncio.IncompleteReadError:
+                return  # El otro shard ya terminó
+            offset = 0
+            while offset < len(view):
+                group, recipient_id, sender_id = ITEM_HEADER.unpack_from(view, offset)
+                message, offset = decode_from(view, offset + ITEM_HEADER.size)
+                self.deliver(group, recipient_id, sender_id, message)
+                self.messages_received += 1
+
+    def member(self, group, node_id):
+        members = self.groups.get(group)
+        return members[node_id] if members is not None else None
+
+    # Órdenes del coordinador; todas llegan a todos los shards en el mismo orden
+    def control(self, command, *args):
+        if command in ('crash', 'recover'):
+            node = self.member(*args)
+            if isinstance(node, RaftNode):
+                if command == 'crash':
+                    node.crash()
+                else:
+                    node.recover()
+            elif node is not None:
+                node.status = NodeStatus.DOWN if command == 'crash' else NodeStatus.UP
+        elif command == 'partition' and args[0] in self.partitions:
+            self.partitions[args[0]].add_partition(args[1])
+        elif command == 'heal' and args[0] in self.partitions:
+            self.partitions[args[0]].heal_partition(args[1])
+
+    async def client(self, node):
+        loop = asyncio.get_running_loop()
+        self.active_clients[node] += 1
+        try:
+            sequence = 0
+            while node.role == Role.LEADER:
+                sent = loop.time()
+                await node.append_entries([f'g{node.group}-n{node.id}-{sequence}'])
+                self.latencies.append(loop.time() - sent)
+                sequence += 1
+        except NotLeaderError:
+            pass
+        finally:
+            self.active_clients[node] -= 1
+
+    def leaders(self):
+        return [node for node in self.local if node.role == Role.LEADER and node.status == NodeStatus.UP]
+
+    # Informa periódicamente al coordinador de qué grupos tienen líder aquí
+    # y arranca la carga de clientes en los líderes nuevos
+    async def report(self, writer, interval):
+        while True:
+            for node in self.leaders():
+                for _ in range(self.clients - self.active_clients[node]):
+                    node.spawn(self.client(node))
+            write_control(writer, ('status', self.shard_id, [(node.group, node.term) for node in self.leaders()]))
+            await asyncio.sleep(interval)
+
+    def result(self):
+        return {'shard': self.shard_id, 'committed': len(self.latencies), 'latencies': self.latencies,
+                'messages_sent': self.messages_sent, 'messages_received': self.messages_received,
+                'nodes': [(node.group, node.id, node.term, node.last_applied, node.state_machine.digest()) for node in self.local]}
+
+    async def run(self, control_sock, peer_socks, report_interval=0.25):
+        control_reader, control_writer = await asyncio.open_connection(sock=control_sock)
+        readers = []
+        for shard, sock in peer_socks.items():
+            reader, self.writers[shard] = await asyncio.open_connection(sock=sock)
+            readers.append(asyncio.create_task(self.read_peer(reader)))
+        for node in self.local:
+            node.start()
+        reporter = asyncio.create_task(self.report(control_writer, report_interval))
+        while True:
+            command = await read_control(control_reader)
+            if command[0] == 'stop':
+                break
+            self.control(*command)
+        for task in (reporter, *readers):
+            task.cancel()
+        for node in self.local:
+            await node.stop()
+            node.storage.close()
+        write_control(control_writer, ('result', self.result()))
+        control_writer.close()
+        await control_writer.wait_closed()
+
+def shard_main(shard_id, workers, groups, group_size, control_sock, peer_socks, options):
+    logging.getLogger().setLevel(logging.WARNING)
+    shard = Shard(shard_id, workers, groups, group_size, **options)
+    asyncio.run(shard.run(control_sock, peer_socks))
+
+# Plano de control: lanza los shards, inyecta fallos y convoca elecciones en
+# los grupos sin líder; al terminar cura todo, deja converger y comprueba que
+# las réplicas de cada grupo con el mismo last_applied tienen el mismo estado
+class Coordinator:
+    def __init__(self, groups=200, group_size=3, workers=None, seed=None, **options):
+        self.groups = groups
+        self.group_size = group_size
+        self.workers = workers or os.cpu_count() or 1
+        self.options = options
+        self.rng = random.Random(seed)
+        self.partitions = defaultdict(NetworkPartition)
+        self.down = set()
+        self.leaders = {}
+        self.writers = []
+        self.results = []
+
+    def broadcast(self, *command):
+        for writer in self.writers:
+            write_control(writer, command)
+
+    def crash(self, group, node_id):
+        self.down.add((group, node_id))
+        self.broadcast('crash', group, node_id)
+
+    def recover(self, group, node_id):
+        if (group, node_id) in self.down:
+            self.down.discard((group, node_id))
+            self.broadcast('recover', group, node_id)
+
+    def add_partition(self, group, members):
+        partition_id = self.partitions[group].add_partition(members)
+        self.broadcast('partition', group, members)
+        return partition_id
+
+    def heal_partition(self, group, partition_id):
+        self.partitions[group].heal_partition(partition_id)
+        self.broadcast('heal', group, partition_id)
+
+    async def read_shard(self, reader):
+        while True:
+            message = await read_control(reader)
+            if message[0] == 'status':
+                self.leaders[message[1]] = {group for group, _ in message[2]}
+            elif message[0] == 'result':
+                self.results.append(message[1])
+                return
+
+    async def chaos(self, failure_interval, downtime):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(failure_interval)
+            group = self.rng.randrange(self.groups)
+            if self.rng.random() < 0.5:
+                node_id = self.rng.randrange(self.group_size)
+                if (group, node_id) not in self.down:
+                    self.crash(group, node_id)
+                    loop.call_later(self.rng.uniform(*downtime), self.recover, group, node_id)
+            elif self.group_size > 2:
+                members = self.rng.sample(range(self.group_size), k=self.rng.randint(1, self.group_size - 1))
+                partition_id = self.add_partition(group, members)
+                loop.call_later(self.rng.uniform(*downtime), self.heal_partition, group, partition_id)
+
+    async def run(self, duration=10.0, settle=5.0, failure_interval=0.05, downtime=(0.5, 2.0), chaos=True):
+        controls = [socket.socketpair() for _ in range(self.workers)]
+        peers = defaultdict(dict)
+        for a in range(self.workers):
+            for b in range(a + 1, self.workers):
+                peers[a][b], peers[b][a] = socket.socketpair()
+        processes = [multiprocessing.Process(target=shard_main, daemon=True,
+                                             args=(shard, self.workers, self.groups, self.group_size,
+                                                   controls[shard][1], peers[shard], self.options))
+                     for shard in range(self.workers)]
+        for process in processes:
+            process.start()
+        for _, child in controls:
+            child.close()
+        for socks in peers.values():
+            for sock in socks.values():
+                sock.close()
+        readers = []
+        for parent, _ in controls:
+            reader, writer = await asyncio.open_connection(sock=parent)
+            self.writers.append(writer)
+            readers.append(asyncio.create_task(self.read_shard(reader)))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        injector = asyncio.create_task(self.chaos(failure_interval, downtime)) if chaos else None
+        while loop.time() - start < duration + settle:
+            if injector is not None and loop.time() - start >= duration:
+                # Fin de la fase de fallos: se cura todo para que los grupos converjan
+                injector.cancel()
+                injector = None
+                for group, partitions in list(self.partitions.items()):
+                    for partition_id in list(partitions.partitions):
+                        self.heal_partition(group, partition_id)
+                for group, node_id in list(self.down):
+                    self.recover(group, node_id)
+            await asyncio.sleep(0.1)
+        self.broadcast('stop')
+        await asyncio.gather(*readers)
+        for process in processes:
+            process.join()
+        elapsed = loop.time() - start
+        return self.summary(elapsed)
+
+    def summary(self, elapsed):
+        replicas = defaultdict(list)
+        for result in self.results:
+            for group, node_id, term, last_applied, digest in result['nodes']:
+                replicas[group].append((last_applied, digest, node_id))
+        violations = []
+        for group, states in replicas.items():
+            seen = {}
+            for last_applied, digest, node_id in states:
+                if seen.setdefault(last_applied, digest) != digest:
+                    violations.append((group, node_id, last_applied))
+        latencies = [latency for result in self.results for latency in result['latencies']]
+        summary = {'workers': self.workers, 'groups': self.groups, 'nodes': self.groups * self.group_size,
+                   'committed_per_sec': len(latencies) / elapsed,
+                   'ipc_messages': sum(result['messages_sent'] for result in self.results),
+                   'latency_p50': percentile(latencies, 0.5), 'latency_p99': percentile(latencies, 0.99),
+                   'groups_led': len({group for groups in self.leaders.values() for group in groups}),
+                   'violations': violations}
+        print(f"{summary['workers']} procesos, {summary['groups']} grupos ({summary['nodes']} nodos): "
+              f"{summary['committed_per_sec']:.0f} entradas/s, {summary['ipc_messages']} mensajes entre procesos, "
+              f"latencia p50 {summary['latency_p50'] * 1000:.0f} ms, p99 {summary['latency_p99'] * 1000:.0f} ms, "
+              f"{summary['groups_led']} grupos con líder, {len(violations)} discrepancias")
+        return summary
+
+def run_sharded(groups=200, group_size=3, workers=None, seed=None, duration=10.0, **options):
+    run_options = {key: options.pop(key) for key in ('settle', 'failure_interval', 'downtime', 'chaos')
+                   if key in options}
+    coordinator = Coordinator(groups, group_size, workers, seed, **options)
+    return asyncio.run(coordinator.run(duration, **run_options))
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    run_sharded(workers=workers, latency=(0.001, 0.005))
@@ -0,0 +1,372 @@
+# Almacenamiento persistente para RaftNode.
+#
+# Un backend guarda el término, el voto, las entradas del log y la última
+# instantánea. RaftNode escribe de forma síncrona (append, truncate_from,
+# save_state, save_snapshot, install_snapshot) y sólo responde a un voto o a un AppendEntries
+# después de `await storage.sync()`. Así varias escrituras comparten un mismo
+# fsync (group commit) en lugar de pagar uno por entrada. Los fsync corren en
+# el executor; el hilo sólo recibe lo que tiene que sincronizar, nunca lee el
+# estado que el bucle sigue modificando.
+#
+# MemoryStorage modela un disco perfecto: todo lo escrito es duradero al
+# instante y sobrevive a crash(). MmapStorage escribe en archivos de segmento
+# preasignados y mapeados en memoria; crash() descarta lo que no llegó a
+# sincronizarse, como un corte de luz.
+import asyncio
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+from raft_log import SegmentedLog
+
+class MemoryStorage:
+    needs_sync = False
+
+    def __init__(self):
+        self.term = 0
+        self.voted_for = None
+        self.snapshot = None
+        self.log = SegmentedLog()
+
+    def save_state(self, term, voted_for):
+        self.term = term
+        self.voted_for = voted_for
+
+    def append(self, start_index, entries):
+        self.log.truncate_from(start_index)
+        self.log.append(entries)
+
+    def truncate_from(self, index):
+        if index > self.log.snapshot_index:
+            self.log.truncate_from(index)
+
+    def save_snapshot(self, index, term, state):
+        self.snapshot = (index, term, state)
+        if self.log.term_at(index) == term:
+            self.log.compact(index, term)
+        else:
+            self.log.reset(index, term)
+
+    def install_snapshot(self, index, term, state):
+        self.snapshot = (index, term, state)
+        self.log.reset(index, term)
+
+    async def sync(self):
+        return
+
+    def crash(self):
+        pass
+
+    # Rellena `log` con el contenido persistido y devuelve (term, voted_for, snapshot)
+    def load(self, log):
+        log.reset(self.log.snapshot_index, self.log.snapshot_term)
+        log.append(self.log.entries_from(self.log.snapshot_index + 1, self.log.last_index()))
+        return self.term, self.voted_for, self.snapshot
+
+    def close(self):
+        pass
+
+# Formato de registro: longitud (u32), crc32 (u32), tipo (u8) y carga útil.
+# Un encabezado a cero marca el final de los registros válidos de un segmento.
+RECORD_HEADER = struct.Struct('<IIB')
+STATE_RECORD = 1
+ENTRIES_RECORD = 2
+TRUNCATE_RECORD = 3
+STATE_PAYLOAD = struct.Struct('<qq')
+INDEX_PAYLOAD = struct.Struct('<q')
+
+class Segment:
+    def __init__(self, number, path, size=None):
+        self.number = number
+        self.file = open(path, 'w+b' if size else 'r+b')
+        if size:
+            self.file.truncate(size)  # Preasignado: escribir no cambia el tamaño del archivo
+        self.mapped = mmap.mmap(self.file.fileno(), 0)
+        self.max_index = 0
+
+    def close(self):
+        self.mapped.close()
+        self.file.close()
+
+# msync de los mapas: los datos llegan al disco. Se ejecuta en el executor
+def msync(mapped):
+    for region in mapped:
+        region.flush()
+
+class MmapStorage:
+    needs_sync = True
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, group_commit=True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.group_commit = group_commit
+        self.term = 0
+        self.voted_for = None
+        self.snapshot = None
+        self.segments = []
+        self.position = 0           # Próximo byte libre del segmento activo
+        self.dirty = set()
+        self.written = 0            # Registros escritos
+        self.synced = 0             # Registros ya sincronizados
+        self.synced_at = (0, 0)     # (segmento, posición) de la última sincronización
+        self.flush_task = None
+        self.generation = 0         # Cambia en cada crash(): invalida un fsync en curso
+        self.fsyncs = 0
+        self.pending_snapshot = None  # (índice, instantánea) a la espera de escribirse
+        self.snapshot_task = None
+        self.snapshot_writes = 0
+        self.durable_snapshot = 0   # Índice de la instantánea que hay en disco
+        # Ordena el os.replace de una instantánea con crash() y con las demás
+        # escrituras: una de antes del corte, o más antigua que la que ya está
+        # en disco, no puede sustituirla
+        self.generation_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f'segment-{number:08d}.wal')
+
+    def snapshot_path(self):
+        return os.path.join(self.directory, 'snapshot.bin')
+
+    def sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # Un segmento nuevo empieza siempre con el término y el voto vigentes, de
+    # modo que los segmentos anteriores pueden borrarse tras una instantánea
+    def rotate(self, needed):
+        number = self.segments[-1].number + 1 if self.segments else 1
+        size = max(self.segment_bytes, needed + 2 * RECORD_HEADER.size + STATE_PAYLOAD.size)
+        self.segments.append(Segment(number, self.segment_path(number), size))
+        self.sync_directory()
+        self.position = 0
+        self.write_record(STATE_RECORD, self.state_payload())
+
+    def state_payload(self):
+        return STATE_PAYLOAD.pack(self.term, -1 if self.voted_for is None else self.voted_for)
+
+    def write_record(self, kind, payload, max_index=0):
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload, kind), kind) + payload
+        if not self.segments or self.position + len(record) + RECORD_HEADER.size > len(self.segments[-1].mapped):
+            self.rotate(len(record))
+        segment = self.segments[-1]
+        segment.mapped[self.position:self.position + len(record)] = record
+        segment.max_index = max(segment.max_index, max_index)
+        self.position += len(record)
+        self.dirty.add(segment)
+        self.written += 1
+        if not self.group_commit:
+            self.flush()
+
+    def save_state(self, term, voted_for):
+        self.term = term
+        self.voted_for = voted_for
+        self.write_record(STATE_RECORD, self.state_payload())
+
+    def append(self, start_index, entries):
+        payload = INDEX_PAYLOAD.pack(start_index) + pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+        self.write_record(ENTRIES_RECORD, payload, start_index + len(entries) - 1)
+
+    def truncate_from(self, index):
+        self.write_record(TRUNCATE_RECORD, INDEX_PAYLOAD.pack(index))
+
+    # La instantánea va a un archivo aparte escrito de forma atómica en el
+    # executor; si llegan varias mientras se escribe una, sólo se escribe la
+    # última. Cuando es duradera se borran los segmentos sincronizados que
+    # sólo contienen entradas cubiertas por ella
+    def save_snapshot(self, index, term, state):
+        self.snapshot = (index, term, state)
+        self.pending_snapshot = (index, self.snapshot)
+        if self.snapshot_task is None:
+            self.snapshot_task = asyncio.get_running_loop().create_task(self.write_snapshots())
+
+    async def write_snapshots(self):
+        loop = asyncio.get_running_loop()
+        generation = self.generation
+        try:
+            while self.pending_snapshot is not None and generation == self.generation:
+                index, snapshot = self.pending_snapshot
+                self.pending_snapshot = None
+                written = await loop.run_in_executor(None, self.write_snapshot_file, snapshot, self.temporary_path(),
+                                                     generation)
+                if written and generation == self.generation:
+                    self.drop_segments(index)
+        finally:
+            if self.snapshot_task is asyncio.current_task():
+                self.snapshot_task = None
+
+    # Una instantánea que sustituye al log entero (InstallSnapshot con un log
+    # que no la contiene) se escribe aquí mismo, antes de cualquier registro
+    # posterior: las entradas que sigan no empalman con el log anterior y sin
+    # la instantánea en disco la recuperación las pondría tras la cola vieja
+    def install_snapshot(self, index, term, state):
+        self.snapshot = (index, term, state)
+        self.pending_snapshot = None
+        self.write_snapshot_file(self.snapshot, self.temporary_path(), self.generation)
+        self.truncate_from(index + 1)
+        self.drop_segments(index)
+
+    def temporary_path(self):
+        self.snapshot_writes += 1
+        return f'{self.snapshot_path()}.{self.generation}-{self.snapshot_writes}.tmp'
+
+    def write_snapshot_file(self, snapshot, temporary, generation):
+        with open(temporary, 'wb') as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        with self.generation_lock:
+            if generation != self.generation or snapshot[0] <= self.durable_snapshot:
+                os.remove(temporary)
+                return False
+            os.replace(temporary, self.snapshot_path())
+            self.durable_snapshot = snapshot[0]
+        self.sync_directory()
+        return True
+
+    def drop_segments(self, index):
+        while (self.flush_task is None and len(self.segments) > 1 and
+               self.segments[0].max_index <= index and self.segments[0] not in self.dirty):
+            segment = self.segments.pop(0)
+            segment.close()
+            os.remove(self.segment_path(segment.number))
+
+    # Lo que cubre un fsync se fija en el hilo del bucle: registros escritos,
+    # (segmento, posición) alcanzados y los mapas sucios
+    def start_flush(self):
+        position = (self.segments[-1].number, self.position) if self.segments else (0, 0)
+        dirty, self.dirty = self.dirty, set()
+        return self.generation, self.written, position, [segment.mapped for segment in dirty]
+
+    def finish_flush(self, generation, upto, position):
+        if generation == self.generation:
+            self.fsyncs += 1
+            self.synced = max(self.synced, upto)
+            self.synced_at = max(self.synced_at, position)
+
+    def flush(self):
+        generation, upto, position, mapped = self.start_flush()
+        try:
+            msync(mapped)
+        except ValueError:
+            return
+        self.finish_flush(generation, upto, position)
+
+    # Group commit: quien llega mientras hay un fsync en curso espera al
+    # siguiente, que cubrirá de una vez todas las escrituras acumuladas. Una
+    # instantánea en curso también cuenta como escritura pendiente
+    async def sync(self):
+        target = self.written
+        while self.synced < target:
+            if self.flush_task is None:
+                self.flush_task = asyncio.get_running_loop().create_task(self.flush_in_thread())
+            await asyncio.shield(self.flush_task)
+        if self.snapshot_task is not None:
+            await asyncio.shield(self.snapshot_task)
+
+    async def flush_in_thread(self):
+        generation, upto, position, mapped = self.start_flush()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, msync, mapped)
+            self.finish_flush(generation, upto, position)
+        except ValueError:
+            pass  # Un crash() cerró el segmento durante el fsync
+        finally:
+            if self.flush_task is asyncio.current_task():
+                self.flush_task = None
+
+    # Simula un corte de luz: se pierde todo lo escrito tras la última sincronización
+    def crash(self):
+        with self.generation_lock:
+            self.generation += 1
+        self.flush_task = None
+        self.snapshot_task = None
+        self.pending_snapshot = None
+        number, position = self.synced_at
+        for segment in self.segments:
+            if segment.number > number:
+                segment.close()
+                os.remove(self.segment_path(segment.number))
+            else:
+                if segment.number == number:
+                    segment.mapped[position:] = bytes(len(segment.mapped) - position)
+                    segment.mapped.flush()
+                segment.close()
+        self.segments = []
+        self.dirty.clear()
+        self.written = self.synced
+
+    # Reconstruye el estado a partir de la instantánea y los segmentos;
+    # rellena `log` y devuelve (term, voted_for, snapshot)
+    def load(self, log):
+        self.close()
+        self.term, self.voted_for, self.snapshot = 0, None, None
+        if os.path.exists(self.snapshot_path()):
+            with open(self.snapshot_path(), 'rb') as file:
+                self.snapshot = pickle.load(file)
+        index, term = self.snapshot[:2] if self.snapshot else (0, 0)
+        self.durable_snapshot = index
+        log.reset(index, term)
+        numbers = sorted(int(name[8:16]) for name in os.listdir(self.directory)
+                         if name.startswith('segment-') and name.endswith('.wal'))
+        for position, number in enumerate(numbers):
+            segment = Segment(number, self.segment_path(number))
+            self.segments.append(segment)
+            self.position, complete = self.replay_segment(segment, log)
+            if not complete:
+                # Lo posterior a un registro incompleto nunca llegó a confirmarse
+                for later in numbers[position + 1:]:
+                    os.remove(self.segment_path(later))
+                break
+        self.synced_at = (self.segments[-1].number, self.position) if self.segments else (0, 0)
+        return self.term, self.voted_for, self.snapshot
+
+    # Devuelve (fin de los registros válidos, si el segmento terminó limpio)
+    def replay_segment(self, segment, log):
+        mapped = segment.mapped
+        position = 0
+        while position + RECORD_HEADER.size <= len(mapped):
+            length, checksum, kind = RECORD_HEADER.unpack_from(mapped, position)
+            if kind == 0:
+                return position, True
+            start = position + RECORD_HEADER.size
+            payload = mapped[start:start + length]
+            if len(payload) < length or zlib.crc32(payload, kind) != checksum:
+                mapped[position:] = bytes(len(mapped) - position)
+                return position, False
+            self.replay_record(segment, kind, payload, log)
+            position = start + length
+        return position, True
+
+    def replay_record(self, segment, kind, payload, log):
+        if kind == STATE_RECORD:
+            term, voted_for = STATE_PAYLOAD.unpack(payload)
+            self.term, self.voted_for = term, None if voted_for < 0 else voted_for
+        elif kind == ENTRIES_RECORD:
+            (start,) = INDEX_PAYLOAD.unpack_from(payload)
+            entries = pickle.loads(payload[INDEX_PAYLOAD.size:])
+            segment.max_index = max(segment.max_index, start + len(entries) - 1)
+            skip = max(0, log.snapshot_index + 1 - start)
+            if start + skip > log.last_index() + 1:
+                raise ValueError(f'WAL in {self.directory} has a gap: entries from {start + skip} '
+                                 f'follow index {log.last_index()}')
+            if skip < len(entries):
+                log.truncate_from(start + skip)
+                log.append(entries[skip:])
+        elif kind == TRUNCATE_RECORD:
+            (index,) = INDEX_PAYLOAD.unpack(payload)
+            if index > log.snapshot_index:
+                log.truncate_from(index)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        self.dirty.clear()
+        self.position = 0
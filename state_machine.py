@@ -0,0 +1,58 @@
+# Máquinas de estados para RaftNode (Ejercicio4).
+#
+# RaftNode aplica cada entrada confirmada, en orden y una sola vez, a un
+# objeto con esta interfaz:
+#   apply(index, command)   aplica el comando y devuelve su resultado
+#   query(query)            lectura sin modificar el estado
+#   snapshot()              estado completo, codificable con codec.py
+#   restore(state)          sustituye el estado por el de una instantánea
+#   digest()                resumen para comparar réplicas
+#
+# KVStore es la máquina por defecto: un diccionario en memoria con los
+# comandos ('put', key, value), ('delete', key) y ('get', key). Cualquier
+# otro comando (las cadenas de los ejemplos) se aplica sin efecto. El resumen
+# es un CRC32 encadenado de todos los comandos, así que dos réplicas que
+# aplicaron lo mismo en el mismo orden coinciden.
+import zlib
+
+class KVStore:
+    def __init__(self):
+        self.data = {}
+        self.applied_count = 0
+        self.state_digest = 0
+
+    # put y delete devuelven el valor anterior; get el actual
+    def apply(self, index, command):
+        self.applied_count += 1
+        self.state_digest = zlib.crc32(repr(command).encode(), self.state_digest)
+        if type(command) is not tuple or not command:
+            return None
+        operation = command[0]
+        if operation == 'put':
+            previous = self.data.get(command[1])
+            self.data[command[1]] = command[2]
+            return previous
+        if operation == 'delete':
+            return self.data.pop(command[1], None)
+        if operation == 'get':
+            return self.data.get(command[1])
+        return None
+
+    # ('get', key) lee una clave; sin consulta se devuelve un resumen
+    def query(self, query):
+        if query is None:
+            return {'applied_count': self.applied_count, 'state_digest': self.state_digest, 'keys': len(self.data)}
+        if query[0] == 'get':
+            return self.data.get(query[1])
+        raise ValueError(f'Unknown query {query!r}')
+
+    def snapshot(self):
+        return {'data': dict(self.data), 'applied_count': self.applied_count, 'state_digest': self.state_digest}
+
+    def restore(self, state):
+        self.data = dict(state['data'])
+        self.applied_count = state['applied_count']
+        self.state_digest = state['state_digest']
+
+    def digest(self):
+        return self.state_digest
@@ -0,0 +1,64 @@
+# Detección de terminación de Dijkstra-Scholten con contadores de déficit,
+# compartida por los nodos de Ejercicio3 y Ejercicio3_Modificado.
+#
+# Cada nodo cuenta los mensajes básicos que envió y que aún no le han
+# confirmado (su déficit). El primer mensaje que recibe un nodo desenganchado
+# lo engancha al árbol de la computación: el emisor pasa a ser su padre y esa
+# confirmación se retiene hasta que el nodo queda pasivo con déficit cero. El
+# resto de confirmaciones se acumulan por emisor y se envían juntas en un solo
+# ack con contador, de modo que el coste es O(mensajes básicos) y no hace falta
+# difundir nada a todos los nodos. La raíz detecta la terminación cuando su
+# déficit vuelve a cero.
+#
+# El detector no envía mensajes: el nodo llama a on_send antes de enviar
+# (reservando el déficit para que un ack temprano no lo deje en cero) y envía
+# los acks que devuelve on_passive.
+from collections import defaultdict
+
+class TerminationDetector:
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.deficit = 0
+        self.parent = None
+        self.engaged = False
+        self.is_root = False
+        self.terminated = False
+        self.pending_acks = defaultdict(int)
+        self.basic_received = 0
+        self.ack_messages = 0
+
+    # La raíz inicia la computación difusa
+    def start(self):
+        self.is_root = True
+        self.engaged = True
+        self.terminated = False
+
+    def on_send(self, count=1):
+        self.deficit += count
+
+    def on_receive(self, sender_id):
+        self.basic_received += 1
+        if not self.engaged:
+            self.engaged = True
+            self.parent = sender_id
+        else:
+            self.pending_acks[sender_id] += 1
+
+    def on_ack(self, count=1):
+        self.deficit -= count
+
+    # Se llama cuando el nodo queda pasivo; devuelve los acks a enviar como
+    # pares (destino, contador)
+    def on_passive(self):
+        acks = self.pending_acks
+        self.pending_acks = defaultdict(int)
+        if self.engaged and self.deficit == 0:
+            if self.is_root:
+                self.terminated = True
+                self.is_root = False
+            else:
+                acks[self.parent] += 1
+                self.parent = None
+            self.engaged = False
+        self.ack_messages += len(acks)
+        return list(acks.items())
@@ -0,0 +1,15 @@
+# Los módulos del examen están en la raíz del repositorio, sin paquete
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Las demos registran cada mensaje en INFO; en las pruebas sólo estorba
+@pytest.fixture(autouse=True)
+def quiet():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
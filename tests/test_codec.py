@@ -0,0 +1,41 @@
+import pytest
+
+import codec
+from codec import AppendEntries, ClockSync, Data, InstallSnapshot, Request, Task, Vote, decode, decode_from, encode
+
+VALUES = [None, True, False, 0, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 80, -2 ** 70, 1.5, '', 'ñandú', b'', b'\x00\xff',
+          [], (), {}, [1, (2, 'tres'), {'k': [None, b'x']}], {1: 'a', 'b': (1.25, False)}]
+
+@pytest.mark.parametrize('value', VALUES)
+def test_value_round_trip(value):
+    decoded = codec.decode_value(codec.encode_value(value))
+    assert decoded == value
+    assert type(decoded) is type(value)
+
+@pytest.mark.parametrize('message', [
+    Request(3, 2 ** 64 - 1, 17, 'resource'),
+    ClockSync(0, 5, 9),
+    Task(1, 2, -3, 4, {'work': [1, 2]}),
+    Vote(7, True),
+    AppendEntries(4, 10, 3, 9, 12, [(3, ('put', 'k', 1)), (4, None)]),
+    InstallSnapshot(5, 100, 4, 1, {'k': 'v'}),
+    Data(2, b'payload'),
+])
+def test_message_round_trip(message):
+    assert decode(encode(message)) == message
+
+# Varias tramas seguidas se recorren por desplazamientos sin copiar el buffer
+def test_decode_concatenated_frames():
+    messages = [Vote(1, False), Request(1, 2, 3, None), Data(0, [1, 2, 3])]
+    view = memoryview(b''.join(encode(message) for message in messages))
+    offset, decoded = 0, []
+    while offset < len(view):
+        message, offset = decode_from(view, offset)
+        decoded.append(message)
+    assert decoded == messages
+
+def test_duplicate_tag_is_rejected():
+    with pytest.raises(ValueError):
+        @codec.message_type(Vote.tag, ('term', 'q'))
+        class Clash(codec.WireMessage):
+            __slots__ = ('term',)
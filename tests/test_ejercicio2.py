@@ -0,0 +1,30 @@
+import time
+
+from Ejercicio2 import Network
+from link_model import LinkModel
+
+def settle(network):
+    time.sleep(0.4)
+    network.delay_line.close()
+
+# Un mensaje enviado antes de que su remitente reciba el marcador y entregado
+# después de que el destino registre su estado queda en el estado del canal
+def test_in_flight_message_is_recorded():
+    network = Network(3, link=LinkModel(0.05))
+    robots = network.robots
+    robots[0].initiate_snapshot()
+    robots[1].send_message(0, 'in flight')
+    settle(network)
+    assert robots[0].channel_states == {1: ['in flight'], 2: []}
+    assert all(robot.in_snapshot and not robot.recording for robot in robots)
+
+# El marcador no adelanta a un mensaje enviado antes por el mismo canal: ese
+# mensaje ya forma parte del estado del destino, no del canal
+def test_marker_does_not_overtake_earlier_message():
+    network = Network(3, link=LinkModel(0.05))
+    robots = network.robots
+    robots[1].send_message(0, 'before marker')
+    robots[1].initiate_snapshot()
+    settle(network)
+    assert robots[0].channel_states == {1: [], 2: []}
+    assert all(robot.in_snapshot and not robot.recording for robot in robots)
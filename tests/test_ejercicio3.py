@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from codec import ClockSync, encode
+from Ejercicio3 import Network
+
+def test_diffusion_terminates():
+    async def scenario():
+        network = Network(50, task_duration=(0, 0))
+        await network.start()
+        try:
+            await asyncio.wait_for(network.nodes[0].start_diffusion('work', 500, 4), 10)
+        finally:
+            await network.stop()
+    asyncio.run(scenario())
+
+# Si el último mensaje antes de quedar pasivo no es Task ni Ack (aquí un
+# ClockSync), el nodo tiene que devolver igualmente los acks pendientes
+def test_pending_acks_flushed_after_other_messages():
+    async def scenario():
+        network = Network(2, task_duration=(0.05, 0.05))
+        await network.start()
+        root, other = network.nodes[0], network.nodes[1]
+        network.random_node = lambda: other
+
+        async def clock_sync():
+            await asyncio.sleep(0.02)
+            await root.send_message(other, ClockSync, root.clock.now())
+        sync = asyncio.ensure_future(clock_sync())
+        try:
+            await asyncio.wait_for(root.start_diffusion('work', 1, 1), 2)
+        finally:
+            await sync
+            await network.stop()
+    asyncio.run(scenario())
+
+# Con el buzón lleno los mensajes en vuelo esperan en orden en la cola de
+# desbordamiento del nodo, sin una tarea por mensaje
+def test_full_mailbox_keeps_arrival_order():
+    async def scenario():
+        network = Network(2, task_duration=(0, 0), latency=(0.001, 0.002), mailbox_size=2)
+        node = network.nodes[1]
+        received = []
+
+        async def receive_message(message):
+            received.append(message.clock)
+        node.receive_message = receive_message
+        for i in range(100):
+            network.arrive(node, encode(ClockSync(0, 0, i)))
+        backlog = (node.mailbox.qsize(), len(node.overflow), len(node.background_tasks))
+        node.start()
+        while len(received) < 100:
+            await asyncio.sleep(0.01)
+        await network.stop()
+        return backlog, received
+    backlog, received = asyncio.run(scenario())
+    assert backlog == (2, 98, 0)
+    assert received == list(range(100))
+
+def test_bounded_mailboxes_with_latency():
+    async def scenario():
+        network = Network(30, task_duration=(0, 0), latency=(0.001, 0.003), mailbox_size=4)
+        await asyncio.wait_for(network.simulate(10), 20)
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import threading
+
+import hlc
+from codec import Task, Terminate
+from hlc import HybridLogicalClock, pack, unpack
+
+def test_pack_round_trip():
+    assert unpack(pack(123456, 7)) == (123456, 7)
+    assert pack(1, 0) > pack(0, hlc.LOGICAL_MASK)
+
+def test_now_is_strictly_increasing():
+    clock = HybridLogicalClock()
+    stamps = [clock.now() for _ in range(10000)]
+    assert all(a < b for a, b in zip(stamps, stamps[1:]))
+
+# Una marca recibida del futuro arrastra al reloj local, que sigue creciendo
+# a partir de ella aunque el tiempo físico vaya por detrás
+def test_update_merges_later_timestamp():
+    clock = HybridLogicalClock()
+    remote = hlc.physical_time() + pack(60_000)
+    merged = clock.update(remote)
+    assert merged > remote
+    assert unpack(merged)[0] == unpack(remote)[0]
+    assert clock.now() > merged
+
+def test_update_never_goes_back():
+    clock = HybridLogicalClock()
+    before = clock.now()
+    assert clock.update(0) > before
+
+def test_concurrent_now_is_unique():
+    clock = HybridLogicalClock()
+    stamps = []
+
+    def worker():
+        stamps.extend(clock.now() for _ in range(5000))
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(stamps)) == len(stamps)
+
+# Cualquier mensaje recibido (aquí una Task) fusiona el reloj del remitente
+def test_threaded_nodes_merge_every_message():
+    from Ejercicio3_Modificado import Network
+    network = Network(2)
+    remote = hlc.physical_time() + pack(60_000)
+    network.send_message(1, Task(0, remote, 1, 1, None))
+    network.send_message(1, Terminate(-1, 0))
+    network.run_node(network.nodes[1])
+    assert network.nodes[1].clock.last > remote
+
+def test_async_nodes_merge_every_message():
+    import asyncio
+    from Ejercicio3 import Network
+
+    async def scenario():
+        network = Network(2, task_duration=(0, 0))
+        node = network.nodes[1]
+        remote = hlc.physical_time() + pack(60_000)
+        await node.receive_message(Task(0, remote, 1, 1, None))
+        return node.clock.last > remote
+    assert asyncio.run(scenario())
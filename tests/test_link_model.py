@@ -0,0 +1,61 @@
+import random
+import sys
+import threading
+
+from link_model import LinkModel, Trace
+
+def test_fifo_per_link():
+    link = LinkModel((0.0, 0.1), rng=random.Random(1))
+    arrivals = [delay + now for now in range(100) for delay in link.delays(0, 1, 10, now * 0.001)]
+    assert arrivals == sorted(arrivals)
+
+def test_loss_drops_messages():
+    link = LinkModel(0.01, loss=0.3, rng=random.Random(2))
+    delivered = sum(len(link.delays(0, 1, 10, 0.0)) for _ in range(1000))
+    assert delivered + link.dropped == 1000
+    assert 200 < link.dropped < 400
+
+def test_duplicate_delivers_twice():
+    link = LinkModel(0.01, duplicate=1.0)
+    assert len(link.delays(0, 1, 10, 0.0)) == 2
+
+# Con el enlace ocupado cada mensaje espera a que se serialice el anterior
+def test_bandwidth_serializes_messages():
+    link = LinkModel(0.0, bandwidth=1000)
+    delays = [link.delays(0, 1, 100, 0.0)[0] for _ in range(5)]
+    assert [round(delay, 3) for delay in delays] == [0.1, 0.2, 0.3, 0.4, 0.5]
+    # Otro enlace no comparte la cola
+    assert round(link.delays(1, 0, 100, 0.0)[0], 3) == 0.1
+
+def test_trace_and_per_link_models():
+    link = LinkModel(0.5, links={(0, 1): LinkModel(Trace([0.1, 0.2]))})
+    assert [round(link.delays(0, 1, 1, 0.0)[0], 3) for _ in range(3)] == [0.1, 0.2, 0.2]
+    assert link.delays(1, 0, 1, 0.0) == [0.5]
+
+def test_forget_clears_link_state():
+    link = LinkModel(0.0, bandwidth=1000)
+    link.delays(0, 1, 100, 0.0)
+    link.forget(1)
+    assert round(link.delays(0, 1, 100, 0.0)[0], 3) == 0.1
+
+# Varios hilos enviando por el mismo enlace no pueden compartir un hueco del
+# ancho de banda: la serialización total sigue siendo la suma de todos
+def test_concurrent_senders_share_bandwidth():
+    link = LinkModel(0.0, bandwidth=1e6)
+    results = []
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def sender():
+        delays = [link.delays(0, 1, 10, 0.0)[0] for _ in range(2000)]
+        results.extend(delays)
+    threads = [threading.Thread(target=sender) for _ in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert len({round(delay * 1e6) for delay in results}) == len(results)
+    assert round(max(results), 6) == round(8000 * 10 / 1e6, 6)
@@ -0,0 +1,48 @@
+import random
+
+from Ejercicio4 import NetworkPartition
+
+# Definición directa: dos nodos se comunican si ninguna partición activa los separa
+def reference(partitions, a, b):
+    return any((a in members) != (b in members) for members in partitions.values())
+
+def test_overlapping_partitions_and_heal():
+    network = NetworkPartition()
+    first = network.add_partition([0, 1, 2])
+    second = network.add_partition([1, 2, 3])
+    assert not network.is_partitioned(1, 2)
+    assert network.is_partitioned(0, 1)
+    assert network.is_partitioned(2, 3)
+    assert network.is_partitioned(0, 3)
+    assert network.is_partitioned(3, 4)
+    network.heal_partition(first)
+    assert not network.is_partitioned(1, 3)
+    assert not network.is_partitioned(0, 4)
+    assert network.is_partitioned(0, 1)
+    network.heal_partition(second)
+    assert not network.is_partitioned(0, 3)
+    assert network.masks == {}
+
+def test_accepts_node_objects_and_reuses_bits():
+    class Node:
+        def __init__(self, id):
+            self.id = id
+    network = NetworkPartition()
+    for _ in range(100):
+        network.heal_partition(network.add_partition([Node(0), 1]))
+    partition = network.add_partition([Node(0)])
+    assert network.is_partitioned(0, 1)
+    assert network.bits[partition] == 1
+
+def test_matches_reference_under_random_changes():
+    rng = random.Random(5)
+    network = NetworkPartition()
+    nodes = range(12)
+    for _ in range(300):
+        if network.partitions and rng.random() < 0.4:
+            network.heal_partition(rng.choice(list(network.partitions)))
+        else:
+            network.add_partition(rng.sample(nodes, rng.randint(1, 6)))
+        for a in nodes:
+            for b in nodes:
+                assert network.is_partitioned(a, b) == reference(network.partitions, a, b)
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from Ejercicio4 import NetworkPartition, check_safety, create_cluster, wait_for_leader
+
+# Arranca un clúster, espera a que haya líder y lo para al terminar
+async def with_cluster(size, scenario, **options):
+    cluster = create_cluster(size, NetworkPartition(), **{'latency': (0.001, 0.002), 'tick_interval': 0.01, **options})
+    for node in cluster:
+        node.start()
+    try:
+        await cluster[0].start_election()
+        return await scenario(cluster, await wait_for_leader(cluster))
+    finally:
+        for node in cluster:
+            await node.stop()
+
+def test_check_safety_detects_divergent_logs():
+    cluster = create_cluster(2, NetworkPartition())
+    for node, term in zip(cluster, (1, 2)):
+        node.log.append([(term, 'x')])
+        node.commit_index = 1
+    assert check_safety(cluster) == [(0, 1, 1, 1, 2)]
+
+def test_replicates_to_every_node():
+    async def scenario(cluster, leader):
+        indexes = await asyncio.gather(*(leader.append_entries([f'c{i}']) for i in range(50)))
+        await asyncio.sleep(0.2)
+        return indexes, cluster
+    indexes, cluster = asyncio.run(with_cluster(3, scenario))
+    assert sorted(indexes) == list(range(min(indexes), min(indexes) + 50))
+    assert check_safety(cluster) == []
+    assert len({node.commit_index for node in cluster}) == 1
+
+# Un lote vacío no puede sustituir al futuro de quien ya espera confirmación
+def test_empty_proposal_is_rejected():
+    async def scenario(cluster, leader):
+        first = asyncio.ensure_future(leader.append_entries(['x']))
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(leader.append_entries([]), 5)
+        return await asyncio.wait_for(first, 5)
+    assert asyncio.run(with_cluster(3, scenario)) is not None
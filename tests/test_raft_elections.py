@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import virtual_time
+from Ejercicio4 import NetworkPartition, Role, check_safety, create_cluster, measure_failover, wait_for_leader
+
+# Un seguidor aislado un buen rato y luego reconectado: con PreVote no infla
+# su término ni derriba al líder; sin PreVote obliga a una elección nueva
+def isolate_and_return(pre_vote):
+    async def main():
+        network = NetworkPartition()
+        cluster = create_cluster(5, network, latency=(0.001, 0.002), pre_vote=pre_vote)
+        for node in cluster:
+            node.start()
+        try:
+            await cluster[0].start_election()
+            leader = await wait_for_leader(cluster)
+            term = leader.term
+            isolated = next(node for node in cluster if node is not leader)
+            partition = network.add_partition([isolated])
+            await asyncio.sleep(20)
+            isolated_term = isolated.term
+            network.heal_partition(partition)
+            await asyncio.sleep(5)
+            return term, isolated_term, leader.role, max(node.term for node in cluster), check_safety(cluster)
+        finally:
+            for node in cluster:
+                await node.stop()
+    return virtual_time.run(main(), seed=4)
+
+def test_pre_vote_keeps_isolated_node_from_disrupting_leader():
+    term, isolated_term, role, final_term, violations = isolate_and_return(pre_vote=True)
+    assert isolated_term == term
+    assert role == Role.LEADER
+    assert final_term == term
+    assert violations == []
+
+def test_without_pre_vote_isolated_node_inflates_term():
+    term, isolated_term, role, final_term, violations = isolate_and_return(pre_vote=False)
+    assert isolated_term > term
+    assert final_term > term
+    assert violations == []
+
+# Tras tirar al líder otro nodo lo sustituye: la ventana típica cabe en el
+# plazo de elección más largo (2 * election_ticks) y ninguna se eterniza
+@pytest.mark.parametrize('pre_vote', [False, True])
+def test_failover_elects_new_leader(pre_vote):
+    result = virtual_time.run(measure_failover(5, crashes=9, stable=3.0, pre_vote=pre_vote), seed=6)
+    windows = sorted(result['windows'])
+    assert len(windows) == 9
+    assert windows[4] < 2 * 20 * 0.1
+    assert windows[-1] < 15
+    assert result['violations'] == []
+
+# Los plazos aleatorios separan a los candidatos: casi nunca hace falta más
+# de una elección por caída
+def test_randomized_timeouts_avoid_split_votes():
+    result = virtual_time.run(measure_failover(5, crashes=10, stable=3.0), seed=8)
+    assert result['terms'] <= 2 * 10 + 2
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+import virtual_time
+from Ejercicio4 import NetworkPartition, NotLeaderError, Role, create_cluster, wait_for_leader
+
+def run_cluster(scenario, seed=1, **options):
+    async def main():
+        network = NetworkPartition()
+        cluster = create_cluster(3, network, latency=(0.001, 0.002), **options)
+        for node in cluster:
+            node.start()
+        try:
+            await cluster[0].start_election()
+            return await scenario(network, cluster, await wait_for_leader(cluster))
+        finally:
+            for node in cluster:
+                await node.stop()
+    return virtual_time.run(main(), seed=seed)
+
+def test_read_index_sees_committed_writes():
+    async def scenario(network, cluster, leader):
+        await leader.put('k', 1)
+        values = await asyncio.gather(*(leader.get('k') for _ in range(20)))
+        await leader.put('k', 2)
+        return values, await leader.get('k')
+    values, last = run_cluster(scenario)
+    assert values == [1] * 20
+    assert last == 2
+
+# Las lecturas concurrentes comparten rondas de latidos en lugar de una por lectura
+def test_concurrent_reads_share_rounds():
+    async def scenario(network, cluster, leader):
+        await leader.put('k', 1)
+        before = leader.read_seq
+        await asyncio.gather(*(leader.get('k') for _ in range(100)))
+        return leader.read_seq - before
+    assert run_cluster(scenario) <= 3
+
+# Con el arrendamiento vigente la lectura no espera a ninguna ronda
+def test_lease_read_skips_round():
+    async def scenario(network, cluster, leader):
+        await leader.put('k', 1)
+        await leader.get('k')
+        assert leader.in_lease()
+        before = leader.read_seq
+        value = await leader.get('k', lease=True)
+        return value, leader.read_seq - before
+    assert run_cluster(scenario) == (1, 0)
+
+# Un líder aislado sigue creyéndose líder, pero ni ReadIndex ni el
+# arrendamiento caducado le dejan servir el valor viejo
+@pytest.mark.parametrize('lease', [False, True])
+def test_isolated_stale_leader_blocks_reads(lease):
+    async def scenario(network, cluster, leader):
+        await leader.put('k', 'old')
+        network.add_partition([leader])
+        rest = [node for node in cluster if node is not leader]
+        new_leader = await wait_for_leader(rest)
+        await new_leader.put('k', 'new')
+        assert leader.role == Role.LEADER and not leader.in_lease()
+        with pytest.raises((asyncio.TimeoutError, NotLeaderError)):
+            await asyncio.wait_for(leader.get('k', lease=lease), 5)
+        return await new_leader.get('k', lease=lease)
+    assert run_cluster(scenario) == 'new'
@@ -0,0 +1,57 @@
+import asyncio
+
+import virtual_time
+from Ejercicio4 import NetworkPartition, check_safety, create_cluster, wait_for_leader
+
+async def catch_up_after_partition(**options):
+    network = NetworkPartition()
+    cluster = create_cluster(3, network, latency=(0.001, 0.002), snapshot_threshold=20, segment_size=8, **options)
+    for node in cluster:
+        node.start()
+    try:
+        await cluster[0].start_election()
+        leader = await wait_for_leader(cluster)
+        lagging = next(node for node in cluster if node is not leader)
+        installed = []
+        install = lagging.handle_install_snapshot
+
+        def record_install(sender, term, index, *args):
+            installed.append(index)
+            install(sender, term, index, *args)
+        lagging.handle_install_snapshot = record_install
+        partition = network.add_partition([lagging])
+        for i in range(100):
+            await leader.put(f'k{i % 10}', i)
+        compacted = (leader.log.snapshot_index, len(leader.log), len(leader.log.segments))
+        network.heal_partition(partition)
+        await leader.put('last', 'value')
+        await asyncio.sleep(2)
+        return cluster, leader, lagging, compacted, installed
+    finally:
+        for node in cluster:
+            await node.stop()
+
+# El líder compacta su log y el seguidor que se quedó atrás se pone al día
+# con InstallSnapshot más la cola, no con toda la historia
+def test_lagging_follower_catches_up_from_snapshot():
+    cluster, leader, lagging, compacted, installed = virtual_time.run(catch_up_after_partition(), seed=2)
+    snapshot_index, retained, segments = compacted
+    assert snapshot_index >= 80
+    assert retained < 20 + 8
+    assert segments <= 4
+    assert installed and installed[0] >= 80
+    assert lagging.last_applied == leader.last_applied == leader.commit_index
+    assert len({node.state_machine.digest() for node in cluster}) == 1
+    assert lagging.state_machine.query(('get', 'k9')) == 99
+    assert check_safety(cluster) == []
+
+def test_catch_up_with_durable_storage(tmp_path):
+    cluster, leader, lagging, _, installed = virtual_time.run(catch_up_after_partition(storage_dir=str(tmp_path)), seed=3)
+    assert installed
+    assert len({node.state_machine.digest() for node in cluster}) == 1
+    # Lo instalado sobrevive a un corte: el seguidor vuelve con la instantánea
+    lagging.storage.crash()
+    lagging.load_from_storage()
+    assert lagging.snapshot is not None and lagging.last_applied >= lagging.snapshot[0] > 0
+    for node in cluster:
+        node.storage.close()
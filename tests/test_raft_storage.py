@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from raft_log import SegmentedLog
+from raft_storage import MmapStorage
+
+def entries(start, count, term):
+    return [(term, ('put', f'k{index}', index)) for index in range(start, start + count)]
+
+def reload(directory):
+    storage = MmapStorage(directory)
+    log = SegmentedLog()
+    return storage, log, storage.load(log)
+
+# Lo sincronizado sobrevive al corte; lo escrito después se pierde entero
+def test_crash_keeps_only_synced_records(tmp_path):
+    async def scenario():
+        storage = MmapStorage(str(tmp_path))
+        storage.save_state(2, 1)
+        storage.append(1, entries(1, 10, 2))
+        await storage.sync()
+        storage.save_state(3, 4)
+        storage.append(11, entries(11, 5, 3))
+        storage.crash()
+    asyncio.run(scenario())
+    storage, log, (term, voted_for, snapshot) = reload(str(tmp_path))
+    assert (term, voted_for, snapshot) == (2, 1, None)
+    assert log.last_index() == 10
+    assert log.entries_from(1, 100) == entries(1, 10, 2)
+    storage.close()
+
+def test_truncate_is_replayed(tmp_path):
+    async def scenario():
+        storage = MmapStorage(str(tmp_path))
+        storage.append(1, entries(1, 8, 1))
+        storage.truncate_from(5)
+        storage.append(5, entries(5, 2, 2))
+        await storage.sync()
+        storage.close()
+    asyncio.run(scenario())
+    storage, log, _ = reload(str(tmp_path))
+    assert log.entries_from(1, 100) == entries(1, 4, 1) + entries(5, 2, 2)
+    storage.close()
+
+# Con segmentos pequeños la instantánea permite borrar los ya cubiertos y la
+# recuperación parte de ella
+def test_snapshot_round_trip(tmp_path):
+    async def scenario():
+        storage = MmapStorage(str(tmp_path), segment_bytes=1024)
+        for start in range(1, 201, 20):
+            storage.append(start, entries(start, 20, 1))
+        await storage.sync()
+        segments = len(storage.segments)
+        storage.save_snapshot(150, 1, {'state': 150})
+        await storage.sync()
+        assert len(storage.segments) < segments
+        storage.crash()
+    asyncio.run(scenario())
+    storage, log, (_, _, snapshot) = reload(str(tmp_path))
+    assert snapshot == (150, 1, {'state': 150})
+    assert log.snapshot_index == 150
+    assert log.last_index() == 200
+    assert log.entries_from(151, 100) == entries(151, 50, 1)
+    storage.close()
+
+# Una instantánea instalada sobre un log que no la contiene llega a disco
+# antes que las entradas que la siguen, aunque el corte llegue justo después
+def test_installed_snapshot_precedes_following_entries(tmp_path):
+    storage = MmapStorage(str(tmp_path))
+    storage.append(1, entries(1, 5, 1))
+    storage.flush()
+    storage.install_snapshot(100, 3, {'state': 100})
+    storage.append(101, entries(101, 2, 3))
+    storage.flush()
+    storage.crash()
+    storage, log, (_, _, snapshot) = reload(str(tmp_path))
+    assert snapshot == (100, 3, {'state': 100})
+    assert log.entries_from(101, 10) == entries(101, 2, 3)
+    assert log.last_index() == 102
+    storage.close()
+
+def test_gap_in_wal_is_rejected(tmp_path):
+    storage = MmapStorage(str(tmp_path))
+    storage.append(1, entries(1, 5, 1))
+    storage.append(10, entries(10, 2, 1))
+    storage.flush()
+    storage.close()
+    with pytest.raises(ValueError):
+        reload(str(tmp_path))
@@ -0,0 +1,71 @@
+import asyncio
+
+import virtual_time
+from Ejercicio4 import NetworkPartition, create_cluster, wait_for_leader
+from state_machine import KVStore
+
+def test_kv_commands_return_previous_values():
+    store = KVStore()
+    assert store.apply(1, ('put', 'a', 1)) is None
+    assert store.apply(2, ('put', 'a', 2)) == 1
+    assert store.apply(3, ('get', 'a')) == 2
+    assert store.apply(4, ('delete', 'a')) == 2
+    assert store.apply(5, 'texto libre') is None
+    assert store.query(('get', 'a')) is None
+    assert store.query(None)['applied_count'] == 5
+
+def test_snapshot_restore_and_digest():
+    store = KVStore()
+    for index in range(1, 50):
+        store.apply(index, ('put', index % 7, index))
+    copy = KVStore()
+    copy.restore(store.snapshot())
+    assert copy.digest() == store.digest()
+    assert copy.query(('get', 3)) == store.query(('get', 3))
+    store.apply(50, ('put', 'x', 1))
+    assert copy.digest() != store.digest()
+
+def run_cluster(scenario, seed=1, **options):
+    async def main():
+        cluster = create_cluster(3, NetworkPartition(), latency=(0.001, 0.002), **options)
+        for node in cluster:
+            node.start()
+        try:
+            await cluster[0].start_election()
+            return await scenario(cluster, await wait_for_leader(cluster))
+        finally:
+            for node in cluster:
+                await node.stop()
+    return virtual_time.run(main(), seed=seed)
+
+# Confirmar no espera a aplicar: con muchos clientes a la vez commit_index
+# adelanta a last_applied en más de un lote, y aun así cada execute recibe
+# el resultado de su propia entrada, en orden
+def test_apply_pipeline_lags_commit_and_catches_up():
+    async def scenario(cluster, leader):
+        results = await asyncio.gather(*(leader.put('k', i) for i in range(500)))
+        await asyncio.sleep(1)
+        return results, leader.max_apply_lag, [node.apply_lag() for node in cluster], cluster
+    results, max_lag, lags, cluster = run_cluster(scenario, apply_batch=16)
+    assert results == [None, *range(499)]
+    assert max_lag > 16
+    assert lags == [0, 0, 0]
+    assert len({node.state_machine.digest() for node in cluster}) == 1
+    assert {node.state_machine.query(('get', 'k')) for node in cluster} == {499}
+
+# Cada iteración del bucle aplica como mucho apply_batch entradas
+def test_apply_batch_bounds_each_step():
+    async def scenario(cluster, leader):
+        steps = []
+        apply_entries = leader.apply_entries
+
+        def record_step():
+            before = leader.last_applied
+            apply_entries()
+            steps.append(leader.last_applied - before)
+        leader.apply_entries = record_step
+        await asyncio.gather(*(leader.put(i, i) for i in range(200)))
+        return steps, leader.last_applied
+    steps, last_applied = run_cluster(scenario, apply_batch=16)
+    assert max(steps) == 16
+    assert sum(steps) == last_applied - 1
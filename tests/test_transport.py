@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import transport
+from transport import SocketTransport, local_address
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(transport, 'CONNECT_BACKOFF', 0.01)
+
+def receiver(address, received):
+    async def handler(sender_id, recipient_id, data):
+        received.append((sender_id, recipient_id, bytes(data)))
+    server = SocketTransport(address, {})
+    return server, handler
+
+@pytest.mark.parametrize('kind', ['uds', 'tcp'])
+def test_round_trip_keeps_link_order(kind, tmp_path):
+    async def scenario():
+        received = []
+        address = local_address(kind, 'peer', str(tmp_path))
+        server, handler = receiver(address, received)
+        await server.start(handler)
+        client = SocketTransport(local_address(kind, 'client', str(tmp_path)), {1: address})
+        for i in range(1000):
+            client.send(0, 1, b'm%d' % i)
+        await client.drain()
+        while len(received) < 1000:
+            await asyncio.sleep(0.01)
+        await client.close()
+        await server.close()
+        return received, client
+    received, client = asyncio.run(scenario())
+    assert received == [(0, 1, b'm%d' % i) for i in range(1000)]
+    assert client.writes < client.frames_sent
+
+def test_tcp_requires_explicit_port():
+    with pytest.raises(ValueError):
+        SocketTransport(('127.0.0.1', 0), {})
+
+# Un destino que tarda en escuchar se alcanza con los reintentos
+def test_connects_to_late_listener(tmp_path):
+    async def scenario():
+        received = []
+        address = local_address('uds', 'late', str(tmp_path))
+        client = SocketTransport(local_address('uds', 'client', str(tmp_path)), {1: address})
+        client.send(0, 1, b'early')
+        await asyncio.sleep(0.05)
+        server, handler = receiver(address, received)
+        await server.start(handler)
+        await client.drain()
+        while not received:
+            await asyncio.sleep(0.01)
+        await client.close()
+        await server.close()
+        return received
+    assert asyncio.run(scenario()) == [(0, 1, b'early')]
+
+# Agotados los reintentos las tramas perdidas llegan al emisor como error, y
+# el siguiente envío abre otra conexión
+def test_failed_connection_is_reported_and_replaced(tmp_path):
+    async def scenario():
+        received = []
+        address = local_address('uds', 'absent', str(tmp_path))
+        client = SocketTransport(local_address('uds', 'client', str(tmp_path)), {1: address})
+        client.send(0, 1, b'lost')
+        while client.connections:
+            await asyncio.sleep(0.01)
+        with pytest.raises(ConnectionError):
+            await client.drain()
+        server, handler = receiver(address, received)
+        await server.start(handler)
+        client.send(0, 1, b'after')
+        await client.drain()
+        while not received:
+            await asyncio.sleep(0.01)
+        await client.close()
+        await server.close()
+        return received, client.frames_dropped
+    assert asyncio.run(scenario()) == ([(0, 1, b'after')], 1)
+
+# Pasado max_buffer no se descarta nada: drain() retiene al emisor hasta que
+# la conexión vacía el buffer
+def test_full_buffer_applies_backpressure(tmp_path):
+    async def scenario():
+        received = []
+        address = local_address('uds', 'slow', str(tmp_path))
+        client = SocketTransport(local_address('uds', 'client', str(tmp_path)), {1: address}, max_buffer=1000)
+        for i in range(50):
+            client.send(0, 1, bytes(100))
+        assert client.congested
+        waiter = asyncio.ensure_future(client.drain())
+        await asyncio.sleep(0.03)
+        assert not waiter.done()
+        server, handler = receiver(address, received)
+        await server.start(handler)
+        await asyncio.wait_for(waiter, 5)
+        while len(received) < 50:
+            await asyncio.sleep(0.01)
+        await client.close()
+        await server.close()
+        return len(received), client.frames_dropped
+    assert asyncio.run(scenario()) == (50, 0)
@@ -0,0 +1,21 @@
+import pytest
+
+import virtual_time
+from Ejercicio4 import simulate_schedule
+
+@pytest.mark.parametrize('seed', range(5))
+def test_failure_schedule_is_safe(seed):
+    result = virtual_time.run(simulate_schedule(600.0, 5), seed=seed)
+    assert result['violations'] == []
+    assert result['committed'] > 0
+
+def test_same_seed_same_schedule():
+    assert virtual_time.run(simulate_schedule(300.0, 3), seed=3) == virtual_time.run(simulate_schedule(300.0, 3), seed=3)
+
+# Con almacenamiento en disco los fsync corren en el executor: el reloj
+# virtual no puede avanzar mientras tanto o la semilla deja de fijar el resultado
+def test_schedule_with_storage_is_reproducible(tmp_path):
+    results = [virtual_time.run(simulate_schedule(300.0, 3, storage_dir=str(tmp_path / str(attempt))), seed=7)
+               for attempt in range(2)]
+    assert results[0] == results[1]
+    assert results[0]['violations'] == []
@@ -0,0 +1,273 @@
+# Transportes reales para las redes simuladas.
+#
+# Por defecto cada Network entrega los mensajes dentro del mismo intérprete.
+# Con un transporte, los mensajes (ya codificados con codec.py) viajan por la
+# pila de red del sistema y los nodos pueden vivir en procesos distintos.
+# Interfaz común:
+#   await transport.start(handler)   handler(sender_id, recipient_id, data) es
+#                                    una corrutina que entrega el mensaje
+#   transport.send(sender_id, recipient_id, data)   no bloquea
+#   await transport.drain()          espera mientras haya conexiones saturadas
+#   await transport.close()
+#
+# SocketTransport escucha en un socket Unix (dirección str) o TCP (tupla
+# (host, port)). `endpoints` asigna a cada identificador de nodo la dirección
+# del transporte que lo aloja; varios nodos pueden compartir dirección. Las
+# direcciones TCP llevan siempre un puerto explícito: los procesos vecinos
+# reciben `endpoints` antes de que nadie escuche y no podrían conocer un
+# puerto elegido al arrancar. local_address('tcp', ...) reserva uno libre.
+# - Conexiones reutilizadas: una conexión saliente por dirección destino,
+#   abierta en el primer envío y compartida por todos los mensajes, lo que
+#   mantiene el orden FIFO por enlace. Si el destino aún no escucha se
+#   reintenta con espera exponencial; agotados los intentos la conexión se
+#   descarta con lo que tuviera en el buffer (queda en el log y en
+#   frames_dropped), el siguiente drain() lanza ConnectionError y el
+#   siguiente envío abre otra conexión.
+# - Escrituras agrupadas: los envíos se acumulan en un buffer por conexión y
+#   una tarea escritora los vuelca con un único write; mientras espera a
+#   drain() se siguen acumulando.
+# - Control de flujo: ninguna trama se descarta por falta de sitio. Cuando el
+#   buffer de una conexión pasa de `max_buffer` bytes el transporte queda
+#   saturado y drain() no vuelve hasta que la tarea escritora se lo lleva.
+#   Los emisores que necesitan canales fiables (Ejercicio3) esperan a drain()
+#   tras cada envío; Raft no lo hace porque ya limita lo que tiene en vuelo.
+# - Tramas con longitud: longitud (u32), remitente y destino (i64) y el mensaje.
+#   El lector corta las tramas de cada bloque leído con memoryview sin copiar.
+# - Con `link` (LinkModel de link_model.py) cada trama se entrega a su
+#   conexión cuando el modelo lo indica (o nunca, si se pierde), por encima de
+#   lo que añada la pila de red real.
+#
+# TransportThread ejecuta un transporte en un hilo con su propio bucle para las
+# redes basadas en hilos (Ejercicio2, Ejercicio3_Modificado).
+import asyncio
+import logging
+import os
+import socket
+import struct
+import tempfile
+import threading
+
+FRAME_HEADER = struct.Struct('<Iqq')
+READ_SIZE = 256 * 1024
+CONNECT_ATTEMPTS = 6
+CONNECT_BACKOFF = 0.05  # Segundos antes del primer reintento; se dobla en cada uno
+
+logger = logging.getLogger(__name__)
+
+class Connection:
+    def __init__(self, transport, address):
+        self.transport = transport
+        self.address = address
+        self.buffer = bytearray()
+        self.buffered = 0  # Tramas en `buffer`
+        self.ready = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def write(self, frame):
+        self.buffer += frame
+        self.buffered += 1
+        self.ready.set()
+        if len(self.buffer) > self.transport.max_buffer:
+            self.transport.pause(self)
+
+    async def connect(self):
+        delay = CONNECT_BACKOFF
+        for attempt in range(CONNECT_ATTEMPTS):
+            try:
+                if isinstance(self.address, str):
+                    return (await asyncio.open_unix_connection(self.address))[1]
+                return (await asyncio.open_connection(*self.address))[1]
+            except OSError:
+                if attempt == CONNECT_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def run(self):
+        try:
+            writer = await self.connect()
+        except OSError as error:
+            self.transport.connection_failed(self, error)
+            return
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                data, self.buffer, self.buffered = self.buffer, bytearray(), 0
+                self.transport.resume(self)
+                writer.write(data)
+                self.transport.writes += 1
+                await writer.drain()
+        except ConnectionError as error:
+            self.transport.connection_failed(self, error)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+class SocketTransport:
+    def __init__(self, address, endpoints, link=None, max_buffer=64 * 1024 * 1024):
+        if not isinstance(address, str) and address[1] == 0:
+            raise ValueError('TCP transports need an explicit port; use local_address to reserve one')
+        self.address = address
+        self.endpoints = endpoints
+        self.link = link
+        self.max_buffer = max_buffer
+        self.connections = {}
+        self.readers = {}
+        self.server = None
+        self.handler = None
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+        self.writes = 0
+        self.congested = set()      # Conexiones con el buffer por encima de max_buffer
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.failure = None         # Error de una conexión perdida aún no notificado
+
+    async def start(self, handler):
+        self.handler = handler
+        if isinstance(self.address, str):
+            self.server = await asyncio.start_unix_server(self.accept, self.address)
+        else:
+            self.server = await asyncio.start_server(self.accept, *self.address)
+
+    # Lo que quedaba en el buffer se pierde; el próximo envío abre otra conexión
+    def connection_failed(self, connection, error):
+        lost = connection.buffered
+        self.frames_dropped += lost
+        connection.buffer, connection.buffered = bytearray(), 0
+        self.resume(connection)
+        if self.connections.get(connection.address) is connection:
+            del self.connections[connection.address]
+        self.failure = ConnectionError(f'Connection to {connection.address} failed, {lost} frames lost: {error}')
+        logger.error(self.failure)
+
+    def pause(self, connection):
+        self.congested.add(connection)
+        self.writable.clear()
+
+    def resume(self, connection):
+        self.congested.discard(connection)
+        if not self.congested:
+            self.writable.set()
+
+    async def drain(self):
+        while self.congested:
+            await self.writable.wait()
+        if self.failure is not None:
+            failure, self.failure = self.failure, None
+            raise failure
+
+    def send(self, sender_id, recipient_id, data):
+        frame = FRAME_HEADER.pack(len(data), sender_id, recipient_id) + data
+        if self.link is None:
+            self.write(self.endpoints[recipient_id], frame)
+        else:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            for delay in self.link.delays(sender_id, recipient_id, len(frame), now):
+                loop.call_at(now + delay, self.write, self.endpoints[recipient_id], frame)
+        self.frames_sent += 1
+        self.bytes_sent += len(data)
+
+    # La conexión se busca al escribir: una trama retrasada por `link` va por
+    # la que haya entonces aunque la de su envío se haya perdido
+    def write(self, address, frame):
+        connection = self.connections.get(address)
+        if connection is None:
+            connection = self.connections[address] = Connection(self, address)
+        connection.write(frame)
+
+    async def accept(self, reader, writer):
+        task = asyncio.current_task()
+        self.readers[task] = writer
+        try:
+            pending = b''
+            while True:
+                chunk = await reader.read(READ_SIZE)
+                if not chunk:
+                    return
+                buffer = pending + chunk if pending else chunk
+                view = memoryview(buffer)
+                offset = 0
+                while offset + FRAME_HEADER.size <= len(view):
+                    length, sender_id, recipient_id = FRAME_HEADER.unpack_from(view, offset)
+                    end = offset + FRAME_HEADER.size + length
+                    if end > len(view):
+                        break
+                    await self.handler(sender_id, recipient_id, view[offset + FRAME_HEADER.size:end])
+                    offset = end
+                pending = buffer[offset:]
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.readers.pop(task, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    # Los lectores terminan al cerrarse su conexión (fin de flujo)
+    async def close(self):
+        writers = [connection.task for connection in self.connections.values()]
+        for task in writers:
+            task.cancel()
+        for writer in self.readers.values():
+            writer.close()
+        await asyncio.gather(*writers, *self.readers, return_exceptions=True)
+        self.connections = {}
+        self.congested.clear()
+        self.writable.set()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+# Dirección de escucha para `name`: un socket Unix en `directory` o un puerto
+# TCP de localhost que el sistema da por libre. El puerto se conoce antes de
+# arrancar, así que `endpoints` puede pasarse tal cual a otros procesos
+def local_address(kind, name, directory=None):
+    if kind == 'uds':
+        return os.path.join(directory or tempfile.gettempdir(), f'{name}.sock')
+    if kind == 'tcp':
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            return probe.getsockname()[:2]
+    raise ValueError(f'Unknown transport kind {kind!r}')
+
+# Transporte de un proceso que aloja todos los nodos `ids`
+def shared_transport(kind, ids, name, link=None):
+    address = local_address(kind, f'{name}-{os.getpid()}')
+    return SocketTransport(address, dict.fromkeys(ids, address), link)
+
+class TransportThread:
+    def __init__(self, transport):
+        self.transport = transport
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    # `handler` es una función normal que se llama en el hilo del transporte
+    def start(self, handler):
+        async def deliver(sender_id, recipient_id, data):
+            handler(sender_id, recipient_id, bytes(data))
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.transport.start(deliver), self.loop).result()
+
+    # El hilo emisor se detiene mientras el transporte esté saturado
+    def send(self, sender_id, recipient_id, data):
+        self.loop.call_soon_threadsafe(self.transport.send, sender_id, recipient_id, data)
+        if self.transport.congested or self.transport.failure is not None:
+            asyncio.run_coroutine_threadsafe(self.transport.drain(), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.transport.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
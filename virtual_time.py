@@ -0,0 +1,73 @@
+# Bucle de eventos con reloj virtual para simulaciones deterministas.
+#
+# El bucle de asyncio calcula cuánto puede esperar hasta el siguiente
+# temporizador y se lo pide al selector. Aquí el selector no espera: adelanta
+# el reloj virtual exactamente ese tiempo y sigue. asyncio.sleep, call_later y
+# wait_for funcionan sin cambios, pero una simulación de horas de reloj del
+# clúster se ejecuta en lo que tarda procesar sus eventos.
+#
+# Con la misma semilla, random y el orden de los eventos se repiten, así que
+# cada ejecución es reproducible. El reloj sólo avanza cuando el bucle está
+# de verdad ocioso: primero se consultan los descriptores sin esperar, y
+# mientras quede un trabajo de run_in_executor en curso (un fsync del WAL) se
+# espera en tiempo real a que termine sin mover el reloj. Así el trabajo de
+# los hilos auxiliares no consume tiempo virtual y no se salta temporizadores
+# que vencerían mientras tanto. Los datos que un socket aún no ha recibido no
+# se pueden detectar: con transportes reales la simulación no es determinista.
+import asyncio
+import random
+import selectors
+
+class VirtualClockSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None or timeout <= 0:
+            return super().select(timeout)
+        events = super().select(0)
+        if events:
+            return events
+        if self.loop.executor_jobs:
+            # El fin del trabajo despierta al selector por el self-pipe del bucle
+            return super().select(None)
+        self.loop.advance(timeout)
+        return []
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start=0.0):
+        self.virtual_time = start
+        self.executor_jobs = set()
+        super().__init__(VirtualClockSelector(self))
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.executor_jobs.add(future)
+        future.add_done_callback(self.executor_jobs.discard)
+        return future
+
+    def time(self):
+        return self.virtual_time
+
+    def advance(self, seconds):
+        self.virtual_time += seconds
+
+# Equivalente a asyncio.run sobre el reloj virtual
+def run(main, seed=None):
+    if seed is not None:
+        random.seed(seed)
+    loop = VirtualTimeEventLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()